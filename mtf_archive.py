@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+直接评估ZIP/TAR压缩包中的图像（不解压到磁盘）
+ZIP和未压缩的TAR可随机访问：按目录列出图像成员，每个工作线程用自己的文件句柄读取
+各自的成员；.tar.gz/.tar.bz2/.tar.xz只能顺序解压，按包内顺序流式读取。
+成员字节直接交给 MTFSharpnessEvaluator.from_bytes 解码，结果的文件名与解压后评估一致。
+"""
+
+import os
+import tarfile
+import threading
+import time
+import zipfile
+
+from mtf_sharpness import IMAGE_EXTENSIONS, process_single_image
+
+
+# 识别为压缩包的扩展名
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+
+# 图像成员的扩展名（与文件夹模式一致）
+IMAGE_SUFFIXES = tuple(ext[1:] for ext in IMAGE_EXTENSIONS)
+
+
+def is_archive(path):
+    """
+    判断路径是否为支持的压缩包
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        bool: 是ZIP/TAR压缩包时为True
+    """
+    return os.path.isfile(path) and str(path).lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def is_image_member(name):
+    """
+    判断压缩包成员是否为待评估的图像（与文件夹通配一致，跳过以点开头的隐藏文件，
+    如macOS打包时附带的 ._xxx.bmp）
+
+    Args:
+        name: 成员名（包内路径）
+
+    Returns:
+        bool: 是图像成员时为True
+    """
+    basename = name.rsplit('/', 1)[-1]
+    return not basename.startswith('.') and basename.lower().endswith(IMAGE_SUFFIXES)
+
+
+class ImageArchive:
+    """压缩包中的图像集合"""
+
+    def __init__(self, path):
+        """
+        打开压缩包（只读目录，不读取成员数据）
+
+        Args:
+            path: 压缩包路径
+        """
+        self.path = path
+        lower = str(path).lower()
+        if lower.endswith('.zip'):
+            self.kind = 'zip'
+        elif lower.endswith('.tar'):
+            self.kind = 'tar'
+        else:
+            self.kind = 'stream'
+        self._infos = {}
+        self._mtimes = {}
+        # 每个线程一个文件句柄，并发读取互不干扰
+        self._local = threading.local()
+        self._handles = []
+        self._lock = threading.Lock()
+
+    @property
+    def random_access(self):
+        """是否可以按成员名随机读取（压缩tar只能顺序流式读取）"""
+        return self.kind != 'stream'
+
+    def _handle(self):
+        handle = getattr(self._local, 'handle', None)
+        if handle is None:
+            handle = zipfile.ZipFile(self.path) if self.kind == 'zip' else tarfile.open(self.path, 'r:')
+            self._local.handle = handle
+            with self._lock:
+                self._handles.append(handle)
+        return handle
+
+    def members(self):
+        """
+        列出图像成员（ZIP读中央目录，TAR只读各成员头部）
+
+        Returns:
+            list: 成员名列表；压缩tar返回None（只能用 stream 顺序读取）
+        """
+        if self.kind == 'stream':
+            return None
+        if not self._infos:
+            handle = self._handle()
+            if self.kind == 'zip':
+                for info in handle.infolist():
+                    if not info.is_dir() and is_image_member(info.filename):
+                        self._infos[info.filename] = info
+                        self._mtimes[info.filename] = time.mktime(info.date_time + (0, 0, -1))
+            else:
+                for info in handle:
+                    if info.isfile() and is_image_member(info.name):
+                        self._infos[info.name] = info
+                        self._mtimes[info.name] = info.mtime
+        return list(self._infos)
+
+    def open(self, name):
+        """
+        以文件对象打开成员（可定位，只读取实际访问的部分）
+
+        Args:
+            name: 成员名
+
+        Returns:
+            file: 成员文件对象
+        """
+        if not self._infos:
+            # 只按成员名读取时（如工作进程各自打开的压缩包）先建立目录索引
+            self.members()
+        handle = self._handle()
+        if self.kind == 'zip':
+            return handle.open(self._infos[name])
+        return handle.extractfile(self._infos[name])
+
+    def read(self, name):
+        """
+        读取成员的全部字节
+
+        Args:
+            name: 成员名
+
+        Returns:
+            bytes: 编码后的图像数据
+        """
+        with self.open(name) as member:
+            return member.read()
+
+    def header(self, name):
+        """
+        只读取成员的文件头得到图像尺寸（供内存预算调度估算）
+
+        Args:
+            name: 成员名
+
+        Returns:
+            tuple: (width, height, mode, format)，无法识别时返回None
+        """
+        from mtf_scheduler import read_image_header
+        with self.open(name) as member:
+            return read_image_header(member)
+
+    def stream(self):
+        """
+        按包内顺序流式读取图像成员（适用于所有类型，压缩tar只能用这种方式）
+
+        Yields:
+            tuple: (成员名, 编码后的图像数据)
+        """
+        if self.random_access:
+            for name in self.members():
+                yield name, self.read(name)
+            return
+        with tarfile.open(self.path, 'r|*') as tar:
+            for info in tar:
+                if info.isfile() and is_image_member(info.name):
+                    self._mtimes[info.name] = info.mtime
+                    yield info.name, tar.extractfile(info).read()
+
+    def display_path(self, name):
+        """成员的显示路径：压缩包路径/包内路径"""
+        return f"{self.path}/{name}"
+
+    def mtime(self, name):
+        """成员的修改时间（Unix时间），未知时返回None"""
+        return self._mtimes.get(name)
+
+    def evaluate(self, name, verbose=True, tracker=None, data=None, **evaluator_options):
+        """
+        评估一个图像成员（在调用线程中用自己的句柄读取）
+
+        Args:
+            name: 成员名
+            verbose: 是否打印结果
+            tracker: 序列模式的ROITracker（可选）
+            data: 已读取的成员字节（流式读取时给出）
+            **evaluator_options: 传给MTFSharpnessEvaluator的选项
+
+        Returns:
+            tuple: 与 process_single_image 相同（启用bootstrap时追加mtf50_ci），filename为成员的文件名
+        """
+        if data is None:
+            data = self.read(name)
+        return process_single_image(self.display_path(name), verbose=verbose, tracker=tracker,
+                                    data=data, **evaluator_options)
+
+    def close(self):
+        """关闭所有线程的文件句柄"""
+        with self._lock:
+            for handle in self._handles:
+                handle.close()
+            self._handles = []
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_archive(path):
+    """
+    路径是压缩包时打开它
+
+    Args:
+        path: 文件或文件夹路径
+
+    Returns:
+        ImageArchive: 压缩包；不是压缩包时返回None
+    """
+    return ImageArchive(path) if is_archive(path) else None
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MTF批量评估的工作进程监管
+每个工作进程一次只评估一张图像，监管方经各自的管道逐张派发并记录开始时间
+（新进程报告就绪后才开始计时，导入和预热不计入单张时限）：
+    超时     单张超过时限的进程被强制结束并换新进程
+    崩溃     进程意外退出（段错误、被系统OOM终止等）同样换新进程
+    内存     工作进程设地址空间上限（RLIMIT_AS），超限的图像以MemoryError失败，不拖垮整机
+    换新     每个进程评估N张图像后主动退出，内存碎片和泄漏不会随运行时间累积
+超时、内存超限和崩溃的图像按次数重试，仍失败的记入失败报告；读取或解码失败等
+由文件本身决定的错误不重试。少数坏文件只占用一个进程的一段时限，其余进程照常评估。
+"""
+
+import csv
+import json
+import multiprocessing as mp
+import os
+import signal
+import time
+from collections import deque
+from multiprocessing.connection import wait
+
+import numpy as np
+
+import mtf_metrics
+from mtf_sharpness import MTFSharpnessEvaluator, NoValidEdgeError, NO_VALID_EDGE, format_ci
+
+try:
+    import resource
+except ImportError:
+    # Windows没有RLIMIT_AS，内存上限不生效（超时和崩溃重启照常工作）
+    resource = None
+
+
+# 失败类型 → 结果中的等级（'error'与 process_single_image 的失败等级一致）
+FAILURE_KINDS = {
+    'error': '错误',
+    'timeout': '超时',
+    'memory': '内存超限',
+    'crash': '进程崩溃',
+}
+
+# 会重试的失败类型（读取/解码失败多为文件本身的问题，重试无益）
+RETRY_KINDS = ('timeout', 'memory', 'crash')
+
+# 失败报告的字段（CSV表头 / JSONL键）
+FAILURE_FIELDS = ('path', 'kind', 'attempts', 'elapsed', 'message')
+
+# 工作进程完成导入和预热后发给监管方的消息，单张时限从收到它时开始计时
+READY = 'ready'
+
+
+def _address_space():
+    """当前进程的虚拟地址空间大小（字节），无法读取时返回0"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _warm_up(evaluator_options):
+    """评估一张小的合成刃边图像，让延迟导入、FFT计划和线程池在设内存上限之前初始化"""
+    edge = np.zeros((64, 64), dtype=np.uint8)
+    edge[:, 32:] = 200
+    try:
+        MTFSharpnessEvaluator.from_array(edge, **evaluator_options).compute_mtf_sharpness()
+    except Exception:
+        pass
+
+
+def _limit_memory(limit):
+    """
+    设置工作进程的地址空间上限：预热后的用量（numpy/OpenCV等库的基线）再加limit
+
+    Returns:
+        bool: 是否生效（Windows等没有RLIMIT_AS的平台为False）
+    """
+    if resource is None:
+        return False
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    target = _address_space() + int(limit)
+    if hard != resource.RLIM_INFINITY:
+        target = min(target, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (target, hard))
+    return True
+
+
+def _evaluate(name, data, archive, evaluator_options):
+    """
+    在工作进程中评估一张图像，异常按类型转成结果（不向外抛出）
+
+    Returns:
+        dict: status（ok/no_edge/error/memory）、mtf50、score、level、mtf50_ci、message、stage_times、elapsed
+    """
+    start = time.perf_counter()
+    result = {'status': 'ok', 'mtf50': None, 'score': None, 'level': None, 'mtf50_ci': None,
+              'message': None, 'stage_times': {}}
+    evaluator = None
+    try:
+        if data is None and archive is not None:
+            data = archive.read(name)
+        if data is not None:
+            evaluator = MTFSharpnessEvaluator.from_bytes(data, **evaluator_options)
+        else:
+            evaluator = MTFSharpnessEvaluator(name, **evaluator_options)
+        evaluator.load_image()
+        metrics = evaluator.compute_mtf_sharpness()
+        mtf50 = float(metrics['mtf50'])
+        result.update(mtf50=mtf50, score=float(metrics['sharpness_score']),
+                      level=evaluator.get_sharpness_level(mtf50), mtf50_ci=metrics.get('mtf50_ci'))
+    except NoValidEdgeError as e:
+        result.update(status='no_edge', level=NO_VALID_EDGE, message=e.reason)
+    except MemoryError as e:
+        result.update(status='memory', message=f"MemoryError: {e}")
+    except Exception as e:
+        # OpenCV分配失败时抛出cv2.error而不是MemoryError
+        status = 'memory' if 'Insufficient memory' in str(e) else 'error'
+        result.update(status=status, message=f"{type(e).__name__}: {e}")
+    if evaluator is not None:
+        result['stage_times'] = evaluator.stage_times
+    result['elapsed'] = time.perf_counter() - start
+    return result
+
+
+def _worker(conn, evaluator_options, memory_limit, archive_path):
+    """
+    工作进程：逐个接收 (name, data)，评估后经管道返回结果；收到None或管道关闭时退出
+
+    Args:
+        conn: 与监管方相连的管道
+        evaluator_options: 传给MTFSharpnessEvaluator的选项
+        memory_limit: 地址空间上限（字节，相对预热后的基线），None表示不限制
+        archive_path: 可随机访问的压缩包路径（成员由本进程按名读取），None表示磁盘文件或已读出的字节
+    """
+    # Ctrl+C由监管方统一处理，工作进程不打印各自的KeyboardInterrupt回溯
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    archive = None
+    if archive_path is not None:
+        from mtf_archive import open_archive
+        archive = open_archive(archive_path)
+    if memory_limit is not None:
+        _warm_up(evaluator_options)
+        _limit_memory(memory_limit)
+    try:
+        # spawn方式启动时导入numpy/OpenCV等需要数秒，不计入第一张图像的时限
+        conn.send(READY)
+        while True:
+            try:
+                task = conn.recv()
+            except EOFError:
+                break
+            if task is None:
+                break
+            name, data = task
+            conn.send(_evaluate(name, data, archive, evaluator_options))
+    finally:
+        if archive is not None:
+            archive.close()
+        conn.close()
+
+
+class _Worker:
+    """一个工作进程及其当前任务"""
+
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        # (name, data, 已尝试次数)，空闲时为None
+        self.task = None
+        # 当前任务的计时起点；进程报告就绪之前为None（不计时）
+        self.started = None
+        self.ready = False
+        self.done = 0
+
+
+class BatchSupervisor:
+    """受监管的批量评估进程池：单张超时与内存上限、崩溃重启、定期换新和有限次重试"""
+
+    def __init__(self, processes=None, timeout=None, memory_limit=None, retries=1, recycle=500):
+        """
+        Args:
+            processes: 工作进程数（默认为CPU核数）
+            timeout: 单张图像的时限（秒），None表示不限制
+            memory_limit: 每个工作进程的地址空间上限（字节，不含numpy/OpenCV等库的基线），
+                          None表示不限制；仅在有RLIMIT_AS的平台（Linux等）生效
+            retries: 超时、内存超限或崩溃后的重试次数
+            recycle: 每个工作进程评估多少张图像后换新进程
+        """
+        if processes is not None and int(processes) < 1:
+            raise ValueError(f"工作进程数必须为正整数: {processes}")
+        if timeout is not None and timeout <= 0:
+            raise ValueError(f"单张时限必须为正数: {timeout}")
+        if memory_limit is not None and memory_limit <= 0:
+            raise ValueError(f"内存上限必须为正数: {memory_limit}")
+        if int(retries) < 0:
+            raise ValueError(f"重试次数不能为负数: {retries}")
+        if int(recycle) < 1:
+            raise ValueError(f"换新间隔必须为正整数: {recycle}")
+        self.processes = int(processes or os.cpu_count() or 1)
+        self.timeout = timeout
+        self.memory_limit = int(memory_limit) if memory_limit is not None else None
+        self.retries = int(retries)
+        self.recycle = int(recycle)
+        # 运行统计
+        self.failures = []
+        self.completed = 0
+        self.retried = 0
+        self.restarts = {'timeout': 0, 'memory': 0, 'crash': 0, 'recycle': 0}
+        self._args = None
+        self._with_ci = False
+
+    @property
+    def memory_limit_enforced(self):
+        """内存上限在本平台是否生效"""
+        return self.memory_limit is not None and resource is not None
+
+    def _spawn(self):
+        parent_conn, child_conn = mp.Pipe()
+        process = mp.Process(target=_worker, args=(child_conn,) + self._args, daemon=True)
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    @staticmethod
+    def _stop(worker, kill=False):
+        """结束工作进程：正常换新时通知其退出，超时或崩溃时直接强制结束"""
+        if not kill:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                kill = True
+        if not kill:
+            worker.process.join(5)
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+
+    def _replace(self, workers, index, reason, kill=True):
+        self._stop(workers[index], kill)
+        self.restarts[reason] += 1
+        mtf_metrics.WORKER_RESTARTS.labels(reason).inc()
+        workers[index] = self._spawn()
+
+    def run(self, items, archive=None, verbose=True, **evaluator_options):
+        """
+        评估全部图像
+
+        任务从items中按需取出（压缩tar流式读取时不会一次读入全部数据）；结果按完成顺序返回。
+
+        Args:
+            items: 可迭代的 (name, data)：name为图像路径或压缩包成员名，
+                   data为已读出的编码字节（None表示由工作进程自己读取）
+            archive: 压缩包（mtf_archive.ImageArchive），可随机访问时工作进程各自打开
+            verbose: 是否逐张打印结果
+            **evaluator_options: 传给MTFSharpnessEvaluator的选项
+
+        Yields:
+            tuple: (name, (filename, mtf50_value, sharpness_score, level[, mtf50_ci]))，与
+                   process_single_image 的返回值相同（启用bootstrap时才有mtf50_ci）；
+                   最终失败的图像level为 FAILURE_KINDS 中的等级
+        """
+        archive_path = archive.path if archive is not None and archive.random_access else None
+        display = archive.display_path if archive is not None else (lambda name: name)
+        self._args = (evaluator_options, self.memory_limit, archive_path)
+        self._with_ci = bool(evaluator_options.get('bootstrap'))
+
+        items = iter(items)
+        pending = deque()
+        exhausted = False
+        workers = [self._spawn() for _ in range(self.processes)]
+        mtf_metrics.WORKERS.set(self.processes)
+        try:
+            while True:
+                # 1. 空闲进程领取任务（重试的任务优先）
+                for index, worker in enumerate(workers):
+                    if worker.task is not None:
+                        continue
+                    if not pending and not exhausted:
+                        item = next(items, None)
+                        if item is None:
+                            exhausted = True
+                        else:
+                            pending.append((item[0], item[1], 0))
+                    if not pending:
+                        break
+                    task = pending.popleft()
+                    try:
+                        worker.conn.send(task[:2])
+                    except OSError:
+                        # 空闲时已退出的进程：换新后由下一轮派发
+                        pending.appendleft(task)
+                        self._replace(workers, index, 'crash')
+                        continue
+                    worker.task = task
+                    worker.started = time.monotonic() if worker.ready else None
+
+                busy = [worker for worker in workers if worker.task is not None]
+                mtf_metrics.QUEUE_DEPTH.set(len(pending))
+                if not busy:
+                    break
+
+                # 2. 等待结果、进程退出或最早的任务到达时限
+                wait_time = None
+                timed = [w.started for w in busy if w.started is not None]
+                if self.timeout is not None and timed:
+                    wait_time = max(0.0, min(timed) + self.timeout - time.monotonic())
+                ready = wait([w.conn for w in busy] + [w.process.sentinel for w in busy], wait_time)
+                now = time.monotonic()
+
+                # 3. 逐个处理完成、崩溃和超时的进程
+                for index, worker in enumerate(workers):
+                    if worker.task is None:
+                        continue
+                    result, kind = None, None
+                    if worker.conn in ready:
+                        try:
+                            result = worker.conn.recv()
+                        except (EOFError, OSError):
+                            kind = 'crash'
+                        if result == READY:
+                            worker.ready, worker.started = True, now
+                            continue
+                    elif worker.process.sentinel in ready:
+                        kind = 'crash'
+                    elif (self.timeout is not None and worker.started is not None
+                          and now - worker.started >= self.timeout):
+                        kind = 'timeout'
+                    else:
+                        continue
+
+                    name, data, attempts = worker.task
+                    attempts += 1
+                    elapsed = now - worker.started if worker.started is not None else 0.0
+                    worker.task = None
+                    if result is not None:
+                        worker.done += 1
+                        if result['status'] == 'memory':
+                            kind = 'memory'
+                            # MemoryError之后进程的堆可能已碎片化，换新进程再继续
+                            self._replace(workers, index, 'memory', kill=False)
+                        elif worker.done >= self.recycle:
+                            self._replace(workers, index, 'recycle', kill=False)
+                    else:
+                        if kind == 'crash':
+                            # 管道可能先于进程结束关闭，等进程退出后再读退出码
+                            worker.process.join(1)
+                        exitcode = worker.process.exitcode
+                        self._replace(workers, index, kind)
+                        if kind == 'timeout':
+                            message = f"超过 {self.timeout:g} s"
+                        else:
+                            message = f"退出码 {exitcode}"
+                        result = {'status': kind, 'message': message, 'stage_times': {}, 'elapsed': elapsed}
+
+                    if kind in RETRY_KINDS and attempts <= self.retries:
+                        self.retried += 1
+                        pending.appendleft((name, data, attempts))
+                        if verbose:
+                            print(f"↻ {os.path.basename(name)}: {FAILURE_KINDS[kind]}（{result['message']}），"
+                                  f"重试 {attempts}/{self.retries}")
+                        continue
+                    yield name, self._finish(name, display(name), result, kind, attempts, verbose)
+        finally:
+            for worker in workers:
+                self._stop(worker, kill=worker.task is not None)
+            mtf_metrics.WORKERS.set(0)
+            mtf_metrics.QUEUE_DEPTH.set(0)
+
+    def _finish(self, name, path, result, kind, attempts, verbose):
+        """记录最终结果，返回与process_single_image相同的元组（未启用bootstrap时不含mtf50_ci）"""
+        outcome = self._record(name, path, result, kind, attempts, verbose)
+        return outcome if self._with_ci else outcome[:4]
+
+    def _record(self, name, path, result, kind, attempts, verbose):
+        """记录最终结果（指标、失败报告、逐张打印），返回含mtf50_ci的5元组"""
+        filename = os.path.basename(name)
+        status = result['status']
+        self.completed += 1
+        if status == 'ok':
+            mtf_metrics.record_evaluation('ok', result['mtf50'], result['level'],
+                                          result['stage_times'], busy=result['elapsed'])
+            if verbose:
+                print(f"✓ {filename}: MTF50={result['mtf50']:.4f}{format_ci(result['mtf50_ci'])} | "
+                      f"评分={result['score']:.2f} | {result['level']}")
+            return filename, result['mtf50'], result['score'], result['level'], result['mtf50_ci']
+
+        if status == 'no_edge':
+            mtf_metrics.record_evaluation('no_edge', stage_times=result['stage_times'], busy=result['elapsed'])
+            if verbose:
+                print(f"⊘ {filename}: {NO_VALID_EDGE}: {result['message']}")
+            return filename, None, None, NO_VALID_EDGE, None
+
+        kind = kind or 'error'
+        mtf_metrics.record_evaluation('failed', busy=result['elapsed'])
+        self.failures.append({
+            'path': path,
+            'kind': kind,
+            'attempts': attempts,
+            'elapsed': round(float(result['elapsed']), 3),
+            'message': result['message'],
+        })
+        if verbose:
+            print(f"✗ {filename}: {FAILURE_KINDS[kind]} - {result['message']}")
+        return filename, None, None, FAILURE_KINDS[kind], None
+
+    def summary(self):
+        """
+        运行统计
+
+        Returns:
+            dict: completed、failed（按失败类型计数）、retried、restarts（按原因计数）
+        """
+        failed = {}
+        for failure in self.failures:
+            failed[failure['kind']] = failed.get(failure['kind'], 0) + 1
+        return {
+            'completed': self.completed,
+            'failed': failed,
+            'retried': self.retried,
+            'restarts': dict(self.restarts),
+        }
+
+
+def format_summary(supervisor):
+    """
+    格式化进程监管统计（供批量结果末尾打印）
+
+    Args:
+        supervisor: 已运行的BatchSupervisor
+
+    Returns:
+        str: 多行文本
+    """
+    stats = supervisor.summary()
+    restart_names = {'timeout': '超时', 'memory': '内存超限', 'crash': '崩溃', 'recycle': '定期换新'}
+    restarts = "、".join(f"{restart_names[reason]} {count}"
+                         for reason, count in stats['restarts'].items() if count)
+    lines = [f"进程监管: 工作进程 {supervisor.processes} | 重试 {stats['retried']} 次 | "
+             f"进程重启 {sum(stats['restarts'].values())} 次" + (f"（{restarts}）" if restarts else "")]
+    if supervisor.memory_limit is not None and not supervisor.memory_limit_enforced:
+        lines.append("  注意: 本平台不支持RLIMIT_AS，内存上限未生效")
+    if stats['failed']:
+        lines.append("  失败: " + "、".join(f"{FAILURE_KINDS[kind]} {count} 张"
+                                          for kind, count in stats['failed'].items()))
+    return "\n".join(lines)
+
+
+def save_failures(failures, output_file):
+    """
+    保存失败报告（.csv / .jsonl，其余扩展名为文本表格）
+
+    Args:
+        failures: BatchSupervisor.failures
+        output_file: 输出文件路径
+    """
+    ext = os.path.splitext(output_file)[1].lower()
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        if ext == '.csv':
+            writer = csv.DictWriter(f, fieldnames=FAILURE_FIELDS)
+            writer.writeheader()
+            writer.writerows(failures)
+        elif ext == '.jsonl':
+            for failure in failures:
+                f.write(json.dumps(failure, ensure_ascii=False) + '\n')
+        else:
+            f.write(f"{'类型':<10} {'尝试':<6} {'耗时(s)':<10} {'文件':<50} 原因\n")
+            f.write("-" * 100 + "\n")
+            for failure in failures:
+                f.write(f"{FAILURE_KINDS[failure['kind']]:<10} {failure['attempts']:<6} "
+                        f"{failure['elapsed']:<10.2f} {failure['path']:<50} {failure['message']}\n")
@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MTF评估结果的两轮对比（如更换镜头前后）
+按文件名建立哈希索引，单次流式扫描完成连接，输出逐图MTF50变化、
+超过阈值的退化以及整体分布的偏移；内存只与基准轮的图像数成正比。
+"""
+
+import argparse
+import csv
+import heapq
+import json
+import math
+import os
+
+import numpy as np
+from scipy import stats
+
+from mtf_spc import Welford
+
+
+# 分布直方图：MTF50在 [0, 2) 上、差值在 [-2, 2) 上按1e-4分桶（分位数误差不超过半个桶宽）
+HIST_BIN_WIDTH = 1e-4
+MTF50_RANGE = (0.0, 2.0)
+DELTA_RANGE = (-2.0, 2.0)
+
+
+def _text_rows(f):
+    """解析 save_results_to_file 写出的文本表格（排名 文件名 MTF50 [置信区间] 评分 等级）"""
+    in_table = False
+    for line in f:
+        if line.startswith('-' * 10):
+            in_table = True
+            continue
+        if not in_table:
+            continue
+        if line.startswith('=' * 10):
+            break
+        tokens = line.split()
+        if len(tokens) >= 7 and tokens[-4].startswith('[') and tokens[-3].endswith(']'):
+            # 启用bootstrap时MTF50之后还有一列置信区间 [下限, 上限]
+            tokens = tokens[:-4] + tokens[-2:]
+        if len(tokens) < 5 or not tokens[0].isdigit():
+            continue
+        # 文件名中可能有空格：排名之后、末尾三列之前的部分都属于文件名
+        yield {'filename': ' '.join(tokens[1:-3]), 'mtf50': tokens[-3]}
+
+
+def read_results(path):
+    """
+    逐行读取一轮评估结果（生成器，不把整个文件读入内存）
+
+    支持 --output 写出的 .csv / .jsonl 结构化结果和 .txt 文本表格。
+
+    Args:
+        path: 结果文件路径
+
+    Yields:
+        tuple: (文件名, MTF50)
+    """
+    ext = os.path.splitext(path)[1].lower()
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if ext == '.csv':
+            rows = csv.DictReader(f)
+        elif ext == '.jsonl':
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = _text_rows(f)
+
+        for row in rows:
+            name = row.get('filename') or os.path.basename(row.get('path') or '')
+            value = row.get('mtf50')
+            if not name or value in (None, ''):
+                continue
+            yield name, float(value)
+
+
+class StreamingHistogram:
+    """固定分桶的流式直方图（分块bincount累加，用于分位数和KS检验）"""
+
+    CHUNK = 65536
+
+    def __init__(self, lo, hi, width=HIST_BIN_WIDTH):
+        """
+        Args:
+            lo: 下界（更小的值计入第一个桶）
+            hi: 上界（更大的值计入最后一个桶）
+            width: 桶宽
+        """
+        self.lo = lo
+        self.width = width
+        self.bins = int(round((hi - lo) / width))
+        self.counts = np.zeros(self.bins, dtype=np.int64)
+        self._buffer = []
+
+    def add(self, x):
+        self._buffer.append(x)
+        if len(self._buffer) >= self.CHUNK:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            idx = np.floor((np.asarray(self._buffer) - self.lo) / self.width).astype(np.int64)
+            np.clip(idx, 0, self.bins - 1, out=idx)
+            self.counts += np.bincount(idx, minlength=self.bins)
+            self._buffer.clear()
+
+    @property
+    def total(self):
+        self._flush()
+        return int(self.counts.sum())
+
+    def cdf(self):
+        """各桶上边界处的经验分布函数"""
+        self._flush()
+        cumulative = np.cumsum(self.counts)
+        return cumulative / max(cumulative[-1], 1)
+
+    def quantile(self, q):
+        """
+        分位数（取所在桶的中点）
+
+        Args:
+            q: 分位（0~1）
+
+        Returns:
+            float: 分位数，没有数据时为None
+        """
+        if self.total == 0:
+            return None
+        index = int(np.searchsorted(self.cdf(), q, side='left'))
+        return self.lo + (min(index, self.bins - 1) + 0.5) * self.width
+
+
+def ks_two_sample(hist_a, hist_b):
+    """
+    基于同一分桶直方图的两样本Kolmogorov-Smirnov检验
+
+    Args:
+        hist_a: 第一组的StreamingHistogram
+        hist_b: 第二组的StreamingHistogram（分桶需与第一组相同）
+
+    Returns:
+        tuple: (D统计量, 渐近p值)，任一组为空时为 (None, None)
+    """
+    n, m = hist_a.total, hist_b.total
+    if n == 0 or m == 0:
+        return None, None
+    d = float(np.max(np.abs(hist_a.cdf() - hist_b.cdf())))
+    en = math.sqrt(n * m / (n + m))
+    return d, float(stats.kstwobign.sf(d * en))
+
+
+def parse_threshold(text):
+    """
+    解析退化阈值："0.01" 为绝对值（cycles/pixel），"5%" 为相对基准的百分比
+
+    Returns:
+        tuple: (阈值, 是否相对)
+    """
+    text = str(text).strip()
+    if text.endswith('%'):
+        return float(text[:-1]) / 100.0, True
+    return float(text), False
+
+
+def compare_runs(baseline, candidate, threshold=0.01, relative=False, top=10, delta_file=None):
+    """
+    对比两轮评估结果
+
+    基准轮按文件名建哈希索引，对比轮逐行流式读取并在索引中查找（O(1)），
+    统计量均为在线累积，只有最差/最好的top条记录保留在堆中。
+
+    Args:
+        baseline: 基准轮结果文件（如换镜头前）
+        candidate: 对比轮结果文件（如换镜头后）
+        threshold: 退化/提升阈值
+        relative: 阈值是否为相对基准MTF50的比例
+        top: 列出的最大退化/提升条数
+        delta_file: 逐图差值CSV输出路径（可选，边扫描边写出）
+
+    Returns:
+        dict: 对比结果
+    """
+    # 基准轮：文件名 -> MTF50（重名时保留最后一条）
+    index = {}
+    duplicates = 0
+    hist_a = StreamingHistogram(*MTF50_RANGE)
+    stats_a = Welford()
+    for name, mtf50 in read_results(baseline):
+        if name in index:
+            duplicates += 1
+        index[name] = mtf50
+        hist_a.add(mtf50)
+        stats_a.update(mtf50)
+
+    hist_b = StreamingHistogram(*MTF50_RANGE)
+    stats_b = Welford()
+    hist_delta = StreamingHistogram(*DELTA_RANGE)
+    stats_delta = Welford()
+    worst, best = [], []
+    regressed = improved = only_candidate = 0
+    seen = set()
+
+    writer = None
+    out = open(delta_file, 'w', encoding='utf-8', newline='') if delta_file else None
+    try:
+        if out is not None:
+            writer = csv.writer(out)
+            writer.writerow(('filename', 'mtf50_baseline', 'mtf50_candidate', 'delta', 'rel_delta', 'status'))
+
+        for name, mtf50 in read_results(candidate):
+            hist_b.add(mtf50)
+            stats_b.update(mtf50)
+
+            base = index.get(name)
+            if base is None or name in seen:
+                only_candidate += base is None
+                if writer is not None and base is None:
+                    writer.writerow((name, '', mtf50, '', '', 'new'))
+                continue
+            seen.add(name)
+
+            delta = mtf50 - base
+            rel = delta / base if base > 0 else math.inf
+            hist_delta.add(delta)
+            stats_delta.update(delta)
+
+            change = rel if relative else delta
+            if change < -threshold:
+                regressed += 1
+                status = 'regressed'
+            elif change > threshold:
+                improved += 1
+                status = 'improved'
+            else:
+                status = 'unchanged'
+
+            # 有界堆：worst保留差值最小的top条，best保留差值最大的top条
+            if top:
+                item = (name, base, mtf50, delta)
+                if len(worst) < top:
+                    heapq.heappush(worst, (-delta, item))
+                elif -delta > worst[0][0]:
+                    heapq.heapreplace(worst, (-delta, item))
+                if len(best) < top:
+                    heapq.heappush(best, (delta, item))
+                elif delta > best[0][0]:
+                    heapq.heapreplace(best, (delta, item))
+
+            if writer is not None:
+                writer.writerow((name, base, mtf50, delta, rel, status))
+
+        only_baseline = len(index) - len(seen)
+        if writer is not None:
+            for name, base in index.items():
+                if name not in seen:
+                    writer.writerow((name, base, '', '', '', 'missing'))
+    finally:
+        if out is not None:
+            out.close()
+
+    ks_d, ks_p = ks_two_sample(hist_a, hist_b)
+
+    def describe(welford, hist):
+        return {
+            'count': welford.count,
+            'mean': welford.mean if welford.count else None,
+            'std': welford.std,
+            'p10': hist.quantile(0.1),
+            'median': hist.quantile(0.5),
+            'p90': hist.quantile(0.9),
+        }
+
+    return {
+        'baseline': baseline,
+        'candidate': candidate,
+        'threshold': threshold,
+        'relative': relative,
+        'matched': len(seen),
+        'only_baseline': only_baseline,
+        'only_candidate': only_candidate,
+        'duplicates': duplicates,
+        'regressed': regressed,
+        'improved': improved,
+        'unchanged': len(seen) - regressed - improved,
+        'baseline_stats': describe(stats_a, hist_a),
+        'candidate_stats': describe(stats_b, hist_b),
+        'delta_stats': describe(stats_delta, hist_delta),
+        'ks_statistic': ks_d,
+        'ks_pvalue': ks_p,
+        'worst': [item for _, item in sorted(worst, key=lambda e: e[1][3])],
+        'best': [item for _, item in sorted(best, key=lambda e: -e[1][3])],
+    }
+
+
+def print_comparison(result):
+    """
+    打印对比报告
+
+    Args:
+        result: compare_runs 的返回结果
+    """
+    print("\n" + "="*90)
+    print("MTF评估结果对比")
+    print("="*90)
+    print(f"基准: {result['baseline']}")
+    print(f"对比: {result['candidate']}")
+    print(f"匹配图像: {result['matched']} 张 | 仅基准: {result['only_baseline']} | "
+          f"仅对比: {result['only_candidate']}")
+    if result['duplicates']:
+        print(f"基准中重名记录: {result['duplicates']} 条（保留最后一条）")
+
+    print("\n" + "-"*90)
+    print(f"{'':<10} {'数量':>8} {'均值':>10} {'标准差':>10} {'P10':>10} {'中位数':>10} {'P90':>10}")
+    print("-"*90)
+    for label, key in (('基准', 'baseline_stats'), ('对比', 'candidate_stats'), ('差值', 'delta_stats')):
+        s = result[key]
+
+        def fmt(v):
+            return f"{v:>10.4f}" if v is not None else f"{'-':>10}"
+
+        print(f"{label:<10} {s['count']:>8} {fmt(s['mean'])} {fmt(s['std'])} "
+              f"{fmt(s['p10'])} {fmt(s['median'])} {fmt(s['p90'])}")
+
+    if result['ks_statistic'] is not None:
+        print(f"\n分布偏移（KS检验）: D = {result['ks_statistic']:.4f}, p = {result['ks_pvalue']:.3g}")
+
+    threshold = (f"{result['threshold'] * 100:g}%" if result['relative']
+                 else f"{result['threshold']:g} cycles/pixel")
+    print(f"\n阈值 {threshold}: 退化 {result['regressed']} 张 | 提升 {result['improved']} 张 | "
+          f"无明显变化 {result['unchanged']} 张")
+
+    for title, items in (('MTF50下降最多', result['worst']), ('MTF50提升最多', result['best'])):
+        if not items:
+            continue
+        print("\n" + "="*90)
+        print(title)
+        print("="*90)
+        print(f"{'文件名':<40} {'基准MTF50':<12} {'对比MTF50':<12} {'差值':<12}")
+        print("-"*90)
+        for name, base, mtf50, delta in items:
+            print(f"{name:<40} {base:<12.4f} {mtf50:<12.4f} {delta:<+12.4f}")
+
+    print("="*90 + "\n")
+
+
+def main(argv=None):
+    """命令行入口：mtf_sharpness.py compare BASELINE CANDIDATE"""
+    parser = argparse.ArgumentParser(
+        prog='mtf_sharpness.py compare',
+        description='对比两轮MTF评估结果（按文件名连接）')
+    parser.add_argument('baseline', help='基准轮结果文件（.csv / .jsonl / .txt）')
+    parser.add_argument('candidate', help='对比轮结果文件（.csv / .jsonl / .txt）')
+    parser.add_argument('--threshold', default='0.01',
+                        help='判定退化/提升的阈值，绝对值（cycles/pixel）或百分比如 5%%（默认: 0.01）')
+    parser.add_argument('--top', type=int, default=10,
+                        help='列出MTF50下降/提升最多的图像数（默认: 10）')
+    parser.add_argument('--output', '-o', help='逐图差值CSV输出路径')
+    args = parser.parse_args(argv)
+
+    threshold, relative = parse_threshold(args.threshold)
+    for path in (args.baseline, args.candidate):
+        if not os.path.isfile(path):
+            print(f"\n错误: 结果文件不存在: {path}\n")
+            return 1
+
+    result = compare_runs(args.baseline, args.candidate, threshold, relative,
+                          max(0, args.top), args.output)
+    print_comparison(result)
+    if args.output:
+        print(f"✓ 逐图差值已保存到: {args.output}\n")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
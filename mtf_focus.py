@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MTF对焦扫描最佳焦点搜索
+从对焦扫描序列中按“粗采样 → 黄金分割细化”的顺序评估帧，
+峰值被夹逼到容差范围内即提前终止，只评估少量帧即可找到最清晰的一帧
+"""
+
+import os
+import numpy as np
+
+from mtf_sharpness import (
+    find_image_files,
+    natural_sort_key,
+    process_single_image,
+)
+
+
+# 黄金分割比例
+GOLDEN_RATIO = (np.sqrt(5) - 1) / 2
+
+
+class FocusSweepSearch:
+    """对焦扫描最佳焦点搜索器（假设对焦曲线单峰）"""
+
+    def __init__(self, image_files, coarse_samples=9, tolerance=1, verbose=True,
+                 **evaluator_options):
+        """
+        初始化搜索器
+
+        Args:
+            image_files: 按对焦位置排序的图像路径列表
+            coarse_samples: 粗采样的帧数
+            tolerance: 峰值夹逼区间的容差（帧数），区间宽度不超过该值时停止细化
+            verbose: 是否打印每帧的评估结果
+            **evaluator_options: 传给MTFSharpnessEvaluator的选项
+        """
+        self.image_files = list(image_files)
+        self.coarse_samples = max(2, int(coarse_samples))
+        self.tolerance = max(1, int(tolerance))
+        self.verbose = verbose
+        self.evaluator_options = evaluator_options
+        # 已评估帧的缓存 {索引: MTF50}，评估失败的帧记为-inf
+        self.evaluated = {}
+
+    def evaluate(self, index):
+        """
+        评估指定索引的帧（带缓存，每帧最多计算一次）
+
+        Args:
+            index: 帧索引
+
+        Returns:
+            float: MTF50值，评估失败时为-inf
+        """
+        if index not in self.evaluated:
+            path = self.image_files[index]
+            filename, mtf50, _, level, *_ = process_single_image(
+                path, verbose=False, **self.evaluator_options)
+            self.evaluated[index] = mtf50 if mtf50 is not None else -np.inf
+
+            if self.verbose:
+                if mtf50 is not None:
+                    print(f"  [{index + 1:>4}] {filename}: MTF50={mtf50:.4f} | {level}")
+                else:
+                    print(f"  [{index + 1:>4}] {filename}: 处理失败")
+
+        return self.evaluated[index]
+
+    def coarse_scan(self):
+        """
+        粗采样：在整个序列上均匀取样
+
+        Returns:
+            tuple: (lo, hi) 包含峰值的索引区间
+        """
+        n = len(self.image_files)
+        samples = np.unique(np.linspace(0, n - 1, min(n, self.coarse_samples)).round().astype(int))
+
+        for i in samples:
+            self.evaluate(int(i))
+
+        scores = [self.evaluated[int(i)] for i in samples]
+        k = int(np.argmax(scores))
+
+        # 峰值位于最大采样点两侧相邻采样点之间
+        lo = int(samples[max(0, k - 1)])
+        hi = int(samples[min(len(samples) - 1, k + 1)])
+        return lo, hi
+
+    def golden_section(self, lo, hi):
+        """
+        在整数索引区间上进行黄金分割搜索，直到区间宽度不超过容差
+
+        Args:
+            lo: 区间左端索引
+            hi: 区间右端索引
+
+        Returns:
+            tuple: (lo, hi) 收缩后的区间
+        """
+        c = int(round(hi - GOLDEN_RATIO * (hi - lo)))
+        d = int(round(lo + GOLDEN_RATIO * (hi - lo)))
+
+        while hi - lo > self.tolerance + 1:
+            if c >= d:
+                # 区间太小，内点重合时直接缩为内点附近
+                c, d = lo + (hi - lo) // 2, lo + (hi - lo) // 2 + 1
+
+            if self.evaluate(c) >= self.evaluate(d):
+                # 峰值在 [lo, d] 内
+                hi = d
+                d = c
+                c = int(round(hi - GOLDEN_RATIO * (hi - lo)))
+            else:
+                # 峰值在 [c, hi] 内
+                lo = c
+                c = d
+                d = int(round(lo + GOLDEN_RATIO * (hi - lo)))
+
+        return lo, hi
+
+    def fit_focus_curve(self, best_index, points=5):
+        """
+        用最佳帧附近已评估的点拟合抛物线对焦曲线
+
+        Args:
+            best_index: 最佳帧索引
+            points: 参与拟合的点数
+
+        Returns:
+            dict: 拟合结果，已评估点不足3个时返回None
+        """
+        valid = [i for i, v in self.evaluated.items() if np.isfinite(v)]
+        nearest = sorted(valid, key=lambda i: abs(i - best_index))[:points]
+        if len(nearest) < 3:
+            return None
+
+        x = np.array(sorted(nearest), dtype=np.float64)
+        y = np.array([self.evaluated[int(i)] for i in x])
+        coeffs = np.polyfit(x, y, 2)
+
+        # 开口向下时取抛物线顶点，否则退化为最佳帧本身
+        if coeffs[0] < 0:
+            peak_index = -coeffs[1] / (2 * coeffs[0])
+            peak_index = float(np.clip(peak_index, x[0], x[-1]))
+        else:
+            peak_index = float(best_index)
+        peak_mtf50 = float(np.polyval(coeffs, peak_index))
+
+        return {
+            'coefficients': coeffs,
+            'peak_index': peak_index,
+            'peak_mtf50': peak_mtf50,
+            'indices': x.astype(int),
+        }
+
+    def search(self):
+        """
+        执行最佳焦点搜索
+
+        Returns:
+            dict: 最佳帧、评估帧数及拟合的对焦曲线
+        """
+        n = len(self.image_files)
+
+        lo, hi = self.coarse_scan()
+        lo, hi = self.golden_section(lo, hi)
+
+        # 容差范围内剩余的帧全部评估，保证在单峰假设下得到与全量评估相同的结果
+        for i in range(lo, hi + 1):
+            self.evaluate(i)
+
+        best_index = max(self.evaluated, key=lambda i: self.evaluated[i])
+        best_mtf50 = self.evaluated[best_index]
+
+        curve = [(i, os.path.basename(self.image_files[i]), self.evaluated[i])
+                 for i in sorted(self.evaluated)]
+
+        return {
+            'best_index': best_index,
+            'best_file': self.image_files[best_index],
+            'best_mtf50': best_mtf50 if np.isfinite(best_mtf50) else None,
+            'evaluated': len(self.evaluated),
+            'total': n,
+            'curve': curve,
+            'fit': self.fit_focus_curve(best_index),
+        }
+
+
+def find_best_focus(image_files, coarse_samples=9, tolerance=1, verbose=True,
+                    **evaluator_options):
+    """
+    在对焦扫描序列中查找最清晰的帧
+
+    Args:
+        image_files: 按对焦位置排序的图像路径列表
+        coarse_samples: 粗采样的帧数
+        tolerance: 峰值夹逼区间的容差（帧数）
+        verbose: 是否打印每帧的评估结果
+        **evaluator_options: 传给MTFSharpnessEvaluator的选项
+
+    Returns:
+        dict: 搜索结果
+    """
+    if not image_files:
+        raise ValueError("对焦扫描序列为空")
+
+    searcher = FocusSweepSearch(image_files, coarse_samples, tolerance, verbose,
+                                **evaluator_options)
+    return searcher.search()
+
+
+def process_focus_sweep(folder_path, output_file=None, coarse_samples=9, tolerance=1,
+                        **evaluator_options):
+    """
+    对文件夹中的对焦扫描序列执行最佳焦点搜索（按文件名自然排序）
+
+    Args:
+        folder_path: 文件夹路径
+        output_file: 对焦曲线输出文件路径（可选）
+        coarse_samples: 粗采样的帧数
+        tolerance: 峰值夹逼区间的容差（帧数）
+        **evaluator_options: 传给MTFSharpnessEvaluator的选项
+
+    Returns:
+        dict: 搜索结果
+    """
+    image_files = sorted(find_image_files(folder_path), key=natural_sort_key)
+
+    if not image_files:
+        print(f"\n错误: 文件夹 '{folder_path}' 中没有找到图像文件")
+        return
+
+    print("\n" + "="*90)
+    print("MTF最佳焦点搜索（粗采样 + 黄金分割细化）")
+    print("="*90)
+    print(f"文件夹: {folder_path}")
+    print(f"扫描帧数: {len(image_files)} 张")
+    print("-"*90)
+
+    result = find_best_focus(image_files, coarse_samples, tolerance, verbose=True,
+                             **evaluator_options)
+
+    print("\n" + "="*90)
+    print("搜索结果")
+    print("="*90)
+    if result['best_mtf50'] is None:
+        print("所有评估帧均处理失败")
+        print("="*90 + "\n")
+        return result
+
+    print(f"最佳帧: {os.path.basename(result['best_file'])} (第 {result['best_index'] + 1} 帧)")
+    print(f"最佳MTF50: {result['best_mtf50']:.4f} cycles/pixel")
+    print(f"评估帧数: {result['evaluated']}/{result['total']} "
+          f"({result['evaluated'] * 100 / result['total']:.1f}%)")
+
+    fit = result['fit']
+    if fit is not None:
+        print(f"拟合峰值位置: 第 {fit['peak_index'] + 1:.2f} 帧 | 拟合MTF50: {fit['peak_mtf50']:.4f}")
+
+    print("\n对焦曲线（已评估帧）:")
+    print(f"{'帧号':<8} {'文件名':<35} {'MTF50':<10}")
+    print("-"*90)
+    for index, filename, mtf50 in result['curve']:
+        marker = " ◀ 最佳" if index == result['best_index'] else ""
+        value = f"{mtf50:.4f}" if np.isfinite(mtf50) else "失败"
+        print(f"{index + 1:<8} {filename:<35} {value:<10}{marker}")
+
+    if output_file:
+        save_focus_curve(result, output_file)
+        print(f"\n✓ 对焦曲线已保存到: {output_file}")
+
+    print("="*90 + "\n")
+
+    return result
+
+
+def save_focus_curve(result, output_file):
+    """
+    保存对焦曲线到文本文件
+
+    Args:
+        result: find_best_focus 的返回结果
+        output_file: 输出文件路径
+    """
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write("MTF最佳焦点搜索结果\n")
+        f.write("="*100 + "\n\n")
+        f.write(f"最佳帧: {os.path.basename(result['best_file'])}\n")
+        f.write(f"最佳MTF50: {result['best_mtf50']:.6f} cycles/pixel\n")
+        f.write(f"评估帧数: {result['evaluated']}/{result['total']}\n")
+
+        fit = result['fit']
+        if fit is not None:
+            a, b, c = fit['coefficients']
+            f.write(f"拟合曲线: MTF50 = {a:.6e}·i² + {b:.6e}·i + {c:.6e}\n")
+            f.write(f"拟合峰值位置: {fit['peak_index'] + 1:.3f}\n")
+
+        f.write("\n" + f"{'帧号':<8} {'文件名':<50} {'MTF50':<20}\n")
+        f.write("-"*100 + "\n")
+        for index, filename, mtf50 in result['curve']:
+            value = f"{mtf50:.6f}" if np.isfinite(mtf50) else "失败"
+            f.write(f"{index + 1:<8} {filename:<50} {value:<20}\n")
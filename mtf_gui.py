@@ -8,13 +8,24 @@ MTF图像清晰度评估工具 - GUI版本
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import threading
+import multiprocessing
 import os
 import glob
 from pathlib import Path
-from mtf_sharpness import MTFSharpnessEvaluator
+from mtf_sharpness import MTFSharpnessEvaluator, format_ci, natural_sort_key
+from mtf_archive import ARCHIVE_SUFFIXES, ImageArchive, is_archive
+from mtf_batch import BatchSupervisor, format_summary as format_batch_summary
+from mtf_spc import SPCMonitor, format_alarm, format_summary as format_spc_summary
 import numpy as np
 
 
+# 单张图像的评估时限（秒），超时的图像结束其工作进程并重试一次
+IMAGE_TIMEOUT = 120
+
+# 勾选“MTF50置信区间”时的bootstrap重抽样次数
+BOOTSTRAP_SAMPLES = 1000
+
+
 class MTFApp:
     def __init__(self, root):
         self.root = root
@@ -27,6 +38,8 @@ class MTFApp:
         
         self.create_widgets()
         self.results = []
+        # MTF50统计过程控制：跨多次评估持续累积，清空结果时重置
+        self.spc = SPCMonitor()
         
     def create_widgets(self):
         # 标题
@@ -79,6 +92,13 @@ class MTFApp:
             width=20
         ).pack(pady=5)
         
+        ttk.Button(
+            folder_frame, 
+            text="选择压缩包（批量）", 
+            command=self.select_archive,
+            width=20
+        ).pack(pady=5)
+        
         # 当前路径显示
         self.path_var = tk.StringVar(value="未选择")
         path_label = ttk.Label(
@@ -89,6 +109,14 @@ class MTFApp:
         )
         path_label.pack(fill=tk.X, pady=10)
         
+        # 评估选项
+        self.bootstrap_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            left_frame,
+            text="MTF50置信区间（bootstrap）",
+            variable=self.bootstrap_var
+        ).pack(anchor=tk.W, pady=5)
+        
         ttk.Separator(left_frame, orient=tk.HORIZONTAL).pack(fill=tk.X, pady=10)
         
         # 操作按钮
@@ -186,6 +214,25 @@ class MTFApp:
             self.path_var.set(f"文件夹: {os.path.basename(folder)}\n({image_count}张图片)")
             self.start_btn.config(state=tk.NORMAL)
     
+    def select_archive(self):
+        """选择ZIP/TAR压缩包（不解压，直接评估包内图像）"""
+        filename = filedialog.askopenfilename(
+            title="选择压缩包",
+            filetypes=[
+                ("压缩包", " ".join("*" + suffix for suffix in ARCHIVE_SUFFIXES)),
+                ("所有文件", "*.*")
+            ]
+        )
+        if filename:
+            self.current_path = filename
+            self.is_folder = True
+            
+            with ImageArchive(filename) as archive:
+                members = archive.members()
+            count = f"{len(members)}张图片" if members is not None else "压缩tar，按包内顺序读取"
+            self.path_var.set(f"压缩包: {os.path.basename(filename)}\n({count})")
+            self.start_btn.config(state=tk.NORMAL)
+    
     def count_images(self, folder):
         """统计文件夹中的图片数量"""
         extensions = ['*.png', '*.jpg', '*.jpeg', '*.bmp', '*.tiff', '*.tif']
@@ -219,6 +266,10 @@ class MTFApp:
             self.root.after(0, lambda: self.start_btn.config(state=tk.NORMAL))
             self.root.after(0, lambda: self.status_var.set("完成"))
     
+    def evaluator_options(self):
+        """界面选项对应的评估器参数"""
+        return {'bootstrap': BOOTSTRAP_SAMPLES if self.bootstrap_var.get() else 0}
+    
     def evaluate_file(self):
         """评估单个文件"""
         self.update_status("正在评估...")
@@ -227,7 +278,7 @@ class MTFApp:
         try:
             self.update_result(f"正在加载图像: {os.path.basename(self.current_path)}\n")
             
-            evaluator = MTFSharpnessEvaluator(self.current_path)
+            evaluator = MTFSharpnessEvaluator(self.current_path, **self.evaluator_options())
             evaluator.load_image()
             
             self.update_result(f"图像加载成功，尺寸: {evaluator.gray.shape}\n")
@@ -239,13 +290,16 @@ class MTFApp:
             mtf50 = results['mtf50']
             score = results['sharpness_score']
             level = evaluator.get_sharpness_level(mtf50)
+            mtf50_ci = results.get('mtf50_ci')
             
             self.results.append({
                 'filename': filename,
                 'mtf50': mtf50,
                 'score': score,
-                'level': level
+                'level': level,
+                'mtf50_ci': mtf50_ci
             })
+            alarms = self.spc.update(self.current_path, mtf50)
             
             # 显示结果
             output = f"""
@@ -255,7 +309,7 @@ MTF图像清晰度评估结果
 文件名: {filename}
 图像尺寸: {evaluator.gray.shape}
 {'─'*70}
-MTF50: {mtf50:.6f} cycles/pixel
+MTF50: {mtf50:.6f} cycles/pixel{format_ci(mtf50_ci, 6)}
 MTF30: {results['mtf30']:.6f} cycles/pixel
 MTF10: {results['mtf10']:.6f} cycles/pixel
 清晰度评分: {score:.2f}/100
@@ -270,6 +324,7 @@ MTF10: {results['mtf10']:.6f} cycles/pixel
   < 0.1: 模糊
 """
             self.update_result(output)
+            self.report_alarms(alarms)
             self.update_progress(100)
             self.root.after(0, lambda: self.export_btn.config(state=tk.NORMAL))
             
@@ -289,48 +344,71 @@ MTF10: {results['mtf10']:.6f} cycles/pixel
             self.update_result(f"4. 图像尺寸过小（建议至少200x200像素）\n")
     
     def evaluate_folder(self):
-        """评估文件夹中的所有图片"""
-        # 获取所有图片
-        extensions = ['*.png', '*.jpg', '*.jpeg', '*.bmp', '*.tiff', '*.tif']
-        image_files = []
-        for ext in extensions:
-            image_files.extend(glob.glob(os.path.join(self.current_path, ext)))
-            image_files.extend(glob.glob(os.path.join(self.current_path, ext.upper())))
-        
-        if not image_files:
-            self.update_result("错误: 文件夹中没有找到图像文件")
-            return
-        
-        total = len(image_files)
+        """评估文件夹（或压缩包）中的所有图片"""
+        if is_archive(self.current_path):
+            with ImageArchive(self.current_path) as archive:
+                self.evaluate_images(archive.members(), archive)
+        else:
+            # 获取所有图片
+            extensions = ['*.png', '*.jpg', '*.jpeg', '*.bmp', '*.tiff', '*.tif']
+            image_files = []
+            for ext in extensions:
+                image_files.extend(glob.glob(os.path.join(self.current_path, ext)))
+                image_files.extend(glob.glob(os.path.join(self.current_path, ext.upper())))
+            self.evaluate_images(image_files)
+    
+    def evaluate_images(self, image_files, archive=None):
+        """
+        逐张评估图片
+        
+        Args:
+            image_files: 图片路径（或压缩包成员名）列表；压缩tar为None，按包内顺序流式读取
+            archive: 压缩包（ImageArchive），成员直接从包内解码
+        """
+        if image_files is not None:
+            # 按采集顺序（文件名自然排序）评估，统计过程控制才能看出趋势
+            image_files = sorted(set(image_files), key=natural_sort_key)
+            
+            if not image_files:
+                self.update_result("错误: 没有找到图像文件")
+                return
+            
+            total = len(image_files)
+            items = ((name, None) for name in image_files)
+        else:
+            total = None
+            items = archive.stream()
         self.update_result(f"{'='*70}\n批量评估开始\n{'='*70}\n")
-        self.update_result(f"找到 {total} 张图片\n\n")
-        
-        # 逐个评估
-        for i, img_path in enumerate(image_files, 1):
-            try:
-                filename = os.path.basename(img_path)
-                self.update_status(f"正在评估 {i}/{total}: {filename}")
-                
-                evaluator = MTFSharpnessEvaluator(img_path)
-                evaluator.load_image()
-                results = evaluator.compute_mtf_sharpness()
-                
-                mtf50 = results['mtf50']
-                score = results['sharpness_score']
-                level = evaluator.get_sharpness_level(mtf50)
-                
+        if total is not None:
+            self.update_result(f"找到 {total} 张图片\n\n")
+        
+        # 在独立工作进程中逐张评估：坏文件卡死或耗尽内存时只结束该进程，界面和后续图像不受影响
+        supervisor = BatchSupervisor(processes=1, timeout=IMAGE_TIMEOUT)
+        self.update_status(f"正在评估 0/{total or '?'}")
+        for i, (name, (filename, mtf50, score, level, *ci)) in enumerate(
+                supervisor.run(items, archive=archive, verbose=False, **self.evaluator_options()), 1):
+            mtf50_ci = ci[0] if ci else None
+            img_path = archive.display_path(name) if archive is not None else name
+            if mtf50 is not None:
                 self.results.append({
                     'filename': filename,
                     'mtf50': mtf50,
                     'score': score,
-                    'level': level
+                    'level': level,
+                    'mtf50_ci': mtf50_ci
                 })
-                
-                self.update_result(f"✓ {filename}: MTF50={mtf50:.4f} | 评分={score:.2f} | {level}\n")
+                self.update_result(f"✓ {filename}: MTF50={mtf50:.4f}{format_ci(mtf50_ci)} | 评分={score:.2f} | {level}\n")
+                self.report_alarms(self.spc.update(img_path, mtf50))
+            else:
+                failure = supervisor.failures[-1] if supervisor.failures else None
+                if failure is not None and failure['path'] == img_path:
+                    level = f"{level} - {failure['message'][:100]}"
+                self.update_result(f"✗ {filename}: {level}\n")
+            self.update_status(f"正在评估 {i}/{total or '?'}: {filename}")
+            if total is not None:
                 self.update_progress(int(i * 100 / total))
-                
-            except Exception as e:
-                self.update_result(f"✗ {filename}: 失败 - {str(e)[:100]}...\n")
+        if supervisor.failures or supervisor.retried:
+            self.update_result(f"\n{format_batch_summary(supervisor)}\n")
         
         # 显示统计
         self.show_statistics()
@@ -348,6 +426,8 @@ MTF10: {results['mtf10']:.6f} cycles/pixel
         
         # 排序
         sorted_results = sorted(self.results, key=lambda x: x['mtf50'], reverse=True)
+        with_ci = any(r.get('mtf50_ci') is not None for r in sorted_results)
+        ci_header = f" {'置信区间':<20}" if with_ci else ''
         
         output = f"""
 {'='*70}
@@ -361,19 +441,32 @@ MTF10: {results['mtf10']:.6f} cycles/pixel
 {'='*70}
 清晰度排名 (Top 10)
 {'='*70}
-{'排名':<6} {'文件名':<30} {'MTF50':<15} {'等级':<10}
+{'排名':<6} {'文件名':<30} {'MTF50':<15}{ci_header} {'等级':<10}
 {'─'*70}
 """
         self.update_result(output)
         
         for i, r in enumerate(sorted_results[:10], 1):
-            line = f"{i:<6} {r['filename']:<30} {r['mtf50']:<15.4f} {r['level']:<10}\n"
+            ci = f" {format_ci(r.get('mtf50_ci')).strip() or '-':<20}" if with_ci else ''
+            line = f"{i:<6} {r['filename']:<30} {r['mtf50']:<15.4f}{ci} {r['level']:<10}\n"
             self.update_result(line)
         
         if len(sorted_results) > 10:
             self.update_result(f"\n... 还有 {len(sorted_results) - 10} 张图像\n")
         
         self.update_result(f"{'='*70}\n")
+        
+        # 统计过程控制汇总（各工位/相机）
+        self.update_result(f"\n{'='*70}\n流式SPC（按工位/相机）\n{'='*70}\n")
+        self.update_result(format_spc_summary(self.spc, width=70) + "\n")
+        self.update_result(f"{'='*70}\n")
+    
+    def report_alarms(self, alarms):
+        """显示统计过程控制报警（结果区逐条列出，状态栏显示最新一条）"""
+        for alarm in alarms:
+            self.update_result(format_alarm(alarm) + "\n")
+        if alarms:
+            self.update_status(format_alarm(alarms[-1]))
     
     def export_results(self):
         """导出结果到文件"""
@@ -399,6 +492,7 @@ MTF10: {results['mtf10']:.6f} cycles/pixel
         """清空结果"""
         self.result_text.delete(1.0, tk.END)
         self.results = []
+        self.spc = SPCMonitor()
         self.progress['value'] = 0
         self.status_var.set("就绪")
         self.export_btn.config(state=tk.DISABLED)
@@ -444,4 +538,5 @@ def main():
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,662 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MTF共享内存帧环形缓冲区接入
+采集进程把帧写入 multiprocessing.shared_memory 环形缓冲区（每个槽位带形状/数据类型/
+序号的小头部），评估进程池直接在共享内存上零拷贝计算MTF，结果经结果队列返回，全程无磁盘I/O。
+
+槽位状态只由单一一方推进，无需跨进程锁：
+    采集端   EMPTY → WRITING → READY
+    分发线程 READY → CLAIMED
+    评估进程 CLAIMED → EMPTY
+槽位全忙时采集端丢弃新帧并计数；积压超过max_latency的帧由分发线程直接跳过，保证延迟有界。
+"""
+
+import argparse
+import multiprocessing as mp
+import queue
+import struct
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+import mtf_metrics
+from mtf_sharpness import (
+    MTFSharpnessEvaluator,
+    NoValidEdgeError,
+    NO_VALID_EDGE,
+    PRECISIONS,
+    ROITracker,
+)
+
+
+# 缓冲区全局头部：魔数、版本、槽位数、每槽数据字节数、写入帧数、丢弃帧数
+RING_MAGIC = b'MTFR'
+RING_VERSION = 1
+RING_HEADER = struct.Struct('<4sIIQQQ')
+
+# 槽位头部：状态、序号、采集时间戳(time.monotonic)、高、宽、通道数、数据类型码、行跨度
+SLOT_HEADER = struct.Struct('<IQdIIIIQ')
+
+# 头部和每个槽位的数据都按64字节对齐
+ALIGN = 64
+HEADER_BYTES = ALIGN
+
+# 槽位状态
+EMPTY, WRITING, READY, CLAIMED = 0, 1, 2, 3
+
+# 数据类型码
+DTYPES = {0: np.dtype(np.uint8), 1: np.dtype(np.uint16)}
+DTYPE_CODES = {dtype: code for code, dtype in DTYPES.items()}
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def parse_frame_shape(text):
+    """
+    解析帧尺寸字符串，如 "2592x1944" 或 "2592x1944x3"（宽x高[x通道]）
+
+    Args:
+        text: 帧尺寸字符串
+
+    Returns:
+        tuple: 数组形状 (h, w) 或 (h, w, channels)
+    """
+    parts = [int(v) for v in text.lower().split('x')]
+    if len(parts) not in (2, 3) or min(parts) <= 0:
+        raise argparse.ArgumentTypeError(f"无法解析帧尺寸: {text}（示例: 2592x1944 或 2592x1944x3）")
+    width, height = parts[:2]
+    return (height, width) + tuple(parts[2:])
+
+
+class FrameRing:
+    """共享内存帧环形缓冲区"""
+
+    def __init__(self, shm, owner):
+        """
+        请使用 create / attach 构造
+
+        Args:
+            shm: SharedMemory对象
+            owner: 是否为创建者（关闭时负责删除共享内存）
+        """
+        self.shm = shm
+        self.owner = owner
+        magic, version, self.slots, self.slot_bytes, _, _ = RING_HEADER.unpack_from(shm.buf, 0)
+        if magic != RING_MAGIC or version != RING_VERSION:
+            raise ValueError(f"共享内存 {shm.name} 不是MTF帧环形缓冲区")
+        self.stride = _align(SLOT_HEADER.size) + _align(self.slot_bytes)
+        # 采集端本地状态：下一帧的序号
+        self.next_seq = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @classmethod
+    def create(cls, slots=8, slot_bytes=2592 * 1944, name=None):
+        """
+        创建环形缓冲区
+
+        Args:
+            slots: 槽位数
+            slot_bytes: 每个槽位可容纳的最大帧字节数
+            name: 共享内存名称，None表示自动生成
+
+        Returns:
+            FrameRing: 缓冲区（创建者）
+        """
+        if slots < 2:
+            raise ValueError("环形缓冲区至少需要2个槽位")
+        size = HEADER_BYTES + slots * (_align(SLOT_HEADER.size) + _align(slot_bytes))
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        RING_HEADER.pack_into(shm.buf, 0, RING_MAGIC, RING_VERSION, slots, slot_bytes, 0, 0)
+        ring = cls(shm, owner=True)
+        for slot in range(slots):
+            SLOT_HEADER.pack_into(shm.buf, ring._slot_offset(slot), EMPTY, 0, 0.0, 0, 0, 0, 0, 0)
+        return ring
+
+    @classmethod
+    def attach(cls, name, external=False):
+        """
+        附加到已存在的环形缓冲区
+
+        Args:
+            name: 共享内存名称
+            external: 是否由独立启动的进程（如采集程序）附加。为True时不向资源跟踪器登记，
+                      避免该进程退出时共享内存被删除
+
+        Returns:
+            FrameRing: 缓冲区
+        """
+        shm = shared_memory.SharedMemory(name=name)
+        if external:
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm, owner=False)
+
+    def close(self):
+        """关闭缓冲区，创建者同时删除共享内存"""
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def _slot_offset(self, slot):
+        return HEADER_BYTES + slot * self.stride
+
+    def _data_offset(self, slot):
+        return self._slot_offset(slot) + _align(SLOT_HEADER.size)
+
+    def _set_state(self, slot, state):
+        # 状态是槽位头部的第一个字段，单独写入，其余字段已先写好
+        struct.pack_into('<I', self.shm.buf, self._slot_offset(slot), state)
+
+    def state(self, slot):
+        return struct.unpack_from('<I', self.shm.buf, self._slot_offset(slot))[0]
+
+    def counters(self):
+        """
+        Returns:
+            tuple: (已写入帧数, 因槽位全忙丢弃的帧数)
+        """
+        return RING_HEADER.unpack_from(self.shm.buf, 0)[4:]
+
+    def write(self, frame, timestamp=None):
+        """
+        采集端写入一帧（槽位仍被占用时丢弃该帧）
+
+        Args:
+            frame: uint8/uint16图像数组，形状 (h, w) 或 (h, w, channels)
+            timestamp: 采集时间（time.monotonic），None表示当前时间
+
+        Returns:
+            int: 帧序号，丢弃时返回None
+        """
+        frame = np.asarray(frame)
+        if frame.dtype not in DTYPE_CODES:
+            raise ValueError(f"不支持的像素类型: {frame.dtype}（可选: uint8, uint16）")
+        if frame.nbytes > self.slot_bytes:
+            raise ValueError(f"帧大小 {frame.nbytes} 字节超过槽位容量 {self.slot_bytes} 字节")
+
+        seq = self.next_seq
+        slot = seq % self.slots
+        written, dropped = self.counters()
+        if self.state(slot) != EMPTY:
+            RING_HEADER.pack_into(self.shm.buf, 0, RING_MAGIC, RING_VERSION, self.slots,
+                                  self.slot_bytes, written, dropped + 1)
+            return None
+
+        self._set_state(slot, WRITING)
+        offset = self._data_offset(slot)
+        target = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self.shm.buf, offset=offset)
+        target[...] = frame
+        del target
+
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+        row_bytes = frame.nbytes // height
+        SLOT_HEADER.pack_into(self.shm.buf, self._slot_offset(slot), WRITING, seq,
+                              time.monotonic() if timestamp is None else timestamp,
+                              height, width, channels, DTYPE_CODES[frame.dtype], row_bytes)
+        RING_HEADER.pack_into(self.shm.buf, 0, RING_MAGIC, RING_VERSION, self.slots,
+                              self.slot_bytes, written + 1, dropped)
+        self._set_state(slot, READY)
+        self.next_seq = seq + 1
+        return seq
+
+    def read_header(self, slot):
+        """
+        读取槽位头部
+
+        Returns:
+            dict: 状态、序号、时间戳、形状、数据类型和行跨度
+        """
+        state, seq, timestamp, height, width, channels, code, stride = \
+            SLOT_HEADER.unpack_from(self.shm.buf, self._slot_offset(slot))
+        shape = (height, width) if channels == 1 else (height, width, channels)
+        return {
+            'state': state,
+            'seq': seq,
+            'timestamp': timestamp,
+            'shape': shape,
+            'dtype': DTYPES[code],
+            'stride': stride,
+        }
+
+    def frame_buffer(self, slot, header):
+        """
+        槽位中帧数据的零拷贝视图
+
+        Args:
+            slot: 槽位索引
+            header: read_header 的返回结果
+
+        Returns:
+            memoryview: 帧数据
+        """
+        offset = self._data_offset(slot)
+        return self.shm.buf[offset:offset + header['stride'] * header['shape'][0]]
+
+    def claim(self, slot):
+        self._set_state(slot, CLAIMED)
+
+    def release(self, slot):
+        self._set_state(slot, EMPTY)
+
+
+def _evaluate_slot(ring, slot, header, evaluator_options, tracker):
+    """
+    在共享内存上直接评估一个槽位中的帧
+
+    Returns:
+        tuple: (mtf50, sharpness_score, level, 计算耗时, 各阶段耗时, 是否命中ROI跟踪)
+    """
+    view = ring.frame_buffer(slot, header)
+    try:
+        evaluator = MTFSharpnessEvaluator.from_buffer(
+            view, header['shape'], header['dtype'], stride=header['stride'], **evaluator_options)
+        evaluator.load_image()
+
+        start = time.perf_counter()
+        if tracker is not None:
+            tracker.prepare(evaluator)
+        try:
+            results = evaluator.compute_mtf_sharpness()
+        except NoValidEdgeError:
+            return (None, None, NO_VALID_EDGE, time.perf_counter() - start,
+                    evaluator.stage_times, False)
+        elapsed = time.perf_counter() - start
+        if tracker is not None:
+            tracker.update(evaluator, elapsed)
+
+        mtf50 = float(results['mtf50'])
+        return (mtf50, float(results['sharpness_score']), evaluator.get_sharpness_level(mtf50),
+                elapsed, evaluator.stage_times, evaluator.roi_fast_path)
+    finally:
+        # 释放指向共享内存的视图后才能关闭缓冲区（异常回溯仍引用时由垃圾回收释放）
+        evaluator = None
+        try:
+            view.release()
+        except BufferError:
+            pass
+
+
+def _worker(name, tasks, results, idle, evaluator_options, track):
+    """
+    评估进程：从任务队列取槽位，零拷贝评估后释放槽位并发布结果
+
+    Args:
+        name: 共享内存名称
+        tasks: 任务队列，元素为 (slot, seq)，None表示退出
+        results: 结果队列
+        idle: 空闲评估进程计数信号量，每完成一帧释放一次
+        evaluator_options: 传给MTFSharpnessEvaluator的选项
+        track: 是否启用ROI跟踪（同一工位的连续帧）
+    """
+    ring = FrameRing.attach(name)
+    tracker = ROITracker() if track else None
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            slot, seq = task
+            header = ring.read_header(slot)
+            try:
+                if header['seq'] != seq:
+                    raise ValueError(f"槽位 {slot} 的帧序号 {header['seq']} 与任务 {seq} 不一致")
+                mtf50, score, level, elapsed, stage_times, roi_hit = _evaluate_slot(
+                    ring, slot, header, evaluator_options, tracker)
+            except Exception as e:
+                mtf50, score, level, elapsed, stage_times, roi_hit = \
+                    None, None, f"错误: {e}", 0.0, {}, False
+            finally:
+                ring.release(slot)
+                idle.release()
+            latency = time.monotonic() - header['timestamp']
+            results.put((seq, mtf50, score, level, elapsed, latency, stage_times, roi_hit))
+    finally:
+        ring.close()
+
+
+class RingIngest:
+    """环形缓冲区接入：分发线程 + 评估进程池"""
+
+    def __init__(self, slots=8, slot_bytes=2592 * 1944, workers=None, track=True,
+                 max_latency=None, name=None, **evaluator_options):
+        """
+        初始化接入
+
+        Args:
+            slots: 槽位数
+            slot_bytes: 每个槽位的最大帧字节数
+            workers: 评估进程数，None表示CPU核数
+            track: 是否启用ROI跟踪（同一工位的连续帧，默认开启）
+            max_latency: 帧在缓冲区中等待的最长时间（秒），超过时跳过该帧；None表示不跳过
+            name: 共享内存名称，None表示自动生成
+            **evaluator_options: 传给MTFSharpnessEvaluator的选项
+        """
+        self.ring = FrameRing.create(slots, slot_bytes, name)
+        self.workers = workers or mp.cpu_count()
+        self.track = track
+        self.max_latency = max_latency
+        self.evaluator_options = evaluator_options
+        self.tasks = mp.Queue()
+        self.results = mp.Queue()
+        # 已分发未完成的帧不超过评估进程数，其余帧留在缓冲区中，便于按等待时间跳过
+        self.idle = mp.Semaphore(self.workers)
+        self.processes = []
+        self.dispatcher = None
+        self.stop_event = threading.Event()
+        # 分发线程的下一帧序号（等于已分发和已跳过的帧数之和）
+        self.next_seq = 0
+        self.dispatched = 0
+        self.skipped = 0
+        self.completed = 0
+
+    @property
+    def name(self):
+        return self.ring.name
+
+    def start(self):
+        """启动评估进程和分发线程"""
+        # 等待评估的帧：缓冲区中未分发的帧 + 已分发未取回结果的帧
+        mtf_metrics.WORKERS.set(self.workers)
+        mtf_metrics.QUEUE_DEPTH.set_function(
+            lambda: self.ring.counters()[0] - self.next_seq + self.dispatched - self.completed)
+        for _ in range(self.workers):
+            process = mp.Process(target=_worker, daemon=True,
+                                 args=(self.ring.name, self.tasks, self.results, self.idle,
+                                       self.evaluator_options, self.track))
+            process.start()
+            self.processes.append(process)
+        self.dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self.dispatcher.start()
+        return self
+
+    def _dispatch(self, poll_interval=0.0005):
+        """按序号顺序领取就绪的槽位并分发给评估进程"""
+        ring = self.ring
+        while not self.stop_event.is_set():
+            next_seq = self.next_seq
+            slot = next_seq % ring.slots
+            if ring.state(slot) != READY:
+                time.sleep(poll_interval)
+                continue
+
+            header = ring.read_header(slot)
+            if header['seq'] != next_seq:
+                time.sleep(poll_interval)
+                continue
+
+            # 等待空闲的评估进程
+            if not self.idle.acquire(timeout=0.05):
+                continue
+
+            if self.max_latency is not None and \
+                    time.monotonic() - header['timestamp'] > self.max_latency:
+                # 积压过久的帧直接跳过，保证延迟有界
+                ring.release(slot)
+                self.idle.release()
+                self.skipped += 1
+            else:
+                ring.claim(slot)
+                self.tasks.put((slot, next_seq))
+                self.dispatched += 1
+            self.next_seq = next_seq + 1
+
+    def stop(self, timeout=10):
+        """停止分发，等待已分发的帧完成后关闭评估进程并删除共享内存"""
+        self.stop_event.set()
+        if self.dispatcher is not None:
+            self.dispatcher.join()
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        mtf_metrics.QUEUE_DEPTH.set_function(None)
+        mtf_metrics.QUEUE_DEPTH.set(0)
+        self.ring.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def poll(self, timeout=None):
+        """
+        取一条评估结果
+
+        Args:
+            timeout: 等待时间（秒），None表示一直等待
+
+        Returns:
+            tuple: (seq, mtf50, sharpness_score, level, 计算耗时, 端到端延迟, 各阶段耗时,
+                    是否命中ROI跟踪)，超时返回None
+        """
+        try:
+            item = self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+        # 工作进程中的耗时在此汇总到指标（指标只存在于本进程）
+        self.completed += 1
+        seq, mtf50, score, level, elapsed, latency, stage_times, roi_hit = item
+        if mtf50 is not None:
+            result = 'ok'
+        elif level == NO_VALID_EDGE:
+            result = 'no_edge'
+        else:
+            result = 'failed'
+        mtf_metrics.record_evaluation(result, mtf50, level, dict(stage_times, end_to_end=latency),
+                                      busy=elapsed)
+        if self.track:
+            mtf_metrics.record_cache('roi_tracker', roi_hit)
+        return item
+
+
+def make_edge_frame(shape, blur=1.0, noise=2.0, angle=0.0, seed=0):
+    """
+    生成合成刃边测试帧（采集端桩程序使用）
+
+    Args:
+        shape: 帧形状 (h, w) 或 (h, w, channels)
+        blur: 刃边模糊程度（高斯sigma，像素）
+        noise: 噪声标准差（灰度级）
+        angle: 刃边倾斜角（度）
+        seed: 随机种子
+
+    Returns:
+        numpy.ndarray: uint8帧
+    """
+    height, width = shape[:2]
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    position = x - width / 2 - (y - height / 2) * np.tan(np.radians(angle))
+    edge = 0.5 * (1 + np.tanh(position / (blur * 1.2)))
+    frame = 40 + 170 * edge + rng.normal(0, noise, (height, width)).astype(np.float32)
+    frame = np.clip(frame, 0, 255).astype(np.uint8)
+    if len(shape) == 3:
+        frame = np.repeat(frame[..., np.newaxis], shape[2], axis=2)
+    return frame
+
+
+def synthetic_producer(name, shape, fps=30.0, frames=300, variants=8):
+    """
+    采集端桩程序：按固定帧率向环形缓冲区写入合成刃边帧
+
+    Args:
+        name: 共享内存名称
+        shape: 帧形状
+        fps: 帧率
+        frames: 写入的总帧数
+        variants: 预先生成的不同模糊程度的帧数（循环使用，避免生成开销影响帧率）
+    """
+    ring = FrameRing.attach(name)
+    try:
+        pool = [make_edge_frame(shape, blur=1.0 + 0.25 * k, seed=k) for k in range(variants)]
+        interval = 1.0 / fps
+        start = time.monotonic()
+        for i in range(frames):
+            # 按绝对时间节拍写入，避免误差累积
+            delay = start + i * interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            ring.write(pool[i % variants])
+    finally:
+        ring.close()
+
+
+def run_demo(shape=(1944, 2592), fps=30.0, seconds=10.0, slots=8, workers=None, track=True,
+             max_latency=None, **evaluator_options):
+    """
+    本地演示/压测：启动桩采集进程，以指定帧率写入合成帧并统计吞吐、丢帧和延迟
+
+    Args:
+        shape: 帧形状 (h, w) 或 (h, w, channels)
+        fps: 采集帧率
+        seconds: 运行时长（秒）
+        slots: 槽位数
+        workers: 评估进程数
+        track: 是否启用ROI跟踪
+        max_latency: 帧最长等待时间（秒）
+        **evaluator_options: 传给MTFSharpnessEvaluator的选项
+
+    Returns:
+        dict: 统计信息
+    """
+    frames = int(round(fps * seconds))
+    slot_bytes = int(np.prod(shape))
+
+    print("\n" + "="*90)
+    print("MTF共享内存帧接入（桩采集进程）")
+    print("="*90)
+    print(f"帧尺寸: {shape[1]}x{shape[0]}{'x' + str(shape[2]) if len(shape) == 3 else ''} | "
+          f"帧率: {fps:g} fps | 帧数: {frames} | 槽位: {slots}")
+
+    ingest = RingIngest(slots, slot_bytes, workers, track, max_latency, **evaluator_options)
+    with ingest:
+        print(f"共享内存: {ingest.name} | 评估进程: {ingest.workers}")
+        print("-"*90)
+        producer = mp.Process(target=synthetic_producer,
+                              args=(ingest.name, shape, fps, frames))
+        producer.start()
+
+        results = []
+        finished = []
+        while True:
+            item = ingest.poll(timeout=0.2)
+            if item is not None:
+                results.append(item)
+                finished.append(time.monotonic())
+            elif not producer.is_alive() and ingest.next_seq >= ingest.ring.counters()[0] \
+                    and len(results) >= ingest.dispatched:
+                # 采集结束，写入的帧已全部分发且完成
+                break
+        producer.join()
+        written, dropped = ingest.ring.counters()
+        skipped = ingest.skipped
+
+    latencies = np.array([r[5] for r in results]) * 1000
+    compute = np.array([r[4] for r in results]) * 1000
+    failed = sum(1 for r in results if r[1] is None)
+    stats = {
+        'frames': frames,
+        'written': written,
+        'dropped': dropped,
+        'skipped': skipped,
+        'processed': len(results),
+        'failed': failed,
+        # 吞吐按首帧完成到末帧完成计算（不含桩程序生成合成帧的启动时间）
+        'throughput': (len(finished) - 1) / (finished[-1] - finished[0])
+                      if len(finished) > 1 else 0.0,
+        'latency_p50': float(np.percentile(latencies, 50)) if len(results) else None,
+        'latency_p99': float(np.percentile(latencies, 99)) if len(results) else None,
+        'latency_max': float(latencies.max()) if len(results) else None,
+        'compute_avg': float(compute.mean()) if len(results) else None,
+    }
+
+    print(f"写入帧数: {written}/{frames} | 丢弃(槽位全忙): {dropped} | 跳过(超时): {skipped}")
+    print(f"完成帧数: {stats['processed']} | 失败: {failed} | 吞吐: {stats['throughput']:.1f} fps")
+    if results:
+        print(f"单帧计算: {stats['compute_avg']:.1f} ms | 端到端延迟 p50/p99/max: "
+              f"{stats['latency_p50']:.1f}/{stats['latency_p99']:.1f}/{stats['latency_max']:.1f} ms")
+    print("="*90 + "\n")
+    return stats
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(
+        description='MTF共享内存帧环形缓冲区接入',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用示例:
+  # 创建环形缓冲区并持续评估，采集进程用 FrameRing.attach(名称, external=True) 写入
+  python mtf_ingest.py --name mtf_cam0 --frame 2592x1944
+
+  # 本地压测：桩采集进程以30fps写入500万像素合成帧
+  python mtf_ingest.py --demo --frame 2592x1944 --fps 30 --seconds 10
+        """
+    )
+    parser.add_argument('--name', help='共享内存名称（默认自动生成）')
+    parser.add_argument('--frame', type=parse_frame_shape, default=(1944, 2592),
+                        help='最大帧尺寸，宽x高[x通道]（默认: 2592x1944）')
+    parser.add_argument('--slots', type=int, default=8, help='槽位数（默认: 8）')
+    parser.add_argument('--workers', type=int, help='评估进程数（默认: CPU核数）')
+    parser.add_argument('--no-track', action='store_true', help='关闭ROI跟踪（不同工位的帧混合时使用）')
+    parser.add_argument('--max-latency', type=float, metavar='SECONDS',
+                        help='帧在缓冲区中的最长等待时间，超过时跳过该帧')
+    parser.add_argument('--precision', choices=sorted(PRECISIONS), default='float32',
+                        help='数值精度（默认: float32）')
+    parser.add_argument('--precheck', action='store_true', help='快速预检，无有效边缘的帧不做完整计算')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='在本机该端口提供OpenMetrics/Prometheus指标端点 /metrics')
+    parser.add_argument('--demo', action='store_true', help='启动桩采集进程做本地压测')
+    parser.add_argument('--fps', type=float, default=30.0, help='桩采集帧率（默认: 30）')
+    parser.add_argument('--seconds', type=float, default=10.0, help='桩采集时长（默认: 10秒）')
+
+    args = parser.parse_args()
+
+    evaluator_options = {
+        'precision': args.precision,
+        'precheck': args.precheck,
+    }
+
+    if args.metrics_port is not None:
+        server = mtf_metrics.start_metrics_server(args.metrics_port)
+        print(f"指标端点: http://127.0.0.1:{server.server_address[1]}/metrics")
+
+    if args.demo:
+        run_demo(args.frame, args.fps, args.seconds, args.slots, args.workers,
+                 not args.no_track, args.max_latency, **evaluator_options)
+        return 0
+
+    ingest = RingIngest(args.slots, int(np.prod(args.frame)), args.workers, not args.no_track,
+                        args.max_latency, args.name, **evaluator_options)
+    with ingest:
+        print(f"共享内存: {ingest.name} | 槽位: {args.slots} | 评估进程: {ingest.workers}")
+        print("等待采集进程写入（Ctrl+C 退出）...")
+        try:
+            while True:
+                item = ingest.poll()
+                seq, mtf50, score, level, elapsed, latency = item[:6]
+                if mtf50 is not None:
+                    print(f"✓ #{seq}: MTF50={mtf50:.4f} | 评分={score:.2f} | {level} | "
+                          f"延迟 {latency * 1000:.1f} ms")
+                else:
+                    print(f"⊘ #{seq}: {level} | 延迟 {latency * 1000:.1f} ms")
+        except KeyboardInterrupt:
+            written, dropped = ingest.ring.counters()
+            print(f"\n写入帧数: {written} | 丢弃: {dropped} | 跳过: {ingest.skipped}")
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
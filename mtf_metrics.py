@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MTF评估运行指标 - OpenMetrics/Prometheus导出
+计数器、仪表和直方图在内存中预聚合（每次更新只是一次加法），
+抓取时才格式化为文本；可选在本地端口上以HTTP提供 /metrics。
+"""
+
+import bisect
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# OpenMetrics与Prometheus文本格式的Content-Type
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 阶段耗时直方图的桶（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# MTF50分布直方图的桶（cycles/pixel），与清晰度等级的分界对齐
+MTF50_BUCKETS = (0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4, 0.45, 0.5)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+               for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+class _Metric:
+    """带标签的指标基类：每组标签值对应一个预聚合的子项"""
+
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def labels(self, *values):
+        """
+        按标签值取子项（首次访问时创建，之后只是一次字典查找）
+
+        Args:
+            *values: 与labelnames顺序一致的标签值
+
+        Returns:
+            子项对象
+        """
+        key = tuple(map(str, values))
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        # 无标签指标直接在唯一子项上更新
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def samples(self):
+        """
+        Yields:
+            tuple: (样本名后缀, 标签值, 额外标签, 数值)
+        """
+        raise NotImplementedError
+
+
+class _CounterChild:
+    __slots__ = ('value', 'lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        if amount < 0:
+            raise ValueError("计数器只能增加")
+        with self.lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield '_total', key, (), child.value
+
+
+class _GaugeChild:
+    __slots__ = ('value', 'function', 'lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self.function = None
+        self.lock = threading.Lock()
+
+    def set(self, value):
+        self.value = float(value)
+
+    def inc(self, amount=1.0):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+    def set_function(self, function):
+        """抓取时调用function取值（如队列深度），不需要持续更新"""
+        self.function = function
+
+    def get(self):
+        return float(self.function()) if self.function is not None else self.value
+
+
+class Gauge(_Metric):
+    """可增可减的仪表"""
+
+    type_name = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount=1.0):
+        self._default().dec(amount)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield '', key, (), child.get()
+
+
+class _HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum', 'lock')
+
+    def __init__(self, upper_bounds):
+        self.upper_bounds = upper_bounds
+        # 每个桶只记录落入本桶的次数，抓取时再累加成累积计数
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(_Metric):
+    """固定桶直方图"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.upper_bounds = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (math.inf,), counts):
+                cumulative += count
+                yield '_bucket', key, (('le', _format_value(bound)),), cumulative
+            yield '_count', key, (), cumulative
+            yield '_sum', key, (), total
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"指标已注册: {metric.name}")
+            self._metrics[metric.name] = metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def expose(self, openmetrics=True):
+        """
+        生成文本格式的指标
+
+        Args:
+            openmetrics: True为OpenMetrics格式，False为Prometheus文本格式0.0.4
+
+        Returns:
+            str: 指标文本
+        """
+        lines = []
+        for metric in list(self._metrics.values()):
+            # Prometheus 0.0.4 格式中计数器的TYPE行使用带 _total 的样本名
+            family = metric.name
+            if metric.type_name == 'counter' and not openmetrics:
+                family += '_total'
+            lines.append(f'# HELP {family} {metric.documentation}')
+            lines.append(f'# TYPE {family} {metric.type_name}')
+            for suffix, key, extra, value in metric.samples():
+                labels = _format_labels(metric.labelnames, key, extra)
+                lines.append(f'{metric.name}{suffix}{labels} {_format_value(value)}')
+        if openmetrics:
+            lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
+
+
+# 默认注册表
+REGISTRY = Registry()
+
+# 评估流水线的标准指标
+IMAGES_TOTAL = Counter('mtf_images', '已评估的图像数（result: ok/no_edge/failed）', ('result',))
+STAGE_SECONDS = Histogram('mtf_stage_seconds', '各阶段耗时（秒）', ('stage',))
+MTF50 = Histogram('mtf_mtf50', '按清晰度等级的MTF50分布（cycles/pixel）', ('level',),
+                  buckets=MTF50_BUCKETS)
+QUEUE_DEPTH = Gauge('mtf_queue_depth', '等待评估的帧数')
+WORKERS = Gauge('mtf_workers', '评估工作进程/线程数')
+WORKER_BUSY_SECONDS = Counter('mtf_worker_busy_seconds', '工作进程累计计算时间（秒），'
+                              '利用率 = rate(busy) / workers')
+CACHE_REQUESTS = Counter('mtf_cache_requests', '缓存查询次数（cache: 缓存名, result: hit/miss）',
+                         ('cache', 'result'))
+WORKER_RESTARTS = Counter('mtf_worker_restarts', '工作进程重启次数（reason: timeout/memory/crash/recycle）',
+                          ('reason',))
+
+
+def record_evaluation(result, mtf50=None, level=None, stage_times=None, busy=None):
+    """
+    记录一次评估的结果（各项更新均为预聚合的加法）
+
+    Args:
+        result: 'ok'、'no_edge' 或 'failed'
+        mtf50: MTF50值（成功时）
+        level: 清晰度等级（成功时）
+        stage_times: 各阶段耗时 {阶段名: 秒}
+        busy: 本次评估占用工作进程的时间（秒）
+    """
+    IMAGES_TOTAL.labels(result).inc()
+    if mtf50 is not None:
+        MTF50.labels(level).observe(mtf50)
+    if stage_times:
+        for stage, seconds in stage_times.items():
+            STAGE_SECONDS.labels(stage).observe(seconds)
+    if busy is not None:
+        WORKER_BUSY_SECONDS.inc(busy)
+
+
+def record_cache(cache, hit):
+    """
+    记录一次缓存查询
+
+    Args:
+        cache: 缓存名称（如 'roi_tracker'）
+        hit: 是否命中
+    """
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        openmetrics = 'application/openmetrics-text' in self.headers.get('Accept', '')
+        body = self.registry.expose(openmetrics).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type',
+                         OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 抓取请求不打印到控制台
+        pass
+
+
+def start_metrics_server(port=9108, addr='127.0.0.1', registry=None):
+    """
+    在后台线程中启动 /metrics HTTP端点
+
+    Args:
+        port: 监听端口（0表示自动分配）
+        addr: 监听地址（默认仅本机）
+        registry: 指标注册表，None表示默认注册表
+
+    Returns:
+        ThreadingHTTPServer: 服务器对象（server_address给出实际端口，shutdown()停止）
+    """
+    handler = type('MetricsHandler', (_MetricsHandler,),
+                   {'registry': REGISTRY if registry is None else registry})
+    server = ThreadingHTTPServer((addr, port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
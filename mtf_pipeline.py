@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MTF分阶段流水线与阶段缓存
+把 compute_mtf_sharpness 的默认路径（全分辨率梯度、强边缘边界框ROI）按显式阶段执行
+    decode → gradient → edge → roi → projection → esf → lsf → mtf → metrics
+各阶段调用评估器的同一组方法，每个阶段的输出以“上游阶段的键 + 本阶段参数”为键缓存
+（内存LRU，可选磁盘目录），调参时（LSF的sigma、强边缘百分位阈值、ROI边距、插值倍数、
+MTF阈值）只重算该参数之后的阶段。默认参数下结果与 compute_mtf_sharpness 逐位一致；
+改变ROI定位或计算方式的评估器选项（金字塔、分块、多线程、line模式、预检、bootstrap）
+不在阶段中实现，取非默认值时报错，而不是静默忽略。
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import mtf_metrics
+from mtf_kernels import get_kernels
+from mtf_sharpness import MTFSharpnessEvaluator
+
+
+# 阶段顺序
+STAGES = ('decode', 'gradient', 'edge', 'roi', 'projection', 'esf', 'lsf', 'mtf', 'metrics')
+
+# 各阶段的参数及默认值（与 compute_mtf_sharpness 一致）
+STAGE_PARAMS = {
+    'decode': {},
+    'gradient': {},
+    'edge': {'percentile': 95},
+    'roi': {'margin': 50},
+    'projection': {},
+    'esf': {'oversample': 4},
+    'lsf': {'sigma': 2},
+    'mtf': {},
+    'metrics': {'thresholds': (0.5, 0.3, 0.1)},
+}
+
+# 各阶段依赖的上游阶段（键沿第一个依赖链传递）
+STAGE_INPUTS = {
+    'decode': (),
+    'gradient': ('decode',),
+    'edge': ('gradient', 'decode'),
+    'roi': ('edge', 'decode'),
+    'projection': ('roi', 'decode'),
+    'esf': ('projection',),
+    'lsf': ('esf',),
+    'mtf': ('lsf',),
+    'metrics': ('mtf',),
+}
+
+PARAM_STAGE = {name: stage for stage, params in STAGE_PARAMS.items() for name in params}
+
+# 阶段中没有实现的评估器选项及其默认值（取其他值时 compute_mtf_sharpness 走另一条路径）
+UNSUPPORTED_OPTIONS = {
+    'pyramid_levels': 0,
+    'memory_budget': None,
+    'threads': 1,
+    'roi_mode': 'bbox',
+    'precheck': False,
+    'bootstrap': 0,
+}
+
+
+def _nbytes(value):
+    """缓存值占用的内存（数组按nbytes，其余按小对象计）"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(_nbytes(v) for v in value.values())
+    return 64
+
+
+class StageCache:
+    """阶段输出缓存：内存中按字节数LRU淘汰，可选落盘（跨进程、跨次运行复用）"""
+
+    def __init__(self, max_bytes=1 << 30, directory=None):
+        """
+        Args:
+            max_bytes: 内存缓存的字节上限
+            directory: 磁盘缓存目录（None表示只用内存）
+        """
+        self.max_bytes = int(max_bytes)
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.pkl')
+
+    def _remember(self, key, value):
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def get(self, key):
+        """
+        查询缓存（内存未命中时查磁盘，命中后放回内存）
+
+        Args:
+            key: 阶段键
+
+        Returns:
+            tuple: (是否命中, 值)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return True, entry[0]
+        if self.directory is not None:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    value = pickle.load(f)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                return False, None
+            self._remember(key, value)
+            return True, value
+        return False, None
+
+    def put(self, key, value):
+        """
+        写入缓存（磁盘文件先写临时文件再改名，并发写入同一个键也不会读到半个文件）
+
+        Args:
+            key: 阶段键
+            value: 阶段输出
+        """
+        self._remember(key, value)
+        if self.directory is not None:
+            path = self._path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, path)
+
+    def clear(self):
+        """清空内存缓存（磁盘缓存保留）"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @property
+    def nbytes(self):
+        """内存缓存当前占用的字节数"""
+        return self._bytes
+
+
+class MTFPipeline:
+    """分阶段、带缓存的MTF刃边法流水线"""
+
+    def __init__(self, cache=None, precision='float64', backend='numpy', **evaluator_options):
+        """
+        Args:
+            cache: 阶段缓存（StageCache，默认1GB内存LRU）
+            precision: 数值精度（影响所有阶段，计入缓存键）
+            backend: ESF/LSF/MTF50计算内核（计入缓存键）
+            **evaluator_options: 其余MTFSharpnessEvaluator选项，只接受 UNSUPPORTED_OPTIONS
+                                 中的默认值（便于直接传入命令行的评估选项）
+
+        Raises:
+            ValueError: 选项取了阶段中没有实现的值，或不是评估器选项
+        """
+        for name, value in evaluator_options.items():
+            if name not in UNSUPPORTED_OPTIONS:
+                raise ValueError(f"未知的评估器选项: {name}")
+            if value != UNSUPPORTED_OPTIONS[name]:
+                raise ValueError(f"分阶段流水线不支持 {name}={value!r}（只实现全分辨率bbox路径），"
+                                 f"请改用 MTFSharpnessEvaluator.compute_mtf_sharpness")
+        self.cache = cache if cache is not None else StageCache()
+        self.options = {'precision': precision, 'backend': backend}
+        # 各阶段所用的计算内核（参数扫描在堆叠的ESF上复用同一内核）
+        self.kernels = get_kernels(backend)
+        # 最近一次评估各阶段的缓存情况：'hit'、'miss'，未用到的阶段不出现
+        self.last_run = {}
+
+    @staticmethod
+    def parse_params(params):
+        """
+        合并默认参数并检查参数名
+
+        Args:
+            params: 参数字典（percentile、margin、oversample、sigma、thresholds）
+
+        Returns:
+            dict: 阶段名 → 该阶段的参数字典
+        """
+        unknown = set(params) - set(PARAM_STAGE)
+        if unknown:
+            raise ValueError(f"未知的流水线参数: {', '.join(sorted(unknown))}"
+                             f"（可选: {', '.join(PARAM_STAGE)}）")
+        staged = {stage: dict(defaults) for stage, defaults in STAGE_PARAMS.items()}
+        for name, value in params.items():
+            if name == 'thresholds':
+                value = tuple(float(v) for v in value)
+            staged[PARAM_STAGE[name]][name] = value
+        return staged
+
+    def _source_key(self, image_path, data):
+        if data is not None:
+            source = ('bytes', hashlib.sha1(data).hexdigest())
+        else:
+            stat = os.stat(image_path)
+            source = ('file', os.path.abspath(image_path), stat.st_size, stat.st_mtime_ns)
+        return repr((source, sorted(self.options.items())))
+
+    def stage_keys(self, image_path=None, data=None, **params):
+        """
+        计算各阶段的缓存键（只依赖输入来源和参数，不需要执行任何阶段）
+
+        Returns:
+            dict: 阶段名 → 键
+        """
+        staged = self.parse_params(params)
+        keys = {}
+        for stage in STAGES:
+            inputs = STAGE_INPUTS[stage]
+            parent = keys[inputs[0]] if inputs else self._source_key(image_path, data)
+            text = repr((parent, stage, sorted(staged[stage].items())))
+            keys[stage] = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        return keys
+
+    def _session(self, image_path, data, params):
+        """
+        为一张图像和一组参数准备按需执行阶段的函数
+
+        Returns:
+            function: get(stage) → 阶段输出（先查缓存，未命中时递归计算上游阶段）
+        """
+        staged = self.parse_params(params)
+        keys = self.stage_keys(image_path, data, **params)
+        if data is not None:
+            evaluator = MTFSharpnessEvaluator.from_bytes(data, **self.options)
+        else:
+            evaluator = MTFSharpnessEvaluator(image_path, **self.options)
+        values = {}
+
+        def compute(stage, inputs):
+            p = staged[stage]
+            if stage == 'decode':
+                return evaluator.load_image()
+            if stage == 'gradient':
+                evaluator.gray = inputs['decode']
+                return evaluator.gradient_magnitude()
+            if stage == 'edge':
+                # 强边缘像素的边界框（百分位阈值），边距在roi阶段再加
+                evaluator.gray = inputs['decode']
+                evaluator.roi_from_gradient(inputs['gradient'], 0, p['percentile'])
+                return evaluator.edge_bbox, evaluator.roi_threshold
+            if stage == 'roi':
+                evaluator.gray = inputs['decode']
+                edge_bbox = inputs['edge'][0]
+                if edge_bbox is None:
+                    # 没有强边缘像素时使用整个图像
+                    return (0, evaluator.gray.shape[0], 0, evaluator.gray.shape[1])
+                evaluator._crop_roi(edge_bbox, p['margin'])
+                return evaluator.roi_bbox
+            if stage == 'projection':
+                y0, y1, x0, x1 = inputs['roi']
+                esf = evaluator.project_edge(inputs['decode'][y0:y1, x0:x1])
+                return esf, evaluator.edge_orientation
+            if stage == 'esf':
+                return evaluator.interpolate_esf(inputs['projection'][0], p['oversample'])
+            if stage == 'lsf':
+                return evaluator.compute_lsf(inputs['esf'], p['sigma'])
+            if stage == 'mtf':
+                return evaluator.compute_mtf_from_lsf(inputs['lsf'])
+            frequencies, mtf = inputs['mtf']
+            metrics = evaluator.compute_metrics(frequencies, mtf, p['thresholds'])
+            return {k: v for k, v in metrics.items() if k not in ('frequencies', 'mtf_curve')}
+
+        def get(stage):
+            if stage in values:
+                return values[stage]
+            hit, value = self.cache.get(keys[stage])
+            mtf_metrics.record_cache(f'pipeline_{stage}', hit)
+            if not hit:
+                value = compute(stage, {name: get(name) for name in STAGE_INPUTS[stage]})
+                self.cache.put(keys[stage], value)
+            self.last_run[stage] = 'hit' if hit else 'miss'
+            values[stage] = value
+            return value
+
+        return get
+
+    def stage(self, name, image_path=None, data=None, **params):
+        """
+        取得某个阶段的输出（只执行该阶段及缓存未命中的上游阶段）
+
+        Args:
+            name: 阶段名，见 STAGES
+            image_path: 图像路径
+            data: 编码后的图像字节
+            **params: 阶段参数
+
+        Returns:
+            阶段输出：decode为灰度图，projection为 (ESF, 边缘方向)，esf/lsf为曲线，
+            mtf为 (frequencies, mtf)，metrics为指标字典
+        """
+        if name not in STAGES:
+            raise ValueError(f"未知的阶段: {name}（可选: {', '.join(STAGES)}）")
+        self.last_run = {}
+        return self._session(image_path, data, params)(name)
+
+    def evaluate(self, image_path=None, data=None, **params):
+        """
+        评估一张图像，命中缓存的阶段及其全部上游阶段都不再计算
+
+        Args:
+            image_path: 图像路径
+            data: 编码后的图像字节（给出时不读image_path）
+            **params: 阶段参数，见 STAGE_PARAMS
+
+        Returns:
+            dict: 与 compute_mtf_sharpness 相同的结果，另含 roi_bbox、edge_orientation
+        """
+        self.last_run = {}
+        get = self._session(image_path, data, params)
+        results = dict(get('metrics'))
+        frequencies, mtf = get('mtf')
+        results['frequencies'] = frequencies
+        results['mtf_curve'] = mtf
+        results['roi_bbox'] = get('roi')
+        results['edge_orientation'] = get('projection')[1]
+        return results
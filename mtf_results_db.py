@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MTF评估结果数据库（SQLite）
+批量评估时可选地把每张图像的结果写入数据库，按文件名、运行号、时间、MTF50、
+等级和工位建立索引；query 子命令的Top-N、范围和等级查询直接走索引。
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+from datetime import datetime
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id    INTEGER PRIMARY KEY,
+    started   REAL NOT NULL,
+    source    TEXT,
+    station   TEXT,
+    options   TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    id        INTEGER PRIMARY KEY,
+    run_id    INTEGER NOT NULL REFERENCES runs(run_id),
+    filename  TEXT NOT NULL,
+    path      TEXT,
+    station   TEXT,
+    timestamp REAL NOT NULL,
+    mtf50     REAL,
+    score     REAL,
+    level     TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_results_filename ON results(filename);
+CREATE INDEX IF NOT EXISTS idx_results_run ON results(run_id, mtf50);
+CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results(timestamp);
+CREATE INDEX IF NOT EXISTS idx_results_mtf50 ON results(mtf50);
+CREATE INDEX IF NOT EXISTS idx_results_level ON results(level, mtf50);
+CREATE INDEX IF NOT EXISTS idx_results_station ON results(station, timestamp);
+CREATE INDEX IF NOT EXISTS idx_results_station_mtf50 ON results(station, mtf50);
+"""
+
+# 查询结果的列
+RESULT_COLUMNS = ('run_id', 'filename', 'path', 'station', 'timestamp', 'mtf50', 'score', 'level')
+
+
+class ResultsDB:
+    """评估结果数据库（写入按批提交，一个批量运行对应一个run_id）"""
+
+    def __init__(self, path, batch_size=1000):
+        """
+        打开（不存在时创建）结果数据库
+
+        Args:
+            path: SQLite数据库文件路径
+            batch_size: 每批提交的结果行数
+        """
+        self.path = path
+        self.batch_size = max(1, int(batch_size))
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._pending = []
+        self._written = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def start_run(self, source, station=None, options=None):
+        """
+        登记一次批量运行
+
+        Args:
+            source: 数据来源（如文件夹路径）
+            station: 工位/相机名称（该运行所有结果的默认工位）
+            options: 评估选项（保存为JSON）
+
+        Returns:
+            int: run_id
+        """
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (started, source, station, options) VALUES (?, ?, ?, ?)",
+                (time.time(), source, station, json.dumps(options or {}, ensure_ascii=False, default=str)))
+        return cursor.lastrowid
+
+    def add(self, run_id, path, mtf50, score, level, station=None, timestamp=None):
+        """
+        记录一张图像的结果（缓冲，满一批时提交）
+
+        Args:
+            run_id: start_run 返回的运行号
+            path: 图像路径
+            mtf50: MTF50值（失败或无有效边缘时为None）
+            score: 清晰度评分
+            level: 清晰度等级（或“无有效边缘”、“错误”）
+            station: 工位/相机名称
+            timestamp: 采集时间（Unix时间）。None时取图像文件的修改时间，文件不存在时取当前时间
+        """
+        if timestamp is None:
+            try:
+                timestamp = os.path.getmtime(path)
+            except (OSError, TypeError):
+                timestamp = time.time()
+        filename = os.path.basename(str(path))
+        self._pending.append((run_id, filename, str(path), station, float(timestamp),
+                              None if mtf50 is None else float(mtf50),
+                              None if score is None else float(score), level))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, rows):
+        """
+        批量写入已整理好的结果行（导入历史数据用）
+
+        Args:
+            rows: 可迭代的 (run_id, filename, path, station, timestamp, mtf50, score, level)
+        """
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO results (run_id, filename, path, station, timestamp, mtf50, score, level) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self._written = True
+
+    def flush(self):
+        """提交缓冲中的结果"""
+        if self._pending:
+            self.add_many(self._pending)
+            self._pending = []
+
+    def close(self):
+        """提交剩余结果并关闭数据库"""
+        if self.conn is None:
+            return
+        self.flush()
+        if self._written:
+            # 写入后更新查询规划器的统计信息（抽样分析，大表也只需毫秒级）
+            self.conn.execute("PRAGMA analysis_limit=1000")
+            self.conn.execute("PRAGMA optimize")
+        self.conn.close()
+        self.conn = None
+
+    def query(self, top=None, bottom=None, min_mtf50=None, max_mtf50=None, level=None,
+              station=None, run_id=None, since=None, until=None, filename=None, limit=None):
+        """
+        查询结果
+
+        Args:
+            top: 按MTF50从高到低取前N条
+            bottom: 按MTF50从低到高取前N条
+            min_mtf50: MTF50下限（包含）
+            max_mtf50: MTF50上限（不包含）
+            level: 清晰度等级
+            station: 工位/相机名称
+            run_id: 运行号
+            since: 起始时间（Unix时间，包含）
+            until: 截止时间（Unix时间，不包含）
+            filename: 文件名，含 * ? [ 时按通配符匹配
+            limit: 未指定top/bottom时的最大返回条数（有MTF50范围或等级条件时按MTF50升序，否则按时间倒序）
+
+        Returns:
+            list: 结果字典列表
+        """
+        where, params = [], []
+        for column, op, value in (('mtf50', '>=', min_mtf50), ('mtf50', '<', max_mtf50),
+                                  ('level', '=', level), ('station', '=', station),
+                                  ('run_id', '=', run_id), ('timestamp', '>=', since),
+                                  ('timestamp', '<', until)):
+            if value is not None:
+                where.append(f"{column} {op} ?")
+                params.append(value)
+        if filename is not None:
+            where.append("filename GLOB ?" if re.search(r'[*?\[]', filename) else "filename = ?")
+            params.append(filename)
+
+        sql = f"SELECT {', '.join(RESULT_COLUMNS)} FROM results"
+        if top is not None or bottom is not None:
+            # 排序的Top-N沿MTF50所在的索引扫描，找到N条即停止
+            where.append("mtf50 IS NOT NULL")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if top is not None:
+            sql += " ORDER BY mtf50 DESC LIMIT ?"
+            params.append(int(top))
+        elif bottom is not None:
+            sql += " ORDER BY mtf50 ASC LIMIT ?"
+            params.append(int(bottom))
+        elif limit is not None:
+            # 有MTF50范围或等级条件时按MTF50升序（沿范围索引读取），否则最新的在前
+            by_mtf50 = min_mtf50 is not None or max_mtf50 is not None or level is not None
+            sql += " ORDER BY mtf50 ASC LIMIT ?" if by_mtf50 else " ORDER BY timestamp DESC LIMIT ?"
+            params.append(int(limit))
+
+        cursor = self.conn.execute(sql, params)
+        return [dict(zip(RESULT_COLUMNS, row)) for row in cursor]
+
+    def runs(self, limit=20):
+        """
+        最近的批量运行及其结果数
+
+        Args:
+            limit: 返回的运行数
+
+        Returns:
+            list: 运行信息字典列表（新的在前）
+        """
+        cursor = self.conn.execute(
+            "SELECT r.run_id, r.started, r.source, r.station, "
+            "(SELECT COUNT(*) FROM results WHERE run_id = r.run_id) "
+            "FROM runs r ORDER BY r.run_id DESC LIMIT ?", (int(limit),))
+        return [dict(zip(('run_id', 'started', 'source', 'station', 'count'), row)) for row in cursor]
+
+
+def parse_time(text):
+    """
+    解析时间：相对时间如 "7d"、"12h"、"30m"（距现在），或 "2025-09-01"、"2025-09-01 08:00"
+
+    Args:
+        text: 时间字符串
+
+    Returns:
+        float: Unix时间
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([smhdw])\s*', text, re.IGNORECASE)
+    if match:
+        value, unit = match.groups()
+        seconds = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}[unit.lower()]
+        return time.time() - float(value) * seconds
+    try:
+        return datetime.fromisoformat(text.strip()).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无法解析时间: {text}（示例: 7d、12h、2025-09-01、2025-09-01 08:00）")
+
+
+def _format_time(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def print_query_results(rows, elapsed):
+    """
+    打印查询结果
+
+    Args:
+        rows: ResultsDB.query 的返回结果
+        elapsed: 查询耗时（秒）
+    """
+    print("\n" + "="*110)
+    print(f"{'序号':<6} {'文件名':<35} {'MTF50':<10} {'等级':<10} {'工位':<12} {'采集时间':<20} {'运行':<6}")
+    print("-"*110)
+    for i, r in enumerate(rows, 1):
+        mtf50 = f"{r['mtf50']:.4f}" if r['mtf50'] is not None else "-"
+        print(f"{i:<6} {r['filename']:<35} {mtf50:<10} {r['level'] or '-':<10} {r['station'] or '-':<12} "
+              f"{_format_time(r['timestamp']):<20} {r['run_id']:<6}")
+    print("-"*110)
+    print(f"共 {len(rows)} 条 | 查询耗时 {elapsed * 1000:.1f} ms")
+    print("="*110 + "\n")
+
+
+def main(argv=None):
+    """命令行入口：mtf_sharpness.py query DB [条件]"""
+    parser = argparse.ArgumentParser(
+        prog='mtf_sharpness.py query',
+        description='查询MTF评估结果数据库',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例:
+  # 3号工位最近一周最清晰的50帧
+  python mtf_sharpness.py query results.db --station 3 --since 7d --top 50
+
+  # MTF50低于0.08的所有“模糊”帧
+  python mtf_sharpness.py query results.db --level 模糊 --max 0.08
+
+  # 列出最近的批量运行
+  python mtf_sharpness.py query results.db --runs
+        """)
+    parser.add_argument('db', help='结果数据库路径（批量评估时用 --db 生成）')
+    order = parser.add_mutually_exclusive_group()
+    order.add_argument('--top', type=int, metavar='N', help='MTF50最高的N条')
+    order.add_argument('--bottom', type=int, metavar='N', help='MTF50最低的N条')
+    parser.add_argument('--min', type=float, dest='min_mtf50', help='MTF50下限（包含）')
+    parser.add_argument('--max', type=float, dest='max_mtf50', help='MTF50上限（不包含）')
+    parser.add_argument('--level', help='清晰度等级（如 模糊、清晰、无有效边缘）')
+    parser.add_argument('--station', help='工位/相机名称')
+    parser.add_argument('--run', type=int, dest='run_id', help='运行号')
+    parser.add_argument('--since', type=parse_time, help='起始时间（如 7d、2025-09-01）')
+    parser.add_argument('--until', type=parse_time, help='截止时间')
+    parser.add_argument('--filename', help='文件名（支持 * ? 通配符）')
+    parser.add_argument('--limit', type=int, default=100,
+                        help='未指定 --top/--bottom 时最多显示的条数；有 --min/--max/--level 条件时按MTF50从低到高，'
+                             '否则按时间从新到旧（默认: 100）')
+    parser.add_argument('--runs', action='store_true', help='列出最近的批量运行')
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.db):
+        print(f"\n错误: 数据库不存在: {args.db}\n")
+        return 1
+
+    with ResultsDB(args.db) as db:
+        if args.runs:
+            print("\n" + "="*110)
+            print(f"{'运行':<6} {'开始时间':<20} {'工位':<12} {'结果数':<10} {'来源'}")
+            print("-"*110)
+            for run in db.runs():
+                print(f"{run['run_id']:<6} {_format_time(run['started']):<20} {run['station'] or '-':<12} "
+                      f"{run['count']:<10} {run['source'] or '-'}")
+            print("="*110 + "\n")
+            return 0
+
+        start = time.perf_counter()
+        rows = db.query(top=args.top, bottom=args.bottom, min_mtf50=args.min_mtf50,
+                        max_mtf50=args.max_mtf50, level=args.level, station=args.station,
+                        run_id=args.run_id, since=args.since, until=args.until,
+                        filename=args.filename, limit=args.limit)
+        print_query_results(rows, time.perf_counter() - start)
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MTF批量评估的内存预算调度
+先只读图像文件头（不解码）得到尺寸和通道数，估算每张图像评估时的峰值内存，
+再按 --max-memory 预算动态决定同时评估的图像数：小图多并发，大图少并发；
+大图排在前面，避免批次末尾只剩一张大图单独运行拖长总耗时。
+"""
+
+import io
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+from PIL import Image
+
+import mtf_metrics
+from mtf_sharpness import PEAK_BYTES_PER_PIXEL, PRECISIONS
+
+
+# 分块模式的实际峰值相对内存预算的余量（分块光晕、ESF投影累加等）
+TILE_OVERHEAD = 1.25
+
+# 多线程模式每像素的额外内存（字节，int32梯度幅值平方及条带临时数组）
+THREAD_BYTES_PER_PIXEL = 8
+
+# PIL模式对应的解码后通道数和每通道字节数（调色板等模式会先转换为RGB）
+MODE_LAYOUT = {
+    '1': (1, 1), 'L': (1, 1), 'P': (3, 1), 'RGB': (3, 1), 'RGBA': (4, 1),
+    'I;16': (1, 2), 'I': (1, 4), 'F': (1, 4),
+}
+
+
+def read_image_header(path):
+    """
+    只读取文件头得到图像尺寸（PIL延迟解码，不读像素数据）
+
+    Args:
+        path: 图像路径或可定位的文件对象
+
+    Returns:
+        tuple: (width, height, mode, format)，无法识别时返回None
+    """
+    try:
+        with Image.open(path) as image:
+            return image.width, image.height, image.mode, image.format
+    except Exception:
+        return None
+
+
+def estimate_peak_memory(width, height, mode='L', mapped=False, precision='float64',
+                         memory_budget=None, threads=1, **_):
+    """
+    估算评估一张图像的峰值工作内存
+
+    解码后的图像和uint8灰度图常驻；其上叠加亮度转换的浮点临时数组（彩色图像）与
+    全分辨率流水线（PEAK_BYTES_PER_PIXEL，按精度折算）中较大的一个。分块模式下
+    流水线部分以内存预算为上限，可内存映射的8位灰度BMP文件不计解码内存。
+
+    Args:
+        width, height: 图像尺寸
+        mode: PIL图像模式
+        mapped: 是否为分块模式下可直接内存映射的8位灰度BMP文件
+        precision: 数值精度
+        memory_budget: 评估器的分块内存预算（None表示全分辨率处理）
+        threads: 单张图像内部的线程数
+
+    Returns:
+        int: 估算的峰值字节数
+    """
+    pixels = width * height
+    itemsize = np.dtype(PRECISIONS[precision][0]).itemsize
+    channels, depth = MODE_LAYOUT.get(mode, (3, 1))
+
+    pipeline = pixels * PEAK_BYTES_PER_PIXEL * itemsize // 8
+    if threads > 1:
+        pipeline += pixels * THREAD_BYTES_PER_PIXEL
+    if memory_budget is not None and pixels * PEAK_BYTES_PER_PIXEL > memory_budget:
+        pipeline = min(pipeline, int(memory_budget * TILE_OVERHEAD))
+        if mapped:
+            return pipeline
+
+    if channels == 1:
+        return pixels * depth + pixels + pipeline
+    # 彩色图像：uint8→浮点的亮度转换临时数组（各通道 + 结果）
+    luma = pixels * (channels + 1) * itemsize
+    return pixels * channels + pixels + max(luma, pipeline)
+
+
+class MemoryScheduler:
+    """按内存预算动态并发的批量调度器（线程池，OpenCV/NumPy内核释放GIL）"""
+
+    def __init__(self, max_memory, max_workers=None):
+        """
+        Args:
+            max_memory: 同时评估的图像估算峰值内存之和的上限（字节），None表示只限制并发数
+            max_workers: 最大并发数（默认为CPU核数）
+        """
+        if max_memory is not None and max_memory <= 0:
+            raise ValueError(f"内存预算必须为正数: {max_memory}")
+        self.max_memory = int(max_memory) if max_memory is not None else None
+        self.max_workers = max(1, int(max_workers or os.cpu_count() or 1))
+        # 运行统计
+        self.peak_workers = 0
+        self.peak_reserved = 0
+        self.tiled = 0
+        self.oversized = 0
+
+    def _job(self, path, header, mapped, options, extra=0):
+        if header is None:
+            return path, extra, options
+        width, height, mode, image_format = header
+        mapped = mapped and mode == 'L' and image_format == 'BMP'
+        cost = estimate_peak_memory(width, height, mode, mapped, **options)
+        if (self.max_memory is not None and cost + extra > self.max_memory
+                and options.get('memory_budget') is None):
+            options = dict(options, memory_budget=int(self.max_memory / TILE_OVERHEAD))
+            self.tiled += 1
+            cost = estimate_peak_memory(width, height, mode, mapped, **options)
+        return path, cost + extra, options
+
+    def plan(self, paths, header_reader=read_image_header, mappable=True, **evaluator_options):
+        """
+        读取文件头并估算每张图像的内存，按估算值从大到小排序
+
+        单张就超出预算的图像改用分块模式（memory_budget取预算），并在调度时单独运行。
+
+        Args:
+            paths: 图像路径列表（或压缩包成员名）
+            header_reader: 读取文件头的函数，返回 (width, height, mode, format)
+            mappable: 图像是否为磁盘文件（8位灰度BMP在分块模式下可内存映射）
+            **evaluator_options: 评估选项（精度、分块预算、线程数影响估算）
+
+        Returns:
+            list: (path, cost, options) 列表；无法读取文件头的图像估算为0，排在最后
+        """
+        jobs = [self._job(path, header_reader(path), mappable, evaluator_options) for path in paths]
+        jobs.sort(key=lambda job: job[1], reverse=True)
+        return jobs
+
+    def plan_stream(self, items, **evaluator_options):
+        """
+        为顺序到达的图像（如压缩tar流）逐个估算内存，保持到达顺序
+
+        Args:
+            items: 可迭代的 (name, data)，data为编码后的图像字节
+            **evaluator_options: 评估选项
+
+        Yields:
+            tuple: (name, cost, options)，options中带data，cost含编码数据本身
+        """
+        for name, data in items:
+            header = read_image_header(io.BytesIO(data))
+            yield self._job(name, header, False, dict(evaluator_options, data=data), extra=len(data))
+
+    def run(self, func, jobs):
+        """
+        按预算调度执行
+
+        队首（剩余最大的）图像放得下时才启动：已占用+估算不超过预算且未达最大并发；
+        没有任务运行时无条件启动，单张超出预算的图像因此单独运行而不会阻塞。
+        任务按需从jobs中取出，plan_stream的流式任务只在即将启动时才读入下一张。
+
+        Args:
+            func: 评估函数 func(path, **options)
+            jobs: plan 或 plan_stream 返回的任务
+
+        Yields:
+            tuple: (path, func的返回值)，按完成顺序
+        """
+        if isinstance(jobs, list):
+            pending, jobs = deque(jobs), iter(())
+        else:
+            pending, jobs = deque(), iter(jobs)
+        running = {}
+        reserved = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while True:
+                while len(running) < self.max_workers:
+                    if not pending:
+                        job = next(jobs, None)
+                        if job is None:
+                            break
+                        pending.append(job)
+                    path, cost, options = pending[0]
+                    limited = self.max_memory is not None
+                    if running and limited and reserved + cost > self.max_memory:
+                        break
+                    pending.popleft()
+                    if limited and cost > self.max_memory:
+                        self.oversized += 1
+                    reserved += cost
+                    running[pool.submit(func, path, **options)] = (path, cost)
+                self.peak_workers = max(self.peak_workers, len(running))
+                self.peak_reserved = max(self.peak_reserved, reserved)
+                mtf_metrics.WORKERS.set(len(running))
+                mtf_metrics.QUEUE_DEPTH.set(len(pending))
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, cost = running.pop(future)
+                    reserved -= cost
+                    yield path, future.result()
+        mtf_metrics.WORKERS.set(0)
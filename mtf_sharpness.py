@@ -9,36 +9,289 @@ MTF图像清晰度评估工具 - 刃边法（Knife-Edge Method）
 import cv2
 import numpy as np
 import argparse
+import csv
+import io
+import json
 import os
+import re
+import sys
+import time
 import glob
+import functools
+import importlib
+import multiprocessing
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from scipy import signal, ndimage
-from numpy.fft import fft, fftfreq
+from scipy.fft import fft, fftfreq
 from PIL import Image
 
+from mtf_kernels import BACKENDS, get_kernels
+import mtf_metrics
+from mtf_spc import SPCMonitor, format_alarm, format_summary as format_spc_summary
+
+
+# 全分辨率流水线每像素的峰值工作内存（字节，float64梯度及其临时数组）
+PEAK_BYTES_PER_PIXEL = 32
+
+# 分块模式下每个分块像素的工作内存（字节，含光晕窗口、梯度和掩码）
+TILE_BYTES_PER_PIXEL = 48
+
+# Sobel(ksize=3)幅值平方的上界：2 * (4 * 255)^2
+MAX_SOBEL_MAG2 = 2 * (4 * 255) ** 2
+
+# 多线程模式下每个条带的行数（与线程数无关，合并结果不随线程数变化）
+STRIP_ROWS = 256
+
+# 数值精度选项：numpy数据类型及对应的cv2输出深度
+PRECISIONS = {
+    'float64': (np.float64, cv2.CV_64F),
+    'float32': (np.float32, cv2.CV_32F),
+}
+
+# 分通道MTF的通道顺序（L为流水线使用的亮度通道）
+CHANNELS = ('R', 'G', 'B', 'L')
+
+# 预检未通过（空白、饱和、误触发等）的图像等级
+NO_VALID_EDGE = "无有效边缘"
+
+# ROI定位方式：bbox为全部强梯度像素的边界框，line为沿拟合刃边直线的窄窗口
+ROI_MODES = ('bbox', 'line')
+
+# line模式接受的最低阶跃纯度（低于此值时回退到bbox）
+MIN_EDGE_PURITY = 0.2
+
+# line模式刃边的最短长度（图像短边的比例），更短的线段ESF行数太少、结果不稳定
+MIN_EDGE_LENGTH = 0.1
+
+# 次优候选刃边的评分达到最优的该比例时视为无法区分，line模式回退到bbox
+EDGE_SCORE_TIE = 0.9
+
+# 自助法置信区间每批重抽样样本的插值ESF矩阵上限（字节），更多的样本分批计算
+BOOTSTRAP_BATCH_BYTES = 32 << 20
+
+
+class NoValidEdgeError(ValueError):
+    """预检未找到可用刃边时抛出，区别于读取失败等处理错误"""
+    
+    def __init__(self, reason, precheck):
+        """
+        Args:
+            reason: 未通过的原因
+            precheck: check_edge 返回的预检指标
+        """
+        super().__init__(f"{NO_VALID_EDGE}: {reason}")
+        self.reason = reason
+        self.precheck = precheck
+
 
 class MTFSharpnessEvaluator:
     """MTF清晰度评估器 - 刃边法实现"""
     
-    def __init__(self, image_path):
+    def __init__(self, image_path=None, pyramid_levels=0, memory_budget=None, precheck=False,
+                 precision='float64', backend='numpy', threads=1, roi_mode='bbox',
+                 bootstrap=0, confidence=0.95):
         """
-        初始化评估器
+        初始化评估器（内存中的图像使用 from_array / from_buffer / from_bytes 构造）
         
         Args:
             image_path: 图像文件路径
+            pyramid_levels: 边缘定位使用的金字塔层数（0为全分辨率搜索，
+                            2~4对应1/4~1/16降采样，适合大画幅传感器）
+            memory_budget: 工作内存预算（字节）。全分辨率流水线超出预算时改为
+                           分块流式处理，峰值内存与图像尺寸无关；None表示不限制
+            precheck: 是否在完整计算前做快速预检，无可用刃边时抛出NoValidEdgeError
+            precision: 数值精度，'float64'（默认）或'float32'（内存带宽减半，
+                       MTF50在四位小数内一致）
+            backend: ESF/LSF/MTF50计算内核，'numpy'（默认）、'numba'（JIT编译，
+                     结果逐位一致，未安装时回退numpy）或'auto'
+            threads: 单张图像内部的线程数。大于1时梯度、ROI统计和ESF投影按行条带
+                     分给线程池（依赖释放GIL的OpenCV/NumPy内核），按条带顺序合并
+            roi_mode: ROI定位方式，'bbox'（默认，强梯度像素的边界框加边距）或'line'
+                      （detect_edges拟合刃边直线，沿直线取 ±margin 的窄窗口并逐行对齐，
+                      找不到阶跃边缘时回退bbox）
+            bootstrap: 自助法重抽样次数。大于0时compute_mtf_sharpness另给出MTF50的
+                       置信区间（见compute_bootstrap_ci）；0表示不计算
+            confidence: 置信区间的置信水平
         """
+        if precision not in PRECISIONS:
+            raise ValueError(f"不支持的精度: {precision}（可选: {', '.join(PRECISIONS)}）")
+        if int(threads) < 1:
+            raise ValueError(f"线程数必须为正整数: {threads}")
+        if roi_mode not in ROI_MODES:
+            raise ValueError(f"不支持的ROI定位方式: {roi_mode}（可选: {', '.join(ROI_MODES)}）")
+        if int(bootstrap) < 0 or int(bootstrap) == 1:
+            raise ValueError(f"重抽样次数必须为0（不计算）或至少为2: {bootstrap}")
+        if not 0 < confidence < 1:
+            raise ValueError(f"置信水平必须在0和1之间: {confidence}")
         self.image_path = image_path
+        self.pyramid_levels = pyramid_levels
+        self.memory_budget = memory_budget
+        self.precheck = precheck
+        self.precision = precision
+        self.dtype, self.cv_depth = PRECISIONS[precision]
+        self.kernels = get_kernels(backend)
+        self.threads = int(threads)
+        self.roi_mode = roi_mode
+        self.bootstrap = int(bootstrap)
+        self.confidence = float(confidence)
+        # 内存中的图像来源（解码后的数组或编码的PNG/BMP字节），优先于image_path
+        self.source_array = None
+        self.source_bytes = None
         self.image = None
         self.gray = None
+        self.roi_bbox = None
+        self.edge_bbox = None
+        self.roi_threshold = None
+        self.edge_orientation = None
+        # line模式拟合的刃边直线（detect_edges的结果）及ROI各像素在原图中的索引
+        self.edge_line = None
+        self.roi_index = None
+        # 序列模式下由ROITracker设置的上一帧ROI状态
+        self.roi_hint = None
+        self.roi_fast_path = False
         self.mtf_curve = None
         self.mtf50 = None
         self.frequencies = None
+        # 最近一次评估各阶段的耗时（秒）
+        self.stage_times = {}
+        
+    @classmethod
+    def from_array(cls, array, color_order='RGB', bit_depth=None, **options):
+        """
+        从内存中的图像数组构造评估器（不经过磁盘）
+        
+        Args:
+            array: 形状为 (h, w)、(h, w, 1)、(h, w, 3) 或 (h, w, 4) 的uint8/uint16数组，
+                   或任何支持缓冲区协议的对象（np.asarray零拷贝包装）
+            color_order: 彩色通道顺序，'RGB' 或 'BGR'（OpenCV及多数相机SDK）
+            bit_depth: uint16数据的有效位数（如12），None表示按16位满量程
+            **options: 传给构造函数的其他选项
+            
+        Returns:
+            MTFSharpnessEvaluator: 评估器（尚未加载，调用load_image后使用）
+        """
+        if color_order not in ('RGB', 'BGR'):
+            raise ValueError(f"不支持的通道顺序: {color_order}（可选: RGB, BGR）")
+        evaluator = cls(**options)
+        array = np.asarray(array)
+        if array.ndim == 3 and array.shape[2] in (3, 4) and color_order == 'BGR':
+            # 只翻转通道视图（BGRA丢弃alpha），不复制像素
+            array = array[..., 2::-1]
+        evaluator.source_array = cls._to_uint8(array, bit_depth)
+        return evaluator
+    
+    @classmethod
+    def from_buffer(cls, buffer, shape, dtype=np.uint8, stride=None, **options):
+        """
+        从原始像素缓冲区构造评估器（bytes、bytearray、memoryview、相机SDK帧缓冲等），
+        布局允许时零拷贝
+        
+        Args:
+            buffer: 支持缓冲区协议的对象
+            shape: 图像形状 (h, w) 或 (h, w, channels)
+            dtype: 像素数据类型（uint8或uint16）
+            stride: 每行字节数（含行尾填充），None表示紧密排列
+            **options: 传给from_array的选项（color_order、bit_depth等）
+            
+        Returns:
+            MTFSharpnessEvaluator: 评估器
+        """
+        dtype = np.dtype(dtype)
+        shape = tuple(int(v) for v in shape)
+        row_bytes = int(np.prod(shape[1:])) * dtype.itemsize
+        stride = row_bytes if stride is None else int(stride)
+        if stride < row_bytes:
+            raise ValueError(f"行跨度 {stride} 小于一行像素的字节数 {row_bytes}")
+        
+        nbytes = memoryview(buffer).nbytes
+        if nbytes < stride * (shape[0] - 1) + row_bytes:
+            raise ValueError(f"缓冲区大小 {nbytes} 字节不足以容纳形状 {shape} 的图像")
+        
+        # 按行跨度直接构造视图，行尾填充不参与计算
+        strides = (stride,) + np.empty((1,) + shape[1:], dtype=dtype).strides[1:]
+        array = np.ndarray(shape, dtype=dtype, buffer=buffer, strides=strides)
+        return cls.from_array(array, **options)
+    
+    @classmethod
+    def from_bytes(cls, data, **options):
+        """
+        从内存中的编码图像（PNG、BMP等）构造评估器
+        
+        Args:
+            data: 编码后的图像字节
+            **options: 传给构造函数的选项
+            
+        Returns:
+            MTFSharpnessEvaluator: 评估器
+        """
+        evaluator = cls(**options)
+        evaluator.source_bytes = bytes(data) if not isinstance(data, bytes) else data
+        return evaluator
+    
+    @staticmethod
+    def _to_uint8(array, bit_depth=None):
+        """
+        检查内存图像的形状并转换为uint8（uint8输入不复制）
+        
+        Args:
+            array: 图像数组
+            bit_depth: uint16数据的有效位数
+            
+        Returns:
+            numpy.ndarray: uint8图像数组
+        """
+        if array.ndim == 3 and array.shape[2] == 1:
+            array = array[..., 0]
+        if array.ndim not in (2, 3) or (array.ndim == 3 and array.shape[2] not in (3, 4)):
+            raise ValueError(f"不支持的图像形状: {array.shape}")
+        
+        if array.dtype == np.uint8:
+            return array
+        if array.dtype == np.uint16:
+            full_scale = (1 << (bit_depth or 16)) - 1
+            return np.clip(array * (255.0 / full_scale) + 0.5, 0, 255).astype(np.uint8)
+        if array.dtype == np.bool_:
+            return array.astype(np.uint8) * 255
+        raise ValueError(f"不支持的像素类型: {array.dtype}（可选: uint8, uint16）")
+    
+    def _set_image_array(self, array):
+        """
+        由uint8图像数组设置image和gray（灰度图不复制）
         
+        Args:
+            array: uint8图像数组，彩色时为RGB(A)顺序
+            
+        Returns:
+            numpy.ndarray: 灰度图像
+        """
+        self.image = array
+        if array.ndim == 2:
+            self.gray = array
+        else:
+            self.gray = np.dot(array[..., :3], self._luma_weights()).astype(np.uint8)
+        return self.gray
+    
     def load_image(self):
         """加载并预处理图像（使用PIL以支持打包后的环境）"""
+        # 内存中的图像（相机SDK回调等），不经过磁盘
+        if self.source_array is not None:
+            return self._set_image_array(self.source_array)
+        if self.source_bytes is not None:
+            return self._decode_bytes()
+        
         if not os.path.exists(self.image_path):
             raise FileNotFoundError(f"图像文件不存在: {self.image_path}")
         
+        # 分块模式下，未压缩的8位灰度BMP直接内存映射，不整幅读入
+        if self.memory_budget is not None:
+            mapped = self._map_gray_bmp()
+            if mapped is not None:
+                self.image = mapped
+                self.gray = mapped
+                return self.gray
+        
         try:
             # 优先使用PIL读取（打包后更可靠）
             pil_image = Image.open(self.image_path)
@@ -52,15 +305,15 @@ class MTFSharpnessEvaluator:
                 self.gray = self.image.copy()
             elif pil_image.mode == 'RGB':
                 # RGB转灰度
-                self.gray = np.dot(self.image[...,:3], [0.299, 0.587, 0.114]).astype(np.uint8)
+                self.gray = np.dot(self.image[...,:3], self._luma_weights()).astype(np.uint8)
             elif pil_image.mode == 'RGBA':
                 # RGBA转灰度（忽略alpha通道）
-                self.gray = np.dot(self.image[...,:3], [0.299, 0.587, 0.114]).astype(np.uint8)
+                self.gray = np.dot(self.image[...,:3], self._luma_weights()).astype(np.uint8)
             elif pil_image.mode == 'P':
                 # 调色板模式，转换为RGB再转灰度
                 pil_image = pil_image.convert('RGB')
                 self.image = np.array(pil_image)
-                self.gray = np.dot(self.image[...,:3], [0.299, 0.587, 0.114]).astype(np.uint8)
+                self.gray = np.dot(self.image[...,:3], self._luma_weights()).astype(np.uint8)
             elif pil_image.mode == '1':
                 # 二值图像
                 self.gray = (self.image * 255).astype(np.uint8)
@@ -68,7 +321,7 @@ class MTFSharpnessEvaluator:
                 # 其他模式，尝试转换为RGB再转灰度
                 pil_image = pil_image.convert('RGB')
                 self.image = np.array(pil_image)
-                self.gray = np.dot(self.image[...,:3], [0.299, 0.587, 0.114]).astype(np.uint8)
+                self.gray = np.dot(self.image[...,:3], self._luma_weights()).astype(np.uint8)
             
             # 确保gray是uint8类型
             if self.gray.dtype != np.uint8:
@@ -84,6 +337,8 @@ class MTFSharpnessEvaluator:
                 # 转换为灰度图
                 if len(self.image.shape) == 3:
                     self.gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+                    # 与PIL读取保持一致，彩色通道统一为RGB顺序
+                    self.image = self.image[..., ::-1]
                 else:
                     self.gray = self.image.copy()
             except:
@@ -91,120 +346,1276 @@ class MTFSharpnessEvaluator:
         
         return self.gray
     
-    def detect_edges(self):
+    def _decode_bytes(self):
+        """
+        解码内存中的PNG/BMP等编码图像（PIL优先，失败时使用cv2.imdecode）
+        
+        Returns:
+            numpy.ndarray: 灰度图像
+        """
+        try:
+            pil_image = Image.open(io.BytesIO(self.source_bytes))
+            if pil_image.mode not in ('L', 'RGB', 'RGBA'):
+                pil_image = pil_image.convert('RGB')
+            return self._set_image_array(np.array(pil_image))
+        except Exception as e:
+            image = cv2.imdecode(np.frombuffer(self.source_bytes, dtype=np.uint8),
+                                 cv2.IMREAD_UNCHANGED)
+            if image is None:
+                raise ValueError(f"无法解码内存中的图像 (PIL和cv2均失败)\n原始错误: {str(e)}")
+            if image.ndim == 3:
+                image = image[..., 2::-1] if image.shape[2] >= 3 else image[..., 0]
+            return self._set_image_array(self._to_uint8(image))
+    
+    def _luma_weights(self):
+        """
+        灰度转换权重（ITU-R BT.601），按所选精度给出
+        
+        Returns:
+            numpy.ndarray: RGB权重
+        """
+        return np.array([0.299, 0.587, 0.114], dtype=self.dtype)
+    
+    def _map_gray_bmp(self):
+        """
+        以内存映射方式打开未压缩的8位灰度BMP（线扫描相机的常见输出）
+        
+        Returns:
+            numpy.ndarray: 只读的图像视图，文件不是此类BMP时返回None
+        """
+        if self.image_path is None or not self.image_path.lower().endswith('.bmp'):
+            return None
+        
+        with open(self.image_path, 'rb') as f:
+            header = f.read(54)
+            if len(header) < 54 or header[:2] != b'BM':
+                return None
+            offset = int.from_bytes(header[10:14], 'little')
+            dib_size = int.from_bytes(header[14:18], 'little')
+            width = int.from_bytes(header[18:22], 'little', signed=True)
+            height = int.from_bytes(header[22:26], 'little', signed=True)
+            bit_count = int.from_bytes(header[28:30], 'little')
+            compression = int.from_bytes(header[30:34], 'little')
+            colors_used = int.from_bytes(header[46:50], 'little') or 256
+            if bit_count != 8 or compression != 0 or width <= 0 or height == 0:
+                return None
+            
+            # 调色板必须是恒等灰度表，像素值才等于灰度值
+            f.seek(14 + dib_size)
+            palette = np.frombuffer(f.read(4 * colors_used), dtype=np.uint8).reshape(-1, 4)
+            if not np.array_equal(palette[:, :3], np.repeat(np.arange(len(palette)), 3)
+                                  .reshape(-1, 3).astype(np.uint8)):
+                return None
+        
+        # 每行按4字节对齐；高度为正时行序自下而上
+        stride = (width + 3) // 4 * 4
+        rows = abs(height)
+        data = np.memmap(self.image_path, dtype=np.uint8, mode='r',
+                         offset=offset, shape=(rows, stride))[:, :width]
+        return data[::-1] if height > 0 else data
+    
+    def _use_tiles(self, shape):
+        """
+        判断给定尺寸的图像是否需要分块处理
+        
+        Args:
+            shape: 图像尺寸 (h, w)
+            
+        Returns:
+            bool: 全分辨率处理超出内存预算时为True
+        """
+        if self.memory_budget is None:
+            return False
+        return shape[0] * shape[1] * PEAK_BYTES_PER_PIXEL > self.memory_budget
+    
+    def _tile_shape(self, shape):
+        """
+        根据内存预算计算分块尺寸（优先整行，便于顺序读取内存映射文件）
+        
+        Args:
+            shape: 图像尺寸 (h, w)
+            
+        Returns:
+            tuple: 分块尺寸 (tile_h, tile_w)
+        """
+        h, w = shape
+        tile_pixels = max(64 * 64, self.memory_budget // TILE_BYTES_PER_PIXEL)
+        tile_w = min(w, max(64, tile_pixels // 64))
+        tile_h = min(h, max(16, tile_pixels // tile_w))
+        return tile_h, tile_w
+    
+    def _iter_tiles(self, shape, tile_shape, halo=1):
+        """
+        生成带光晕的分块范围
+        
+        光晕提供Sobel核所需的相邻像素；贴着图像边界的分块不加光晕，
+        cv2在分块上的BORDER_REFLECT_101边界与整幅图像一致，结果逐像素相同。
+        
+        Args:
+            shape: 图像尺寸 (h, w)
+            tile_shape: 分块尺寸 (tile_h, tile_w)
+            halo: 光晕宽度
+            
+        Yields:
+            tuple: (核心区域 (y0, y1, x0, x1), 含光晕区域 (hy0, hy1, hx0, hx1))
+        """
+        h, w = shape
+        tile_h, tile_w = tile_shape
+        for y0 in range(0, h, tile_h):
+            y1 = min(h, y0 + tile_h)
+            for x0 in range(0, w, tile_w):
+                x1 = min(w, x0 + tile_w)
+                yield ((y0, y1, x0, x1),
+                       (max(0, y0 - halo), min(h, y1 + halo), max(0, x0 - halo), min(w, x1 + halo)))
+    
+    @staticmethod
+    def _tile_sobel(image, core, outer, depth=cv2.CV_64F):
+        """
+        计算单个分块核心区域的Sobel梯度
+        
+        Args:
+            image: 完整图像（可为内存映射）
+            core: 核心区域 (y0, y1, x0, x1)
+            outer: 含光晕区域 (hy0, hy1, hx0, hx1)
+            depth: cv2输出深度
+            
+        Returns:
+            tuple: (grad_x, grad_y) 核心区域的梯度
+        """
+        y0, y1, x0, x1 = core
+        hy0, hy1, hx0, hx1 = outer
+        window = np.ascontiguousarray(image[hy0:hy1, hx0:hx1])
+        crop = (slice(y0 - hy0, y1 - hy0), slice(x0 - hx0, x1 - hx0))
+        grad_x = cv2.Sobel(window, depth, 1, 0, ksize=3)[crop]
+        grad_y = cv2.Sobel(window, depth, 0, 1, ksize=3)[crop]
+        return grad_x, grad_y
+    
+    @staticmethod
+    def _percentile_from_histogram(counts, percentile):
         """
-        检测图像中的边缘（刃边）
+        由梯度幅值平方的整数直方图精确计算幅值百分位数（与np.percentile线性插值一致）
         
+        Args:
+            counts: counts[v] 为幅值平方等于v的像素数
+            percentile: 百分位数
+            
         Returns:
-            list: 检测到的边缘区域列表 [(x1, y1, x2, y2, angle), ...]
+            float: 梯度幅值阈值
         """
-        # 使用Canny边缘检测
-        edges = cv2.Canny(self.gray, 50, 150, apertureSize=3)
+        n = int(counts.sum())
+        q = percentile / 100.0
+        virtual = n * q + (1 - q) - 1
+        k = int(np.floor(virtual))
+        frac = virtual - k
         
-        # 使用霍夫变换检测直线
-        lines = cv2.HoughLinesP(edges, 1, np.pi/180, threshold=100, 
-                                minLineLength=100, maxLineGap=10)
+        cumulative = np.cumsum(counts)
+        a = np.sqrt(float(np.searchsorted(cumulative, k + 1)))
+        b = np.sqrt(float(np.searchsorted(cumulative, min(k + 2, n))))
+        if frac >= 0.5:
+            return b - (b - a) * (1 - frac)
+        return a + (b - a) * frac
+    
+    def _extract_edge_roi_tiled(self, margin, percentile=95):
+        """
+        分块流式提取边缘ROI
         
-        edge_regions = []
-        if lines is not None:
-            for line in lines:
-                x1, y1, x2, y2 = line[0]
-                # 计算线段角度
-                angle = np.arctan2(y2 - y1, x2 - x1) * 180 / np.pi
-                # 只选择接近水平或垂直的边缘（斜边在3-10度范围内更好）
-                if abs(angle) > 80 or abs(angle) < 10 or (abs(angle) > 170):
-                    edge_regions.append((x1, y1, x2, y2, angle))
+        第一遍逐块累积梯度幅值平方的整数直方图，得到与全分辨率完全一致的
+        百分位阈值；第二遍只扫描可能扩展边界框的分块。峰值内存由分块尺寸决定。
         
-        return edge_regions
+        Args:
+            margin: 边缘周围的边距
+            percentile: 强边缘的梯度百分位阈值
+            
+        Returns:
+            numpy.ndarray: 边缘ROI区域（原图的视图）
+        """
+        shape = self.gray.shape
+        tiles = list(self._iter_tiles(shape, self._tile_shape(shape)))
+        
+        # 第一遍：全局直方图与每块最大值
+        counts = np.zeros(MAX_SOBEL_MAG2 + 1, dtype=np.int64)
+        tile_max = []
+        for core, outer in tiles:
+            grad_x, grad_y = self._tile_sobel(self.gray, core, outer)
+            mag2 = (grad_x**2 + grad_y**2).astype(np.int64)
+            tile_counts = np.bincount(mag2.ravel())
+            counts[:len(tile_counts)] += tile_counts
+            tile_max.append(np.sqrt(float(mag2.max())))
+        
+        threshold = self._percentile_from_histogram(counts, percentile)
+        self.roi_threshold = threshold
+        
+        # 第二遍：逐块合并强边缘像素的边界框
+        bbox = None
+        for (core, outer), peak in zip(tiles, tile_max):
+            if peak <= threshold:
+                continue
+            y0, y1, x0, x1 = core
+            if bbox is not None and bbox[0] <= y0 and y1 - 1 <= bbox[1] \
+                    and bbox[2] <= x0 and x1 - 1 <= bbox[3]:
+                # 分块完全位于当前边界框内，不可能扩展边界
+                continue
+            
+            grad_x, grad_y = self._tile_sobel(self.gray, core, outer)
+            edge_mask = np.sqrt(grad_x**2 + grad_y**2) > threshold
+            rows = np.nonzero(edge_mask.any(axis=1))[0]
+            cols = np.nonzero(edge_mask.any(axis=0))[0]
+            tile_bbox = (y0 + rows[0], y0 + rows[-1], x0 + cols[0], x0 + cols[-1])
+            if bbox is None:
+                bbox = tile_bbox
+            else:
+                bbox = (min(bbox[0], tile_bbox[0]), max(bbox[1], tile_bbox[1]),
+                        min(bbox[2], tile_bbox[2]), max(bbox[3], tile_bbox[3]))
+        
+        if bbox is None:
+            # 如果没有找到边缘，使用整个图像
+            self.roi_bbox = (0, shape[0], 0, shape[1])
+            return self.gray
+        
+        return self._crop_roi(bbox, margin)
     
-    def extract_edge_roi(self, margin=50):
+    def _esf_projection_tiled(self, roi):
+        """
+        分块流式计算ESF投影：累积梯度绝对值之和判断边缘方向，同时累积行/列之和
+        
+        Args:
+            roi: 边缘ROI区域（可为内存映射视图）
+            
+        Returns:
+            tuple: (未插值的ESF曲线, 边缘方向)
+        """
+        h, w = roi.shape
+        sum_x = sum_y = 0.0
+        col_sums = np.zeros(w, dtype=np.float64)
+        row_sums = np.zeros(h, dtype=np.float64)
+        
+        for core, outer in self._iter_tiles(roi.shape, self._tile_shape(roi.shape)):
+            grad_x, grad_y = self._tile_sobel(roi, core, outer)
+            sum_x += np.abs(grad_x).sum()
+            sum_y += np.abs(grad_y).sum()
+            
+            y0, y1, x0, x1 = core
+            block = roi[y0:y1, x0:x1]
+            col_sums[x0:x1] += block.sum(axis=0, dtype=np.float64)
+            row_sums[y0:y1] += block.sum(axis=1, dtype=np.float64)
+        
+        # 沿着梯度最大的方向投影
+        if sum_x > sum_y:
+            return col_sums / h, 'vertical'
+        return row_sums / w, 'horizontal'
+
+    def _map_strips(self, func, shape):
+        """
+        在线程池中对各行条带执行func(核心区域, 含光晕区域)
+
+        条带按固定行数划分，与线程数无关；结果按条带顺序返回，合并顺序确定
+
+        Args:
+            func: 条带处理函数
+            shape: 图像尺寸 (h, w)
+
+        Returns:
+            list: 各条带的返回值
+        """
+        strips = list(self._iter_tiles(shape, (STRIP_ROWS, shape[1])))
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            return list(pool.map(lambda strip: func(*strip), strips))
+
+    def _gradients(self, image):
+        """
+        整幅图像的Sobel梯度（threads>1时按条带并行，与整幅计算逐像素相同）
+
+        Args:
+            image: 灰度图像
+
+        Returns:
+            tuple: (grad_x, grad_y)
+        """
+        if self.threads == 1:
+            return (cv2.Sobel(image, self.cv_depth, 1, 0, ksize=3),
+                    cv2.Sobel(image, self.cv_depth, 0, 1, ksize=3))
+
+        grad_x = np.empty(image.shape, dtype=self.dtype)
+        grad_y = np.empty(image.shape, dtype=self.dtype)
+
+        def work(core, outer):
+            y0, y1 = core[:2]
+            grad_x[y0:y1], grad_y[y0:y1] = self._tile_sobel(image, core, outer, self.cv_depth)
+
+        self._map_strips(work, image.shape)
+        return grad_x, grad_y
+
+    def _extract_edge_roi_threaded(self, margin, percentile=95):
+        """
+        多线程提取边缘ROI
+
+        第一遍各条带并行计算梯度幅值平方并累积整数直方图，得到与np.percentile
+        一致的阈值（替代单线程的全图排序）；第二遍各条带并行求强边缘像素的边界框再合并
+
+        Args:
+            margin: 边缘周围的边距
+            percentile: 强边缘的梯度百分位阈值
+
+        Returns:
+            numpy.ndarray: 边缘ROI区域
+        """
+        shape = self.gray.shape
+        mag2 = np.empty(shape, dtype=np.int32)
+        counts = np.zeros(MAX_SOBEL_MAG2 + 1, dtype=np.int64)
+        lock = threading.Lock()
+
+        def histogram(core, outer):
+            y0, y1 = core[:2]
+            grad_x, grad_y = self._tile_sobel(self.gray, core, outer, self.cv_depth)
+            # 8位图像的Sobel梯度为整数，幅值平方可精确存为整数
+            strip = mag2[y0:y1]
+            np.add(grad_x**2, grad_y**2, out=strip, casting='unsafe')
+            strip_counts = np.bincount(strip.ravel())
+            with lock:
+                counts[:len(strip_counts)] += strip_counts
+
+        self._map_strips(histogram, shape)
+        threshold = self._percentile_from_histogram(counts, percentile)
+        self.roi_threshold = threshold
+
+        def strip_bbox(core, outer):
+            y0, y1 = core[:2]
+            edge_mask = np.sqrt(mag2[y0:y1], dtype=self.dtype) > threshold
+            rows = np.nonzero(edge_mask.any(axis=1))[0]
+            if len(rows) == 0:
+                return None
+            cols = np.nonzero(edge_mask.any(axis=0))[0]
+            return (y0 + rows[0], y0 + rows[-1], cols[0], cols[-1])
+
+        boxes = [b for b in self._map_strips(strip_bbox, shape) if b is not None]
+        if not boxes:
+            # 如果没有找到边缘，使用整个图像
+            self.roi_bbox = (0, shape[0], 0, shape[1])
+            return self.gray
+
+        y_min, y_max, x_min, x_max = zip(*boxes)
+        return self._crop_roi((min(y_min), max(y_max), min(x_min), max(x_max)), margin)
+
+    def _esf_projection_threaded(self, roi):
+        """
+        多线程ESF投影：各条带并行累积梯度绝对值之和（判断边缘方向）和行/列之和
+
+        Args:
+            roi: 边缘ROI区域
+
+        Returns:
+            tuple: (未插值的ESF曲线, 边缘方向)
+        """
+        h, w = roi.shape
+
+        def work(core, outer):
+            y0, y1 = core[:2]
+            grad_x, grad_y = self._tile_sobel(roi, core, outer, self.cv_depth)
+            block = roi[y0:y1]
+            return (np.abs(grad_x).sum(dtype=np.float64), np.abs(grad_y).sum(dtype=np.float64),
+                    block.sum(axis=0, dtype=np.float64), block.sum(axis=1, dtype=np.float64))
+
+        parts = self._map_strips(work, roi.shape)
+        sum_x = sum(p[0] for p in parts)
+        sum_y = sum(p[1] for p in parts)
+
+        # 沿着梯度最大的方向投影（整数像素之和在双精度下精确，与合并顺序无关）
+        if sum_x > sum_y:
+            col_sums = np.sum([p[2] for p in parts], axis=0)
+            return (col_sums / h).astype(self.dtype), 'vertical'
+        row_sums = np.concatenate([p[3] for p in parts])
+        return (row_sums / w).astype(self.dtype), 'horizontal'
+
+    def detect_edges(self, percentile=95, max_edge_angle=30, max_pixels=1 << 18, candidates=16,
+                     min_length=None):
+        """
+        检测刃边直线：只在降采样图像的强梯度像素上做Canny和霍夫变换得到候选线段，
+        再回到全分辨率沿线段逐行（或逐列）求边缘的亚像素位置，最小二乘拟合直线
+        
+        候选线段按“长度 × 阶跃纯度²”评分：细线和密集条纹在边缘附近的窗口内正负梯度
+        相互抵消，纯度低；黑白阶跃（刃边）纯度接近1。
+        
+        Args:
+            percentile: 强梯度像素的百分位阈值（Canny高阈值，低阈值取其一半）
+            max_edge_angle: 刃边偏离水平/垂直方向的最大角度（度）
+            max_pixels: 降采样图像的最大像素数
+            candidates: 回到全分辨率拟合的候选线段数（取最长的若干条）
+            min_length: 拟合后刃边的最短长度（像素，默认为图像短边的 MIN_EDGE_LENGTH 倍）
+            
+        Returns:
+            list: 刃边直线字典列表，按评分从高到低排序，字段见 _fit_edge_line
+        """
+        h, w = self.gray.shape
+        if min_length is None:
+            min_length = MIN_EDGE_LENGTH * min(h, w)
+        step = max(1, int(np.ceil(np.sqrt(h * w / max_pixels))))
+        # 整数倍面积降采样（INTER_AREA即块均值），降采样像素i对应全分辨率 (i + 0.5) * step - 0.5
+        small = np.ascontiguousarray(self.gray[:h // step * step, :w // step * step])
+        if step > 1:
+            small = cv2.resize(small, (w // step, h // step), interpolation=cv2.INTER_AREA)
+        
+        # Canny阈值取自梯度幅值分布（随曝光和对比度自适应），只有强梯度像素参与霍夫投票
+        grad_x = cv2.Sobel(small, cv2.CV_32F, 1, 0, ksize=3)
+        grad_y = cv2.Sobel(small, cv2.CV_32F, 0, 1, ksize=3)
+        high = float(np.percentile(cv2.magnitude(grad_x, grad_y), percentile))
+        if high <= 0:
+            return []
+        edges = cv2.Canny(small, 0.5 * high, high, apertureSize=3, L2gradient=True)
+        segment_length = max(10, min(small.shape) // 16)
+        segments = cv2.HoughLinesP(edges, 1, np.pi / 180, threshold=segment_length // 2,
+                                   minLineLength=segment_length, maxLineGap=2)
+        if segments is None:
+            return []
+        
+        segments = segments.reshape(-1, 4).astype(np.float64)
+        dx = segments[:, 2] - segments[:, 0]
+        dy = segments[:, 3] - segments[:, 1]
+        angle = np.degrees(np.arctan2(dy, dx))
+        near_axis = np.abs((angle + 45) % 90 - 45) <= max_edge_angle
+        segments, length = segments[near_axis], np.hypot(dx, dy)[near_axis]
+        if len(segments) == 0:
+            return []
+        
+        # 在降采样图像上粗评阶跃纯度（每条线段取16个点、横向±4像素），
+        # 先排除细线和条纹，只有评分最高的候选回到全分辨率拟合
+        vertical = np.abs(dy[near_axis]) >= np.abs(dx[near_axis])
+        t = np.linspace(0.1, 0.9, 16)
+        px = np.rint(segments[:, :1] + t * (segments[:, 2:3] - segments[:, :1])).astype(np.intp)
+        py = np.rint(segments[:, 1:2] + t * (segments[:, 3:4] - segments[:, 1:2])).astype(np.intp)
+        offsets = np.arange(-4, 5)
+        cols = px[..., np.newaxis] + np.where(vertical[:, np.newaxis, np.newaxis], offsets, 0)
+        rows = py[..., np.newaxis] + np.where(vertical[:, np.newaxis, np.newaxis], 0, offsets)
+        profile = small[np.clip(rows, 0, small.shape[0] - 1), np.clip(cols, 0, small.shape[1] - 1)]
+        diff = np.diff(profile.astype(np.float32), axis=-1)
+        purity = np.abs(diff.sum(axis=(1, 2))) / np.maximum(np.abs(diff).sum(axis=(1, 2)), 1e-6)
+        
+        lines = []
+        for index in np.argsort(length * purity ** 2)[::-1][:candidates]:
+            line = self._fit_edge_line((segments[index] + 0.5) * step - 0.5, step + 2)
+            if line is None or line['length'] < min_length:
+                continue
+            # 同一条边缘常被霍夫变换拆成多条线段，只保留评分最高的一条
+            duplicate = any(
+                other['orientation'] == line['orientation']
+                and abs(other['slope'] * line['center'] + other['intercept']
+                        - (line['slope'] * line['center'] + line['intercept'])) < 2
+                and other['span'][0] <= line['center'] <= other['span'][1]
+                for other in lines)
+            if not duplicate:
+                lines.append(line)
+            else:
+                for i, other in enumerate(lines):
+                    if (other['orientation'] == line['orientation'] and other['score'] < line['score']
+                            and other['span'][0] <= line['center'] <= other['span'][1]):
+                        lines[i] = line
+                        break
+        
+        lines.sort(key=lambda line: line['score'], reverse=True)
+        return lines
+    
+    @staticmethod
+    def _edge_window(image, us, slope, intercept, margin):
+        """
+        沿拟合直线的横向窗口索引（每行按直线位置取整平移，边缘在窗口中对齐）
+        
+        Args:
+            image: 灰度图（水平刃边时为转置视图）
+            us: 沿边缘方向的行号
+            slope, intercept: 直线 v = slope * u + intercept
+            margin: 横向半窗口宽度（超出图像时收窄）
+            
+        Returns:
+            tuple: (行索引, 列索引)，形状 (len(us), 2 * margin)；窗口不足4像素时为None
+        """
+        centre = np.rint(slope * us + intercept).astype(np.intp)
+        margin = int(min(margin, centre.min(), image.shape[1] - centre.max()))
+        if margin < 4:
+            return None
+        return us[:, np.newaxis], centre[:, np.newaxis] + np.arange(-margin, margin)
+    
+    @staticmethod
+    def _edge_positions(image, us, centre, radius, polarity=None):
+        """
+        逐行求边缘的亚像素位置：centre两侧 ±radius 窗口内，按边缘极性的一阶差分求质心
+        
+        Args:
+            image: 灰度图（水平刃边时为转置视图）
+            us: 行号
+            centre: 各行边缘位置的初值
+            radius: 半窗口宽度
+            polarity: 边缘极性（1为由暗到亮，-1为由亮到暗），None时按窗口内差分之和判断
+            
+        Returns:
+            tuple: (各行边缘位置, 各行边缘强度, 极性)
+        """
+        centre = np.rint(centre).astype(np.intp)
+        offsets = np.arange(-radius - 1, radius + 2)
+        diff = np.diff(image[us[:, np.newaxis], centre[:, np.newaxis] + offsets].astype(np.float64), axis=1)
+        if polarity is None:
+            polarity = 1.0 if diff.sum() >= 0 else -1.0
+        weight = np.clip(diff * polarity, 0, None)
+        strength = weight.sum(axis=1)
+        positions = centre[:, np.newaxis] + offsets[:-1] + 0.5
+        return (weight * positions).sum(axis=1) / np.maximum(strength, 1e-12), strength, polarity
+    
+    @staticmethod
+    def _robust_line_fit(u, v):
+        """
+        最小二乘拟合 v = slope * u + intercept，剔除3倍MAD之外的离群点后再拟合一次
+        
+        Returns:
+            tuple: (slope, intercept, 内点u, 内点v)；点数不足8个时返回None
+        """
+        if len(u) < 8:
+            return None
+        slope, intercept = np.polyfit(u, v, 1)
+        residual = np.abs(v - (slope * u + intercept))
+        inliers = residual <= max(3 * 1.4826 * np.median(residual), 0.5)
+        if inliers.sum() < 8:
+            return None
+        u, v = u[inliers], v[inliers]
+        slope, intercept = np.polyfit(u, v, 1)
+        return slope, intercept, u, v
+    
+    def _fit_edge_line(self, segment, radius, gray=None):
+        """
+        在全分辨率图像上拟合候选线段对应的刃边直线
+        
+        先沿线段每行（水平刃边为每列）在 ±radius 窗口内求亚像素边缘位置并稳健拟合；
+        再沿拟合直线向两端延伸到整幅图像，取包含原线段的连续有效行重新拟合
+        （霍夫变换常把倾斜的长刃边拆成几段）。阶跃纯度在直线两侧 ±2·radius 的窗口内计算。
+        
+        Args:
+            segment: 全分辨率坐标的线段 (x1, y1, x2, y2)
+            radius: 求质心的半窗口宽度（覆盖降采样线段的定位误差）
+            gray: 拟合所在的灰度图（默认为整幅图像，网格模式传入单个窗口）
+            
+        Returns:
+            dict: orientation（'vertical'/'horizontal'）、slope和intercept（垂直刃边
+                  x = slope * y + intercept，水平刃边 y = slope * x + intercept）、
+                  angle（偏离坐标轴的角度，度）、start/end（端点 (x, y)）、length、
+                  residual（拟合残差RMS，像素）、purity（阶跃纯度0~1）、score；
+                  有效行数不足时返回None
+        """
+        x1, y1, x2, y2 = segment
+        vertical = abs(y2 - y1) >= abs(x2 - x1)
+        # 水平刃边在转置视图上按垂直刃边处理：u沿边缘方向，v横跨边缘
+        if gray is None:
+            gray = self.gray
+        image = gray if vertical else gray.T
+        n_u, n_v = image.shape
+        u1, v1, u2, v2 = (y1, x1, y2, x2) if vertical else (x1, y1, x2, y2)
+        if u2 < u1:
+            u1, v1, u2, v2 = u2, v2, u1, v1
+        
+        # 1. 沿线段拟合（两端各让出radius，避开线段端点处的拐角）
+        us = np.arange(max(int(np.ceil(u1)) + radius, 0), min(int(np.floor(u2)) - radius, n_u - 1) + 1)
+        centre = v1 + (us - u1) * (v2 - v1) / max(u2 - u1, 1e-12)
+        inside = (np.rint(centre) - radius - 1 >= 0) & (np.rint(centre) + radius + 1 < n_v)
+        us, centre = us[inside], centre[inside]
+        if len(us) < 8:
+            return None
+        edge, strength, polarity = self._edge_positions(image, us, centre, radius)
+        # 边缘中断的行（强度不足）不参与拟合
+        valid = strength > 0.5 * np.percentile(strength, 90)
+        fit = self._robust_line_fit(us[valid], edge[valid])
+        if fit is None:
+            return None
+        slope, intercept, u, v = fit
+        
+        # 2. 沿直线延伸：窄窗口内强度不低于原线段一半、位置偏离不超过2像素的行为有效行，
+        #    闭运算填补个别噪声行后取包含原线段中点的连续区间
+        us = np.arange(n_u)
+        centre = slope * us + intercept
+        inside = (np.rint(centre) - 4 >= 0) & (np.rint(centre) + 4 < n_v)
+        us, centre = us[inside], centre[inside]
+        edge, strength, _ = self._edge_positions(image, us, centre, 3, polarity)
+        in_segment = (us >= u[0]) & (us <= u[-1])
+        if in_segment.any():
+            ok = (strength > 0.5 * np.median(strength[in_segment])) & (np.abs(edge - centre) <= 2)
+            ok = ndimage.binary_closing(ok, structure=np.ones(5, dtype=bool))
+            labels, _ = ndimage.label(ok)
+            # 原线段中点所在的行可能不在图像内（直线重新拟合后伸出画面），此时不延伸
+            mid_u = u[len(u) // 2]
+            index = np.searchsorted(us, mid_u)
+            mid = labels[index] if index < len(us) and us[index] == mid_u else 0
+            if mid > 0:
+                run = np.flatnonzero(labels == mid)[radius:-radius or None]
+                fit = self._robust_line_fit(us[run], edge[run]) or fit
+                slope, intercept, u, v = fit
+        residual = float(np.sqrt(np.mean((v - (slope * u + intercept)) ** 2)))
+        
+        # 阶跃纯度：窗口内逐行差分之和与差分绝对值之和的比值（抽样至多64行）
+        sample = u[::max(1, len(u) // 64)]
+        index = self._edge_window(image, sample, slope, intercept, 2 * radius)
+        if index is None:
+            return None
+        diff = np.diff(image[index].astype(np.float64), axis=1)
+        purity = float(abs(diff.sum()) / max(np.abs(diff).sum(), 1e-12))
+        
+        ends = [(float(slope * u[i] + intercept), float(u[i])) for i in (0, -1)]
+        start, end = ends if vertical else [point[::-1] for point in ends]
+        length = float(np.hypot(end[0] - start[0], end[1] - start[1]))
+        return {
+            'orientation': 'vertical' if vertical else 'horizontal',
+            'slope': float(slope),
+            'intercept': float(intercept),
+            'angle': float(np.degrees(np.arctan(slope))),
+            'start': start,
+            'end': end,
+            'length': length,
+            'residual': residual,
+            'purity': purity,
+            'score': length * purity ** 2,
+            # 沿边缘方向的范围和中点（去重用）
+            'span': (float(u[0]), float(u[-1])),
+            'center': float(u[len(u) // 2]),
+        }
+    
+    def check_edge(self, min_contrast=20, max_clipped=0.5, min_edge_fraction=0.001,
+                   max_edge_angle=30, max_pixels=1 << 18):
+        """
+        快速预检：在抽稀图像上检查对比度、过曝/欠曝、刃边是否存在及刃边角度
+        
+        Args:
+            min_contrast: 最小对比度（1%~99%灰度分位差）
+            max_clipped: 灰度为0或255的像素最大占比
+            min_edge_fraction: 强边缘像素的最小占比
+            max_edge_angle: 主导刃边偏离水平/垂直方向的最大角度（度）
+            max_pixels: 抽稀图像的最大像素数
+            
+        Returns:
+            dict: 预检指标，'valid'为是否通过，'reason'为未通过的原因
+        """
+        h, w = self.gray.shape
+        step = max(1, int(np.ceil(np.sqrt(h * w / max_pixels))))
+        small = np.ascontiguousarray(self.gray[::step, ::step])
+        
+        low, high = np.percentile(small, [1, 99])
+        contrast = float(high - low)
+        clipped = float(np.mean((small == 0) | (small == 255)))
+        
+        grad_x = cv2.Sobel(small, cv2.CV_32F, 1, 0, ksize=3)
+        grad_y = cv2.Sobel(small, cv2.CV_32F, 0, 1, ksize=3)
+        magnitude = np.sqrt(grad_x**2 + grad_y**2)
+        # 强边缘须同时高于对比度的一半和噪声水平（梯度中位数的4倍），纯噪声帧不会通过
+        strong = magnitude > max(0.5 * contrast, 4 * float(np.median(magnitude)), 1.0)
+        edge_fraction = float(np.mean(strong))
+        
+        # 结构张量：强边缘梯度方向一致性高时才判断刃边角度
+        gx, gy = grad_x[strong].astype(np.float64), grad_y[strong].astype(np.float64)
+        jxx, jyy, jxy = np.sum(gx * gx), np.sum(gy * gy), np.sum(gx * gy)
+        coherence = float(np.hypot(jxx - jyy, 2 * jxy) / (jxx + jyy)) if jxx + jyy > 0 else 0.0
+        gradient_angle = 0.5 * np.degrees(np.arctan2(2 * jxy, jxx - jyy))
+        # 刃边与梯度方向垂直，偏离坐标轴的角度在0~45度之间
+        edge_angle = float(abs((gradient_angle + 45) % 90 - 45))
+        
+        result = {
+            'contrast': contrast,
+            'clipped': clipped,
+            'edge_fraction': edge_fraction,
+            'edge_angle': edge_angle if coherence > 0.3 else None,
+            'valid': True,
+            'reason': None,
+        }
+        
+        if contrast < min_contrast:
+            result['reason'] = f"对比度过低 ({contrast:.0f} < {min_contrast})"
+        elif clipped > max_clipped:
+            result['reason'] = f"过曝/欠曝像素过多 ({clipped * 100:.0f}%)"
+        elif edge_fraction < min_edge_fraction:
+            result['reason'] = "未检测到明显刃边"
+        elif result['edge_angle'] is not None and edge_angle > max_edge_angle:
+            result['reason'] = f"刃边倾斜过大 ({edge_angle:.0f}°)"
+        result['valid'] = result['reason'] is None
+        
+        return result
+    
+    def extract_edge_roi(self, margin=50, percentile=95):
         """
         提取边缘感兴趣区域（ROI）
         自动检测图像中最明显的边缘区域
         
         Args:
             margin: 边缘周围的边距
+            percentile: 强边缘像素的梯度幅值百分位阈值
             
         Returns:
             numpy.ndarray: 边缘ROI区域
         """
+        self.roi_index = None
+        self.edge_line = None
+        if self.roi_hint is not None:
+            roi = self._extract_edge_roi_tracked(margin, percentile)
+            if roi is not None:
+                return roi
+        
+        if self.roi_mode == 'line':
+            roi = self._extract_edge_roi_line(margin, percentile)
+            if roi is not None:
+                return roi
+        
+        if self._use_tiles(self.gray.shape):
+            return self._extract_edge_roi_tiled(margin, percentile)
+        
+        if self.pyramid_levels > 0:
+            bbox = self._locate_edge_bbox_pyramid(self.pyramid_levels, percentile)
+            if bbox is not None:
+                return self._crop_roi(bbox, margin)
+        
+        if self.threads > 1:
+            return self._extract_edge_roi_threaded(margin, percentile)
+        
         # 计算图像梯度找到最强的边缘
-        grad_x = cv2.Sobel(self.gray, cv2.CV_64F, 1, 0, ksize=3)
-        grad_y = cv2.Sobel(self.gray, cv2.CV_64F, 0, 1, ksize=3)
-        gradient_mag = np.sqrt(grad_x**2 + grad_y**2)
+        return self.roi_from_gradient(self.gradient_magnitude(), margin, percentile)
+    
+    def _extract_edge_roi_line(self, margin, percentile=95):
+        """
+        沿拟合的刃边直线提取窄ROI：每行（水平刃边为每列）在直线位置两侧各取margin个像素，
+        按直线位置取整平移后拼成矩形，倾斜刃边在ROI中被拉直，投影时不再因倾斜而展宽ESF
         
+        Args:
+            margin: 直线两侧的像素数
+            percentile: 强梯度像素的百分位阈值
+            
+        Returns:
+            numpy.ndarray: 对齐后的ROI（垂直刃边为 (行数, 2*margin)，水平刃边为
+                           (2*margin, 列数)）；没有足够长、纯度足够的刃边，或最优的两条
+                           候选评分相近（选哪条取决于噪声，相邻帧结果会跳变）时返回None
+        """
+        lines = self.detect_edges(percentile)
+        if not lines or lines[0]['purity'] < MIN_EDGE_PURITY:
+            return None
+        if len(lines) > 1 and lines[1]['score'] >= EDGE_SCORE_TIE * lines[0]['score']:
+            return None
+        return self._line_roi(lines[0], margin)
+    
+    def _line_roi(self, line, margin):
+        """
+        按刃边直线取对齐的窄ROI，并记录roi_index、roi_bbox和edge_line
+        
+        Args:
+            line: _fit_edge_line 的结果
+            margin: 直线两侧的像素数
+            
+        Returns:
+            numpy.ndarray: 对齐后的ROI；直线两侧的窗口超出图像时返回None
+        """
+        vertical = line['orientation'] == 'vertical'
+        image = self.gray if vertical else self.gray.T
+        us = np.arange(int(line['span'][0]), int(line['span'][1]) + 1)
+        index = self._edge_window(image, us, line['slope'], line['intercept'], margin)
+        if index is None:
+            return None
+        rows, cols = np.broadcast_arrays(*index)
+        # roi_index为原图坐标 (y, x)；水平刃边转置回原图方向
+        self.roi_index = (rows, cols) if vertical else (cols.T, rows.T)
+        yy, xx = self.roi_index
+        self.roi_bbox = (int(yy.min()), int(yy.max()) + 1, int(xx.min()), int(xx.max()) + 1)
+        self.edge_line = line
+        return self.gray[yy, xx]
+    
+    def gradient_magnitude(self):
+        """
+        全分辨率Sobel梯度幅值
+        
+        Returns:
+            numpy.ndarray: 梯度幅值（所选精度）
+        """
+        grad_x = cv2.Sobel(self.gray, self.cv_depth, 1, 0, ksize=3)
+        grad_y = cv2.Sobel(self.gray, self.cv_depth, 0, 1, ksize=3)
+        return np.sqrt(grad_x**2 + grad_y**2)
+    
+    def roi_from_gradient(self, gradient_mag, margin=50, percentile=95):
+        """
+        由梯度幅值定位强边缘像素并裁剪ROI
+        
+        Args:
+            gradient_mag: gradient_magnitude 的结果
+            margin: 边缘周围的边距
+            percentile: 强边缘像素的梯度幅值百分位阈值
+            
+        Returns:
+            numpy.ndarray: 边缘ROI区域
+        """
         # 找到梯度最大的区域
-        threshold = np.percentile(gradient_mag, 95)
+        threshold = np.percentile(gradient_mag, percentile)
+        self.roi_threshold = threshold
         edge_mask = gradient_mag > threshold
         
         # 找到边缘区域的边界框
         coords = np.column_stack(np.where(edge_mask))
         if len(coords) == 0:
             # 如果没有找到边缘，使用整个图像
+            self.roi_bbox = (0, self.gray.shape[0], 0, self.gray.shape[1])
             return self.gray
         
         y_min, x_min = coords.min(axis=0)
         y_max, x_max = coords.max(axis=0)
         
+        return self._crop_roi((y_min, y_max, x_min, x_max), margin)
+    
+    def _crop_roi(self, bbox, margin):
+        """
+        按强边缘像素的边界框加边距裁剪ROI
+        
+        Args:
+            bbox: 强边缘像素的边界框 (y_min, y_max, x_min, x_max)，max为包含端点
+            margin: 边缘周围的边距
+            
+        Returns:
+            numpy.ndarray: 边缘ROI区域
+        """
+        y_min, y_max, x_min, x_max = (int(v) for v in bbox)
+        self.edge_bbox = (y_min, y_max, x_min, x_max)
+        
         # 添加边距
         y_min = max(0, y_min - margin)
         y_max = min(self.gray.shape[0], y_max + margin)
         x_min = max(0, x_min - margin)
         x_max = min(self.gray.shape[1], x_max + margin)
         
+        self.roi_bbox = (y_min, y_max, x_min, x_max)
         roi = self.gray[y_min:y_max, x_min:x_max]
         return roi
     
-    def compute_esf(self, roi=None):
+    def _window_strong_mask(self, y0, y1, x0, x1, threshold):
+        """
+        计算窗口内的全分辨率强边缘掩码（带1像素光晕，与整幅计算一致）
+        
+        Args:
+            y0, y1, x0, x1: 窗口范围
+            threshold: 梯度幅值阈值
+            
+        Returns:
+            numpy.ndarray: 窗口内梯度幅值大于阈值的掩码
+        """
+        h, w = self.gray.shape
+        y0, y1, x0, x1 = max(0, y0), min(h, y1), max(0, x0), min(w, x1)
+        grad_x, grad_y = self._tile_sobel(
+            self.gray, (y0, y1, x0, x1),
+            (max(0, y0 - 1), min(h, y1 + 1), max(0, x0 - 1), min(w, x1 + 1)))
+        return np.sqrt(grad_x**2 + grad_y**2) > threshold
+    
+    def roi_state(self):
+        """
+        导出当前帧的ROI状态，供下一帧作为roi_hint复用
+        
+        Returns:
+            dict: 边缘边界框、梯度阈值、边缘方向和对比度（line模式为拟合的刃边直线、
+                  边缘方向和对比度），ROI未确定时返回None
+        """
+        if self.edge_line is not None and self.edge_orientation is not None:
+            return {
+                'line': self.edge_line,
+                'orientation': self.edge_orientation,
+                'contrast': self._sample_contrast(),
+                'shape': self.gray.shape,
+            }
+        if self.edge_bbox is None or self.roi_threshold is None or self.edge_orientation is None:
+            return None
+        return {
+            'edge_bbox': self.edge_bbox,
+            'threshold': self.roi_threshold,
+            'orientation': self.edge_orientation,
+            'contrast': self._sample_contrast(),
+            'shape': self.gray.shape,
+        }
+    
+    def _sample_contrast(self, samples=1 << 14):
+        """
+        在随机采样点上估计图像对比度（1%~99%灰度分位差）
+        
+        Args:
+            samples: 采样点数
+            
+        Returns:
+            float: 对比度
+        """
+        h, w = self.gray.shape
+        flat = np.sort(np.random.default_rng(1).integers(0, h * w, min(samples, h * w)))
+        rows, cols = np.divmod(flat, w)
+        low, high = np.percentile(self.gray[rows, cols], [1, 99])
+        return float(high - low)
+    
+    def _extract_edge_roi_tracked(self, margin, percentile=95, search=16, contrast_tol=0.25,
+                                  orientation_tol=0.1, z=4.0):
+        """
+        复用上一帧的ROI：在小搜索窗口内做局部校验，通过时跳过全图搜索
+        
+        校验内容：
+        1. 对比度与上一帧相差不超过contrast_tol
+        2. 上一帧的梯度阈值落在本帧采样百分位的置信区间内
+        3. 采样梯度没有明显偏向与上一帧不同的方向
+        4. 边界框四条边的 ±search 窗口内都能找到强边缘，且未触及窗口外沿
+        上一帧为line模式的刃边直线时，对比度校验之后改由 _extract_edge_roi_line_tracked 校验
+        
+        Args:
+            margin: 边缘周围的边距
+            percentile: 强边缘像素的梯度幅值百分位阈值（与全图搜索一致）
+            search: 边界位置的搜索半径（像素）
+            contrast_tol: 对比度相对变化容差
+            orientation_tol: 梯度主方向的相对容差
+            z: 阈值置信区间的标准差倍数
+            
+        Returns:
+            numpy.ndarray: 边缘ROI区域，校验失败时返回None
+        """
+        hint = self.roi_hint
+        self.roi_fast_path = False
+        if hint['shape'] != self.gray.shape:
+            return None
+        
+        # 1. 对比度
+        contrast = self._sample_contrast()
+        if abs(contrast - hint['contrast']) > contrast_tol * max(hint['contrast'], 1.0):
+            return None
+        if 'line' in hint:
+            return self._extract_edge_roi_line_tracked(margin, hint, search)
+        
+        # 2~3. 梯度阈值与边缘方向
+        grad_x, grad_y = self._sample_gradient_magnitude(samples=1 << 14)
+        sample = np.sort(np.sqrt(grad_x**2 + grad_y**2))
+        m = len(sample)
+        q = percentile / 100
+        spread = z * np.sqrt(m * q * (1 - q))
+        t_lo = sample[max(0, int(np.floor(m * q - spread)))]
+        t_hi = sample[min(m - 1, int(np.ceil(m * q + spread)))]
+        threshold = hint['threshold']
+        if not t_lo <= threshold <= t_hi:
+            return None
+        # 纹理类图像两个方向的梯度接近，只在采样明显偏向另一方向时判为失败
+        along, across = np.abs(grad_x).mean(), np.abs(grad_y).mean()
+        if hint['orientation'] == 'horizontal':
+            along, across = across, along
+        if across > (1 + orientation_tol) * along:
+            return None
+        
+        # 4. 四条边界的局部搜索
+        h, w = self.gray.shape
+        y_min, y_max, x_min, x_max = hint['edge_bbox']
+        
+        def locate(lo, hi, size, hits, last):
+            """在 [lo, hi) 窗口内定位边界，强边缘触及窗口外沿时视为失败"""
+            lo, hi = max(0, lo), min(size, hi)
+            hits = np.nonzero(hits)[0] + lo
+            if len(hits) == 0:
+                return None
+            edge = hits[-1] if last else hits[0]
+            outer = hi - 1 if last else lo
+            if edge == outer and outer not in (0, size - 1):
+                return None
+            return int(edge)
+        
+        span_y = (y_min - search, y_max + search + 1)
+        span_x = (x_min - search, x_max + search + 1)
+        top = self._window_strong_mask(y_min - search, y_min + search + 1, *span_x, threshold)
+        bottom = self._window_strong_mask(y_max - search, y_max + search + 1, *span_x, threshold)
+        left = self._window_strong_mask(*span_y, x_min - search, x_min + search + 1, threshold)
+        right = self._window_strong_mask(*span_y, x_max - search, x_max + search + 1, threshold)
+        
+        bbox = (
+            locate(y_min - search, y_min + search + 1, h, top.any(axis=1), False),
+            locate(y_max - search, y_max + search + 1, h, bottom.any(axis=1), True),
+            locate(x_min - search, x_min + search + 1, w, left.any(axis=0), False),
+            locate(x_max - search, x_max + search + 1, w, right.any(axis=0), True),
+        )
+        if any(v is None for v in bbox):
+            return None
+        
+        self.roi_threshold = threshold
+        self.edge_orientation = hint['orientation']
+        self.roi_fast_path = True
+        return self._crop_roi(bbox, margin)
+    
+    def _extract_edge_roi_line_tracked(self, margin, hint, search=16, angle_tol=0.5, length_tol=0.5):
+        """
+        line模式复用上一帧的刃边直线：不做Canny和霍夫变换，直接沿上一帧的直线在全分辨率
+        重新求亚像素边缘位置并拟合，直线的方向、倾角、位置、长度和阶跃纯度都与上一帧
+        一致时取对齐的窄ROI
+        
+        Args:
+            margin: 直线两侧的像素数
+            hint: roi_state 导出的line模式状态
+            search: 刃边中点的最大位移（像素）
+            angle_tol: 倾角的最大变化（度）
+            length_tol: 刃边长度相对上一帧的最大缩短比例
+            
+        Returns:
+            numpy.ndarray: 对齐后的ROI，校验失败时返回None
+        """
+        previous = hint['line']
+        h, w = self.gray.shape
+        min_length = max((1 - length_tol) * previous['length'], MIN_EDGE_LENGTH * min(h, w))
+        line = self._fit_edge_line((*previous['start'], *previous['end']), 4)
+        if (line is None or line['orientation'] != previous['orientation']
+                or line['purity'] < MIN_EDGE_PURITY
+                or abs(line['angle'] - previous['angle']) > angle_tol
+                or line['length'] < min_length):
+            return None
+        # 刃边在上一帧中点处的横向位移
+        centre = previous['center']
+        shift = (line['slope'] - previous['slope']) * centre + line['intercept'] - previous['intercept']
+        if abs(shift) > search:
+            return None
+        
+        roi = self._line_roi(line, margin)
+        if roi is None:
+            return None
+        self.edge_orientation = hint['orientation']
+        self.roi_fast_path = True
+        return roi
+    
+    def _sample_gradient_magnitude(self, samples=1 << 18, seed=0):
+        """
+        在随机采样点上计算Sobel梯度幅值（与cv2.Sobel的BORDER_REFLECT_101边界一致）
+        
+        Args:
+            samples: 采样点数
+            seed: 随机种子（固定种子保证结果可复现）
+            
+        Returns:
+            tuple: (grad_x, grad_y) 采样点上的梯度
+        """
+        h, w = self.gray.shape
+        rng = np.random.default_rng(seed)
+        samples = min(samples, h * w)
+        # 按行优先顺序排列采样点，使取值访问内存有序
+        flat = np.sort(rng.integers(0, h * w, samples))
+        rows, cols = np.divmod(flat, w)
+        
+        def reflect(idx, size):
+            idx = np.abs(idx)
+            idx = np.where(idx >= size, 2 * (size - 1) - idx, idx)
+            return np.clip(idx, 0, size - 1)
+        
+        r_prev, r_next = reflect(rows - 1, h), reflect(rows + 1, h)
+        c_prev, c_next = reflect(cols - 1, w), reflect(cols + 1, w)
+        
+        def pick(r, c):
+            return self.gray[r, c].astype(np.int32)
+        
+        grad_x = (pick(r_prev, c_next) + 2 * pick(rows, c_next) + pick(r_next, c_next)
+                  - pick(r_prev, c_prev) - 2 * pick(rows, c_prev) - pick(r_next, c_prev))
+        grad_y = (pick(r_next, c_prev) + 2 * pick(r_next, cols) + pick(r_next, c_next)
+                  - pick(r_prev, c_prev) - 2 * pick(r_prev, cols) - pick(r_prev, c_next))
+        return grad_x, grad_y
+    
+    def _block_gradient_bound(self, factor):
+        """
+        构建块最大/最小值金字塔，给出每个块内Sobel梯度幅值的上界
+        
+        Sobel核的权重绝对值之和为4，因此 |Gx|, |Gy| <= 4*邻域极差，
+        |G| <= 4*sqrt(2)*极差。取3x3邻域块的极差以覆盖跨块的Sobel核。
+        
+        Args:
+            factor: 降采样倍数（块边长）
+            
+        Returns:
+            numpy.ndarray: 每块梯度幅值上界 (ceil(h/factor), ceil(w/factor))
+        """
+        h, w = self.gray.shape
+        hb, wb = -(-h // factor), -(-w // factor)
+        
+        # 边缘复制填充到整块（不改变极差）
+        padded = cv2.copyMakeBorder(self.gray, 0, hb * factor - h, 0, wb * factor - w,
+                                    cv2.BORDER_REPLICATE)
+        
+        def reduce(op):
+            rows = padded.reshape(hb, factor, -1)
+            out = rows[:, 0].copy()
+            for i in range(1, factor):
+                op(out, rows[:, i], out=out)
+            cols = out.reshape(hb, wb, factor)
+            out = cols[:, :, 0].copy()
+            for i in range(1, factor):
+                op(out, cols[:, :, i], out=out)
+            return out
+        
+        kernel = np.ones((3, 3), np.uint8)
+        block_max = cv2.dilate(reduce(np.maximum), kernel)
+        block_min = cv2.erode(reduce(np.minimum), kernel)
+        return (block_max.astype(np.float32) - block_min) * (4 * np.sqrt(2))
+    
+    def _locate_edge_bbox_pyramid(self, levels, percentile=95, tolerance=4, z=4.0):
+        """
+        金字塔由粗到细定位强边缘像素的边界框
+        
+        1. 随机采样估计梯度百分位阈值，并按次序统计量给出置信区间 [T_lo, T_hi]
+        2. 在1/2^levels分辨率的块上用梯度上界筛出可能含强边缘的候选块
+        3. 四条边分别由外向内逐条扫描候选块，只在这些窗口上计算全分辨率梯度，
+           直到找到超过 T_hi 的像素为止
+        
+        边界框随阈值单调收缩，真实阈值落在置信区间内时，全分辨率搜索的边界框
+        介于 T_lo 与 T_hi 的边界框之间。两者差距超过tolerance时返回None，
+        由调用方退回全分辨率搜索。
+        
+        Args:
+            levels: 金字塔层数
+            percentile: 强边缘的梯度百分位阈值
+            tolerance: 允许与全分辨率结果的最大偏差（像素）
+            z: 置信区间的标准差倍数
+            
+        Returns:
+            tuple: 边界框 (y_min, y_max, x_min, x_max)，无法保证容差时返回None
+        """
+        gray = self.gray
+        h, w = gray.shape
+        factor = 2 ** levels
+        
+        # 1. 采样阈值及置信区间
+        grad_x, grad_y = self._sample_gradient_magnitude()
+        sample = np.sort(np.sqrt(grad_x**2 + grad_y**2))
+        m = len(sample)
+        q = percentile / 100.0
+        spread = z * np.sqrt(m * q * (1 - q))
+        t_est = float(np.percentile(sample, percentile))
+        t_lo = float(sample[max(0, int(np.floor(m * q - spread)))])
+        t_hi = float(sample[min(m - 1, int(np.ceil(m * q + spread)))])
+        thresholds = (t_lo, t_est, t_hi)
+        
+        # 2. 候选块
+        candidates = self._block_gradient_bound(factor) > t_lo
+        if not candidates.any():
+            return None
+        
+        def strong_lines(y0, y1, x0, x1, axis):
+            """计算窗口内全分辨率梯度，返回每个阈值下含强像素的行（axis=1）或列（axis=0）"""
+            hy0, hy1 = max(0, y0 - 1), min(h, y1 + 1)
+            hx0, hx1 = max(0, x0 - 1), min(w, x1 + 1)
+            window = gray[hy0:hy1, hx0:hx1]
+            gx = cv2.Sobel(window, cv2.CV_64F, 1, 0, ksize=3)
+            gy = cv2.Sobel(window, cv2.CV_64F, 0, 1, ksize=3)
+            mag = np.sqrt(gx**2 + gy**2)[y0 - hy0:y1 - hy0, x0 - hx0:x1 - hx0]
+            offset = y0 if axis == 1 else x0
+            return [np.nonzero((mag > t).any(axis=axis))[0] + offset for t in thresholds]
+        
+        def scan(blocks, window, axis, reverse):
+            """由外向内扫描块行/块列，返回三个阈值下的边界位置"""
+            found = [None, None, None]
+            order = blocks[::-1] if reverse else blocks
+            for b in order:
+                lines = strong_lines(*window(b), axis)
+                for i, hits in enumerate(lines):
+                    if found[i] is None and len(hits):
+                        found[i] = hits[-1] if reverse else hits[0]
+                if found[2] is not None:
+                    return found
+            return None
+        
+        block_rows = np.nonzero(candidates.any(axis=1))[0]
+        block_cols = np.nonzero(candidates.any(axis=0))[0]
+        
+        def row_window(by):
+            bx = np.nonzero(candidates[by])[0]
+            return (by * factor, min((by + 1) * factor, h),
+                    bx[0] * factor, min((bx[-1] + 1) * factor, w))
+        
+        def col_window(bx):
+            by = np.nonzero(candidates[:, bx])[0]
+            return (by[0] * factor, min((by[-1] + 1) * factor, h),
+                    bx * factor, min((bx + 1) * factor, w))
+        
+        # 3. 四条边分别扫描
+        sides = [
+            scan(block_rows, row_window, 1, False),  # y_min
+            scan(block_rows, row_window, 1, True),   # y_max
+            scan(block_cols, col_window, 0, False),  # x_min
+            scan(block_cols, col_window, 0, True),   # x_max
+        ]
+        if any(side is None for side in sides):
+            return None
+        
+        # T_lo（外）与 T_hi（内）边界框的差距即为与全分辨率结果的最大偏差
+        deviation = max(abs(int(side[0]) - int(side[2])) for side in sides)
+        if deviation > tolerance:
+            return None
+        
+        self.roi_threshold = t_est
+        return tuple(int(side[1]) for side in sides)
+    
+    def compute_esf(self, roi=None, oversample=4):
         """
         计算边缘扩散函数（Edge Spread Function, ESF）
         
         Args:
             roi: 边缘ROI区域，如果为None则使用整个图像
+            oversample: 亚像素插值倍数
             
         Returns:
             numpy.ndarray: ESF曲线
         """
+        return self.interpolate_esf(self.project_edge(roi), oversample)
+    
+    def project_edge(self, roi=None):
+        """
+        判断边缘方向并沿边缘方向投影ROI，得到未插值的ESF
+        
+        Args:
+            roi: 边缘ROI区域，如果为None则使用整个图像
+            
+        Returns:
+            numpy.ndarray: 投影得到的ESF（每个像素一个采样点）
+        """
         if roi is None:
             roi = self.gray
         
-        # 检测边缘方向（水平或垂直）
-        grad_x = np.abs(cv2.Sobel(roi, cv2.CV_64F, 1, 0, ksize=3)).mean()
-        grad_y = np.abs(cv2.Sobel(roi, cv2.CV_64F, 0, 1, ksize=3)).mean()
-        
-        # 沿着梯度最大的方向投影
-        if grad_x > grad_y:
-            # 垂直边缘，沿x方向投影
-            esf = np.mean(roi, axis=0)
+        if self.roi_fast_path:
+            # 序列模式已校验边缘方向，直接投影
+            axis = 0 if self.edge_orientation == 'vertical' else 1
+            esf = self.kernels.project(roi, axis, self.dtype)
+        elif self._use_tiles(roi.shape):
+            esf, self.edge_orientation = self._esf_projection_tiled(roi)
+        elif self.threads > 1:
+            esf, self.edge_orientation = self._esf_projection_threaded(roi)
         else:
-            # 水平边缘，沿y方向投影
-            esf = np.mean(roi, axis=1)
+            # 检测边缘方向（水平或垂直）
+            grad_x = np.abs(cv2.Sobel(roi, self.cv_depth, 1, 0, ksize=3)).mean()
+            grad_y = np.abs(cv2.Sobel(roi, self.cv_depth, 0, 1, ksize=3)).mean()
+            
+            # 沿着梯度最大的方向投影
+            if grad_x > grad_y:
+                # 垂直边缘，沿x方向投影
+                esf = self.kernels.project(roi, 0, self.dtype)
+                self.edge_orientation = 'vertical'
+            else:
+                # 水平边缘，沿y方向投影
+                esf = self.kernels.project(roi, 1, self.dtype)
+                self.edge_orientation = 'horizontal'
         
+        return esf
+    
+    def interpolate_esf(self, esf, oversample=4):
+        """
+        ESF亚像素插值
+        
+        Args:
+            esf: project_edge 得到的ESF
+            oversample: 亚像素插值倍数
+            
+        Returns:
+            numpy.ndarray: 插值后的ESF
+        """
         # 亚像素插值，提高采样密度
-        x_original = np.arange(len(esf))
-        x_interpolated = np.linspace(0, len(esf)-1, len(esf)*4)
-        esf_interpolated = np.interp(x_interpolated, x_original, esf)
+        x_interpolated = np.linspace(0, len(esf)-1, len(esf)*oversample)
+        esf_interpolated = self.kernels.interpolate(esf, x_interpolated, self.dtype)
         
         return esf_interpolated
     
-    def compute_lsf(self, esf):
+    def compute_lsf(self, esf, sigma=2):
         """
         计算线扩散函数（Line Spread Function, LSF）
         LSF = dESF/dx (ESF的一阶导数)
         
         Args:
             esf: 边缘扩散函数
+            sigma: 高斯平滑的标准差（插值后的采样点）
             
         Returns:
             numpy.ndarray: LSF曲线
         """
-        # 使用中心差分法计算导数
-        lsf = np.gradient(esf)
-        
-        # 使用高斯滤波平滑LSF，减少噪声
-        lsf_smoothed = ndimage.gaussian_filter1d(lsf, sigma=2)
-        
-        return lsf_smoothed
+        # 使用中心差分法计算导数，并用高斯滤波平滑LSF，减少噪声
+        return self.kernels.lsf(esf, sigma=sigma)
     
     def compute_mtf_from_lsf(self, lsf):
         """
@@ -217,7 +1628,7 @@ class MTFSharpnessEvaluator:
         Returns:
             tuple: (frequencies, mtf_values)
         """
-        # 对LSF进行FFT
+        # 对LSF进行FFT（scipy.fft对float32输入保持单精度）
         lsf_fft = fft(lsf)
         
         # 计算MTF（取模值并归一化）
@@ -245,29 +1656,9 @@ class MTFSharpnessEvaluator:
         Returns:
             float: MTF50值（cycles/pixel）
         """
-        # 找到MTF首次下降到0.5以下的位置
-        idx = np.where(mtf < 0.5)[0]
-        
-        if len(idx) == 0:
-            # 如果MTF始终大于0.5，返回最大频率
-            return frequencies[-1]
-        
-        idx50 = idx[0]
-        
-        if idx50 == 0:
-            return frequencies[0]
-        
-        # 线性插值获得精确的MTF50频率
-        f1, f2 = frequencies[idx50-1], frequencies[idx50]
-        m1, m2 = mtf[idx50-1], mtf[idx50]
-        
-        # 线性插值: f = f1 + (0.5 - m1) * (f2 - f1) / (m2 - m1)
-        if abs(m2 - m1) > 1e-10:
-            mtf50 = f1 + (0.5 - m1) * (f2 - f1) / (m2 - m1)
-        else:
-            mtf50 = f1
-        
-        return mtf50
+        # MTF首次下降到0.5以下的位置，线性插值获得精确的MTF50频率
+        # （MTF始终大于0.5时返回最大频率）
+        return self.compute_mtf_at_value(frequencies, mtf, 0.5)
     
     def compute_mtf_sharpness(self):
         """
@@ -276,31 +1667,74 @@ class MTFSharpnessEvaluator:
         
         Returns:
             dict: 包含MTF50、平均MTF等指标的字典
+            
+        Raises:
+            NoValidEdgeError: 启用预检且图像中没有可用刃边
         """
+        stage_times = self.stage_times = {}
+        t0 = time.perf_counter()
+        
+        # 0. 快速预检，跳过空白、饱和或误触发的帧
+        if self.precheck:
+            check = self.check_edge()
+            t1 = time.perf_counter()
+            stage_times['precheck'] = t1 - t0
+            t0 = t1
+            if not check['valid']:
+                raise NoValidEdgeError(check['reason'], check)
+        
         # 1. 提取边缘ROI
         roi = self.extract_edge_roi()
+        t1 = time.perf_counter()
+        stage_times['roi'] = t1 - t0
         
         # 2. 计算ESF
         esf = self.compute_esf(roi)
+        t2 = time.perf_counter()
+        stage_times['esf'] = t2 - t1
         
         # 3. 计算LSF（ESF的导数）
         lsf = self.compute_lsf(esf)
+        t3 = time.perf_counter()
+        stage_times['lsf'] = t3 - t2
         
         # 4. 通过FFT计算MTF
         frequencies, mtf = self.compute_mtf_from_lsf(lsf)
         
-        # 5. 计算MTF50
-        mtf50 = self.compute_mtf50(frequencies, mtf)
+        # 5. 计算MTF50等指标
+        results = self.compute_metrics(frequencies, mtf)
+        
+        t4 = time.perf_counter()
+        stage_times['mtf'] = t4 - t3
+        
+        # 6. 可选：MTF50的自助法置信区间
+        if self.bootstrap:
+            results.update(self.compute_bootstrap_ci(roi))
+            stage_times['bootstrap'] = time.perf_counter() - t4
+        
+        return results
+    
+    def compute_metrics(self, frequencies, mtf, thresholds=(0.5, 0.3, 0.1)):
+        """
+        由MTF曲线计算MTF50/30/10、曲线下面积和清晰度评分，并保存到评估器
+        
+        Args:
+            frequencies: 频率数组
+            mtf: MTF值数组
+            thresholds: 需要给出交叉频率的MTF值（键为 mtf50、mtf30 ...）
+            
+        Returns:
+            dict: 包含MTF50、平均MTF等指标的字典
+        """
+        results = {f"mtf{round(value * 100)}": self.compute_mtf_at_value(frequencies, mtf, value)
+                   for value in thresholds}
+        mtf50 = results['mtf50'] if 'mtf50' in results else self.compute_mtf50(frequencies, mtf)
         
         # 保存结果
         self.mtf_curve = mtf
         self.frequencies = frequencies
         self.mtf50 = mtf50
         
-        # 计算其他有用的指标
-        mtf30 = self.compute_mtf_at_value(frequencies, mtf, 0.3)
-        mtf10 = self.compute_mtf_at_value(frequencies, mtf, 0.1)
-        
         # 计算MTF曲线下面积（Area Under Curve）作为综合指标
         mtf_auc = np.trapezoid(mtf, frequencies)
         
@@ -308,18 +1742,80 @@ class MTFSharpnessEvaluator:
         # 通常MTF50在0.1-0.5范围内，映射到0-100
         sharpness_score = min(100, mtf50 * 200)
         
-        results = {
+        results.update({
             'mtf50': mtf50,
-            'mtf30': mtf30,
-            'mtf10': mtf10,
             'mtf_auc': mtf_auc,
             'sharpness_score': sharpness_score,
             'frequencies': frequencies,
             'mtf_curve': mtf
-        }
-        
+        })
         return results
     
+    def compute_bootstrap_ci(self, roi=None, samples=None, confidence=None, seed=0):
+        """
+        MTF50的自助法（bootstrap）置信区间
+        ESF是ROI中沿边缘方向各行（垂直刃边，水平刃边为各列）的平均，对这些行有放回重抽样：
+        每个样本的ESF是按各行被抽中次数加权的行平均，一批样本的ESF由一次矩阵乘法
+        (样本数×行数)·(行数×L) 得到，插值、LSF、FFT和MTF50阈值搜索沿最后一维批量完成
+        （_stack_interpolate、_stack_mtf、_stack_crossing），不逐样本重复评估
+        
+        Args:
+            roi: 边缘ROI（None表示取最近一次extract_edge_roi的ROI）
+            samples: 重抽样次数（默认为构造时的bootstrap）
+            confidence: 置信水平（默认为构造时的confidence）
+            seed: 随机数种子（固定种子使同一图像的区间可复现）
+            
+        Returns:
+            dict: mtf50_ci（百分位区间的上下限）、mtf50_std（重抽样MTF50的标准差）、
+                  bootstrap_samples、confidence
+        """
+        samples = int(samples if samples is not None else self.bootstrap)
+        confidence = float(confidence if confidence is not None else self.confidence)
+        if samples < 2:
+            raise ValueError(f"重抽样次数至少为2: {samples}")
+        if not 0 < confidence < 1:
+            raise ValueError(f"置信水平必须在0和1之间: {confidence}")
+        
+        if roi is None:
+            if self.roi_bbox is None:
+                roi = self.extract_edge_roi()
+            elif self.roi_index is not None:
+                roi = self.gray[self.roi_index]
+            else:
+                y0, y1, x0, x1 = self.roi_bbox
+                roi = self.gray[y0:y1, x0:x1]
+        if self.edge_orientation is None:
+            self.project_edge(roi)
+        lines = roi if self.edge_orientation == 'vertical' else roi.T
+        n, length = lines.shape
+        
+        rng = np.random.default_rng(seed)
+        uniform = np.full(n, 1.0 / n)
+        batch = max(1, BOOTSTRAP_BATCH_BYTES // (length * 4 * 8))
+        mtf50 = np.empty(samples)
+        for start in range(0, samples, batch):
+            count = min(batch, samples - start)
+            # 各样本中每一行被抽中的次数，行平均即按次数加权
+            weights = rng.multinomial(n, uniform, size=count).astype(self.dtype)
+            projected = np.zeros((count, length), dtype=self.dtype)
+            for s in range(0, n, STRIP_ROWS):
+                strip = lines[s:s + STRIP_ROWS].astype(self.dtype, copy=False)
+                projected += weights[:, s:s + STRIP_ROWS] @ strip
+            projected /= n
+            
+            _, esf = self._stack_interpolate(projected)
+            frequencies, mtf, _ = self._stack_mtf(esf)
+            mtf50[start:start + count] = self._stack_crossing(frequencies, mtf, 0.5)
+        
+        tail = (1 - confidence) / 2 * 100
+        low, high = np.percentile(mtf50, [tail, 100 - tail])
+        return {
+            'mtf50_ci': (float(low), float(high)),
+            'mtf50_std': float(mtf50.std(ddof=1)),
+            'bootstrap_samples': samples,
+            'confidence': confidence,
+        }
+    
     def compute_mtf_at_value(self, frequencies, mtf, value):
         """
         计算MTF下降到指定值时的频率
@@ -332,25 +1828,335 @@ class MTFSharpnessEvaluator:
         Returns:
             float: 对应的频率值
         """
-        idx = np.where(mtf < value)[0]
-        if len(idx) == 0:
-            return frequencies[-1]
+        # 线性插值: f = f1 + (value - m1) * (f2 - f1) / (m2 - m1)
+        return self.kernels.crossing(frequencies, mtf, value)
+    
+    def compute_channel_mtf(self, window=16):
+        """
+        分通道MTF评估（用于横向色差分析）
+        边缘ROI和方向只在亮度图上确定一次，R/G/B/L四个通道的ESF、LSF和MTF
+        按堆叠数组一起计算，并由各通道LSF质心给出通道间的边缘偏移
+        
+        Args:
+            window: 求LSF质心的半窗口宽度（原始像素）
+        
+        Returns:
+            dict: 各通道的MTF50/30/10和边缘位置、通道间边缘偏移（像素）及MTF曲线
+            
+        Raises:
+            ValueError: 图像不是彩色图像
+            NoValidEdgeError: 启用预检且图像中没有可用刃边
+        """
+        if self.image is None or self.image.ndim != 3:
+            raise ValueError("分通道MTF需要彩色图像")
+        
+        if self.precheck:
+            check = self.check_edge()
+            if not check['valid']:
+                raise NoValidEdgeError(check['reason'], check)
+        
+        # 1. 在亮度图上定位ROI并确定边缘方向（亮度通道结果与compute_mtf_sharpness相同）
+        roi = self.extract_edge_roi()
+        esf_luma = self.compute_esf(roi)
         
-        idx_val = idx[0]
-        if idx_val == 0:
-            return frequencies[0]
+        # 2. 同一ROI内的RGB通道一起投影：(h, w, 3) → (3, n)
+        if self.roi_index is not None:
+            color_roi = self.image[self.roi_index + (slice(0, 3),)]
+        else:
+            y0, y1, x0, x1 = self.roi_bbox
+            color_roi = self.image[y0:y1, x0:x1, :3]
+        axis = 0 if self.edge_orientation == 'vertical' else 1
+        projected = np.mean(color_roi, axis=axis, dtype=self.dtype).T
+        
+        # 亚像素插值（所有通道共用插值位置）
+        x_interpolated, esf_rgb = self._stack_interpolate(projected)
+        esf = np.vstack([esf_rgb, esf_luma[np.newaxis]])
         
-        # 线性插值
-        f1, f2 = frequencies[idx_val-1], frequencies[idx_val]
-        m1, m2 = mtf[idx_val-1], mtf[idx_val]
+        # 3. LSF和MTF沿最后一维批量计算
+        frequencies, mtf, lsf = self._stack_mtf(esf)
         
-        if abs(m2 - m1) > 1e-10:
-            freq = f1 + (value - m1) * (f2 - f1) / (m2 - m1)
+        mtf50 = self._stack_crossing(frequencies, mtf, 0.5)
+        mtf30 = self._stack_crossing(frequencies, mtf, 0.3)
+        mtf10 = self._stack_crossing(frequencies, mtf, 0.1)
+        
+        # 4. 边缘位置：按边缘极性取正的LSF，在亮度LSF峰值附近的公共窗口内求质心，
+        #    换算为图像坐标（窗口外的噪声拖尾会把质心拉向ROI中心）
+        lsf_pos = lsf * np.sign(lsf.sum(axis=1, keepdims=True))
+        lsf_pos = np.clip(lsf_pos, 0, None)
+        peak = int(np.argmax(lsf_pos[-1]))
+        lo, hi = max(0, peak - window * 4), min(lsf.shape[1], peak + window * 4 + 1)
+        weights = lsf_pos[:, lo:hi]
+        if self.roi_index is not None:
+            # 逐行对齐的ROI：按ROI中间一行（水平刃边为中间一列）的窗口起点换算
+            yy, xx = self.roi_index
+            offset = xx[len(xx) // 2, 0] if axis == 0 else yy[0, yy.shape[1] // 2]
         else:
-            freq = f1
+            offset = x0 if axis == 0 else y0
+        position = offset + (weights @ x_interpolated[lo:hi]) / (weights.sum(axis=1) + 1e-10)
+        
+        channels = {}
+        for k, name in enumerate(CHANNELS):
+            channels[name] = {
+                'mtf50': float(mtf50[k]),
+                'mtf30': float(mtf30[k]),
+                'mtf10': float(mtf10[k]),
+                'edge_position': float(position[k]),
+            }
         
-        return freq
+        # 以G通道为参考的横向色差（像素）
+        edge_shift = {
+            'R-G': channels['R']['edge_position'] - channels['G']['edge_position'],
+            'B-G': channels['B']['edge_position'] - channels['G']['edge_position'],
+            'R-B': channels['R']['edge_position'] - channels['B']['edge_position'],
+        }
+        
+        return {
+            'channels': channels,
+            'edge_shift': edge_shift,
+            'orientation': self.edge_orientation,
+            'frequencies': frequencies,
+            'mtf_curves': mtf,
+        }
+    
+    def _stack_interpolate(self, projected):
+        """
+        对堆叠的ESF逐行做4倍亚像素插值（与np.interp相同的公式）
+        
+        Args:
+            projected: 形状为 (曲线数, n) 的未插值ESF
+            
+        Returns:
+            tuple: (插值位置, 形状为 (曲线数, 4n) 的ESF)
+        """
+        n = projected.shape[1]
+        x_interpolated = np.linspace(0, n-1, n*4)
+        j = np.minimum(x_interpolated.astype(np.intp), n - 2)
+        left = projected[:, j].astype(np.float64)
+        right = projected[:, j + 1].astype(np.float64)
+        esf = (right - left) * (x_interpolated - j) + left
+        esf[:, -1] = projected[:, -1]
+        return x_interpolated, esf.astype(self.dtype)
+    
+    @staticmethod
+    def _stack_mtf(esf):
+        """
+        对堆叠的ESF沿最后一维一次性计算LSF和MTF（与compute_lsf、compute_mtf_from_lsf相同）
+        
+        Args:
+            esf: 形状为 (曲线数, 采样点数) 的ESF
+            
+        Returns:
+            tuple: (frequencies, 形状为 (曲线数, 频点数) 的MTF, LSF)
+        """
+        lsf = ndimage.gaussian_filter1d(np.gradient(esf, axis=-1), sigma=2, axis=-1)
+        frequencies, mtf = MTFSharpnessEvaluator._stack_mtf_from_lsf(lsf)
+        return frequencies, mtf, lsf
+    
+    @staticmethod
+    def _stack_mtf_from_lsf(lsf):
+        """
+        对堆叠的LSF沿最后一维一次FFT并归一化（与compute_mtf_from_lsf相同）
+        
+        Args:
+            lsf: 形状为 (曲线数, 采样点数) 的LSF
+            
+        Returns:
+            tuple: (frequencies, 形状为 (曲线数, 频点数) 的MTF)
+        """
+        mtf = np.abs(fft(lsf, axis=-1))
+        mtf = mtf / (mtf[:, :1] + 1e-10)
+        half = lsf.shape[1] // 2
+        mtf = mtf[:, :half]
+        frequencies = fftfreq(lsf.shape[1], d=1.0)[:half]
+        return frequencies, mtf
     
+    @staticmethod
+    def _stack_crossing(frequencies, mtf, value):
+        """
+        对堆叠的MTF曲线逐行计算首次低于value处的频率（与compute_mtf_at_value一致）
+        
+        Args:
+            frequencies: 频率数组
+            mtf: 形状为 (通道数, 频点数) 的MTF数组
+            value: 目标MTF值
+            
+        Returns:
+            numpy.ndarray: 各通道对应的频率值
+        """
+        below = mtf < value
+        found = below.any(axis=1)
+        idx = np.where(found, below.argmax(axis=1), len(frequencies) - 1)
+        prev = np.maximum(idx - 1, 0)
+        
+        rows = np.arange(len(mtf))
+        f1, f2 = frequencies[prev], frequencies[idx]
+        m1, m2 = mtf[rows, prev], mtf[rows, idx]
+        
+        dm = m2 - m1
+        steep = np.abs(dm) > 1e-10
+        with np.errstate(divide='ignore', invalid='ignore'):
+            freq = np.where(steep, f1 + (value - m1) * (f2 - f1) / np.where(steep, dm, 1), f1)
+        
+        # 始终高于value取最大频率，第一个点就低于value取最小频率
+        freq = np.where(found, freq, frequencies[-1])
+        return np.where(idx == 0, frequencies[0], freq)
+
+    def compute_mtf_grid(self, cols=16, rows=12, min_contrast=20, percentile=95, max_edge_angle=30):
+        """
+        全视场清晰度分布（中心/边角对比）
+        画面均分为 rows×cols 个窗口，整幅图只求一次梯度，各窗口按窗口内的强边缘像素
+        确定边缘方向，拟合窗口内最强的一条刃边直线（倾斜刃边），各行按直线位置平移对齐
+        后求平均得到ESF；所有窗口的ESF堆叠为二维数组，插值、LSF和FFT沿最后一维一次完成
+
+        Args:
+            cols: 水平方向窗口数
+            rows: 垂直方向窗口数
+            min_contrast: 窗口ESF的最小对比度（灰度），低于该值视为窗口内无刃边
+            percentile: 窗口内强边缘像素的梯度分位数阈值
+            max_edge_angle: 刃边偏离水平/垂直方向的最大角度（度）
+
+        Returns:
+            dict: 'mtf50'/'mtf30'/'mtf10' 为 (rows, cols) 数组（刃边拟合失败的窗口为NaN），
+                  'orientation' 为各窗口边缘方向，'edge_angle' 为拟合刃边的倾角（度），
+                  'field' 为窗口中心的归一化视场高度（0为画面中心，1为对角），
+                  'edge_position' 为刃边在窗口中心处的图像坐标
+
+        Raises:
+            ValueError: 网格过密
+            NoValidEdgeError: 启用预检且图像中没有可用刃边
+        """
+        if self.precheck:
+            check = self.check_edge()
+            if not check['valid']:
+                raise NoValidEdgeError(check['reason'], check)
+
+        h, w = self.gray.shape
+        ch, cw = h // rows, w // cols
+        if ch < 16 or cw < 16:
+            raise ValueError(f"网格过密：窗口尺寸 {cw}x{ch} 小于16像素")
+
+        # 居中取整数个窗口（余下的边缘像素不参与），窗口为 (rows, cols, ch, cw) 视图
+        top, left = (h - rows * ch) // 2, (w - cols * cw) // 2
+
+        def cells(image):
+            crop = image[top:top + rows * ch, left:left + cols * cw]
+            return crop.reshape(rows, ch, cols, cw).swapaxes(1, 2).reshape(rows * cols, ch, cw)
+
+        grad_x, grad_y = self._gradients(self.gray)
+        gx, gy = cells(np.abs(grad_x)), cells(np.abs(grad_y))
+        magnitude = np.sqrt(gx**2 + gy**2)
+
+        # 每个窗口的强边缘像素，按强边缘处的梯度分量判断边缘方向
+        threshold = np.percentile(magnitude.reshape(rows * cols, -1), percentile, axis=1)
+        strong = magnitude > threshold[:, None, None]
+        vertical = (gx * strong).sum(axis=(1, 2)) > (gy * strong).sum(axis=(1, 2))
+
+        # 垂直边缘的ESF沿x方向，水平边缘转置后同样沿最后一维；两组共用窗口宽度
+        width = min(ch, cw)
+        blocks = cells(self.gray)
+        weight = magnitude * strong
+        projected = np.empty((rows * cols, width), dtype=self.dtype)
+        centre = np.full(rows * cols, np.nan)
+        angle = np.full(rows * cols, np.nan)
+        fitted = np.zeros(rows * cols, dtype=bool)
+        # 灰度范围不足min_contrast的窗口不可能有可用刃边，不做直线拟合
+        flat = (blocks.max(axis=(1, 2)).astype(np.int32) - blocks.min(axis=(1, 2))) < min_contrast
+        for k in range(rows * cols):
+            block, wt = (blocks[k], weight[k]) if vertical[k] else (blocks[k].T, weight[k].T)
+            projected[k], line = self._grid_esf(block, None if flat[k] else wt, width, max_edge_angle)
+            if line is not None:
+                fitted[k] = True
+                centre[k] = line['slope'] * (block.shape[0] - 1) / 2 + line['intercept']
+                angle[k] = line['angle']
+
+        x_interpolated, esf = self._stack_interpolate(projected)
+        frequencies, mtf, _ = self._stack_mtf(esf)
+
+        # 可用刃边：窗口内拟合到刃边直线（见_grid_esf），且对齐后的ESF有足够对比度
+        contrast = projected.max(axis=1) - projected.min(axis=1)
+        valid = fitted & (contrast >= min_contrast)
+
+        def grid(values):
+            return np.where(valid, values, np.nan).reshape(rows, cols)
+
+        # 窗口中心的归一化视场高度与刃边在图像中的坐标
+        cy = top + (np.arange(rows) + 0.5) * ch
+        cx = left + (np.arange(cols) + 0.5) * cw
+        field = np.hypot(*np.meshgrid((cy - h / 2) / (h / 2), (cx - w / 2) / (w / 2),
+                                      indexing='ij')) / np.sqrt(2)
+        r, c = np.divmod(np.arange(rows * cols), cols)
+        origin = np.where(vertical, left + c * cw, top + r * ch)
+
+        return {
+            'mtf50': grid(self._stack_crossing(frequencies, mtf, 0.5)),
+            'mtf30': grid(self._stack_crossing(frequencies, mtf, 0.3)),
+            'mtf10': grid(self._stack_crossing(frequencies, mtf, 0.1)),
+            'orientation': np.where(vertical, 'vertical', 'horizontal').reshape(rows, cols),
+            'edge_angle': grid(angle),
+            'edge_position': grid(origin + centre),
+            'contrast': contrast.reshape(rows, cols),
+            'field': field,
+            'cell_size': (ch, cw),
+            'origin': (top, left),
+        }
+
+    def _grid_esf(self, block, weight, width, max_edge_angle=30):
+        """
+        网格模式：拟合窗口内最强的一条刃边直线，各行按直线位置平移对齐后求平均得到ESF
+
+        初始线段由强边缘像素的剪切投影得到：倾角每1°一档，强边缘梯度幅值按该倾角投影到
+        窗口中线上，直方图峰值最高的倾角和位置即最强刃边；再由 _fit_edge_line 在窗口内
+        逐行求亚像素边缘位置并稳健拟合。
+
+        Args:
+            block: 刃边沿行方向延伸的窗口（水平刃边为转置视图），形状 (沿边缘, 横跨边缘)
+            weight: 同形状的强边缘梯度幅值（非强边缘为0），None表示不拟合
+            width: ESF长度（不超过横跨边缘方向的窗口尺寸）
+            max_edge_angle: 刃边偏离坐标轴的最大角度（度）
+
+        Returns:
+            tuple: (长度为width的ESF, _fit_edge_line 的结果（窗口坐标）)；拟合失败（含拟合出错）、阶跃纯度
+                   低于 MIN_EDGE_PURITY，或对齐后的ESF不是陡峭阶跃（4像素内完成的灰度变化
+                   不足1/4，如渐晕等缓慢变化）时直线为None，ESF按窗口中线取全部行
+        """
+        n_u, n_v = block.shape
+        mid = (n_u - 1) / 2
+        line = None
+        us, vs = np.nonzero(weight) if weight is not None else ((), ())
+        if len(us) >= 8:
+            slopes = np.tan(np.radians(np.arange(-max_edge_angle, max_edge_angle + 1)))
+            offsets = np.rint(vs - slopes[:, np.newaxis] * (us - mid)).astype(np.intp)
+            lo = offsets.min()
+            bins = offsets.max() - lo + 2
+            flat = (np.arange(len(slopes))[:, np.newaxis] * bins + offsets - lo).ravel()
+            hist = np.bincount(flat, np.broadcast_to(weight[us, vs], offsets.shape).ravel(),
+                               minlength=len(slopes) * bins).reshape(len(slopes), bins)
+            # 相邻两档合并，容忍取整误差
+            k, j = np.unravel_index(np.argmax(hist[:, :-1] + hist[:, 1:]), (len(slopes), bins - 1))
+            v0, slope = lo + j + 0.5, slopes[k]
+            segment = (v0 - slope * mid, 0.0, v0 + slope * (n_u - 1 - mid), n_u - 1.0)
+            try:
+                line = self._fit_edge_line(segment, 3, block)
+            except (IndexError, ValueError, np.linalg.LinAlgError):
+                # 个别窗口的异常拟合只记为该窗口无刃边，不中断整个网格
+                line = None
+            if line is not None and line['purity'] < MIN_EDGE_PURITY:
+                line = None
+
+        if line is None:
+            rows, slope, intercept = np.arange(n_u), 0.0, n_v / 2
+        else:
+            rows = np.arange(int(line['span'][0]), int(line['span'][1]) + 1)
+            slope, intercept = line['slope'], line['intercept']
+
+        # 各行按直线位置取整平移（与line模式的ROI相同），超出窗口的部分取窗口边界的像素
+        centre = np.rint(slope * rows + intercept).astype(np.intp)
+        index = np.clip(centre[:, np.newaxis] + np.arange(-(width // 2), width - width // 2), 0, n_v - 1)
+        esf = block[rows[:, np.newaxis], index].mean(axis=0, dtype=self.dtype)
+        if line is not None and np.abs(esf[4:] - esf[:-4]).max() < 0.25 * np.ptp(esf):
+            line = None
+        return esf, line
+
     def get_sharpness_level(self, mtf50):
         """
         根据MTF50值判断图像质量等级
@@ -374,89 +2180,366 @@ class MTFSharpnessEvaluator:
             return "模糊"
 
 
-def process_single_image(image_path, verbose=True):
+class ROITracker:
+    """同一工位连续帧的ROI跟踪器：复用上一帧的ROI和边缘方向，校验失败时回退全图搜索"""
+    
+    def __init__(self):
+        self.hint = None
+        self.fast_frames = 0
+        self.full_frames = 0
+        self.fast_time = 0.0
+        self.full_time = 0.0
+    
+    def prepare(self, evaluator):
+        """
+        为即将评估的帧设置上一帧的ROI状态
+        
+        Args:
+            evaluator: 已加载图像的MTFSharpnessEvaluator
+        """
+        evaluator.roi_hint = self.hint
+    
+    def update(self, evaluator, elapsed):
+        """
+        记录本帧结果并更新ROI状态
+        
+        Args:
+            evaluator: 已完成评估的MTFSharpnessEvaluator
+            elapsed: 本帧评估耗时（秒）
+        """
+        if evaluator.roi_fast_path:
+            self.fast_frames += 1
+            self.fast_time += elapsed
+        else:
+            self.full_frames += 1
+            self.full_time += elapsed
+            # 只在全图搜索后刷新参考状态，避免快速路径的误差逐帧累积
+            self.hint = evaluator.roi_state()
+    
+    def summary(self):
+        """
+        统计快速路径命中率及节省的时间
+        
+        Returns:
+            dict: 跟踪统计信息
+        """
+        total = self.fast_frames + self.full_frames
+        fast_avg = self.fast_time / self.fast_frames if self.fast_frames else None
+        full_avg = self.full_time / self.full_frames if self.full_frames else None
+        saved = None
+        if fast_avg is not None and full_avg is not None:
+            saved = full_avg - fast_avg
+        return {
+            'frames': total,
+            'fast_frames': self.fast_frames,
+            'hit_rate': self.fast_frames / total if total else 0.0,
+            'fast_avg': fast_avg,
+            'full_avg': full_avg,
+            'saved_per_frame': saved,
+        }
+
+
+def format_ci(mtf50_ci, digits=4):
+    """
+    MTF50置信区间的显示文本
+    
+    Args:
+        mtf50_ci: (下限, 上限)，None表示未计算
+        digits: 小数位数
+        
+    Returns:
+        str: 如 " [0.0712, 0.0781]"，未计算时为空字符串
+    """
+    if mtf50_ci is None:
+        return ''
+    return f" [{mtf50_ci[0]:.{digits}f}, {mtf50_ci[1]:.{digits}f}]"
+
+
+def process_single_image(image_path, verbose=True, tracker=None, data=None, **evaluator_options):
     """
     处理单张图像
     
     Args:
         image_path: 图像路径
         verbose: 是否打印详细信息
+        tracker: 序列模式的ROITracker（可选）
+        data: 编码后的图像字节（如压缩包成员）。给出时从内存解码，image_path只用于显示文件名
+        **evaluator_options: 传给MTFSharpnessEvaluator的选项（如pyramid_levels）
         
     Returns:
-        tuple: (filename, mtf50_value, sharpness_score, level)
+        tuple: (filename, mtf50_value, sharpness_score, level)；启用bootstrap（bootstrap>0）时
+               追加第5个元素mtf50_ci，即MTF50置信区间 (下限, 上限)，评估失败时为None
     """
+    # 只在启用bootstrap时追加置信区间，默认的4元组与既有调用方兼容
+    extra = (None,) if evaluator_options.get('bootstrap') else ()
+    evaluator = None
+    start = time.perf_counter()
     try:
-        evaluator = MTFSharpnessEvaluator(image_path)
+        if data is not None:
+            evaluator = MTFSharpnessEvaluator.from_bytes(data, **evaluator_options)
+        else:
+            evaluator = MTFSharpnessEvaluator(image_path, **evaluator_options)
         evaluator.load_image()
+        load_time = time.perf_counter() - start
         
         # 使用MTF刃边法计算清晰度
+        compute_start = time.perf_counter()
+        if tracker is not None:
+            tracker.prepare(evaluator)
         results = evaluator.compute_mtf_sharpness()
+        if tracker is not None:
+            tracker.update(evaluator, time.perf_counter() - compute_start)
+            mtf_metrics.record_cache('roi_tracker', evaluator.roi_fast_path)
         mtf50 = results['mtf50']
         sharpness_score = results['sharpness_score']
         level = evaluator.get_sharpness_level(mtf50)
+        mtf50_ci = results.get('mtf50_ci')
+        
+        mtf_metrics.record_evaluation('ok', mtf50, level,
+                                      dict(evaluator.stage_times, load=load_time),
+                                      busy=time.perf_counter() - start)
         
         filename = os.path.basename(image_path)
         
         if verbose:
-            print(f"✓ {filename}: MTF50={mtf50:.4f} | 评分={sharpness_score:.2f} | {level}")
+            print(f"✓ {filename}: MTF50={mtf50:.4f}{format_ci(mtf50_ci)} | 评分={sharpness_score:.2f} | {level}")
+        
+        return (filename, mtf50, sharpness_score, level) + ((mtf50_ci,) if extra else ())
         
-        return filename, mtf50, sharpness_score, level
+    except NoValidEdgeError as e:
+        mtf_metrics.record_evaluation('no_edge', stage_times=evaluator.stage_times,
+                                      busy=time.perf_counter() - start)
+        if verbose:
+            print(f"⊘ {os.path.basename(image_path)}: {e}")
+        return (os.path.basename(image_path), None, None, NO_VALID_EDGE) + extra
         
     except Exception as e:
+        mtf_metrics.record_evaluation('failed', busy=time.perf_counter() - start)
         if verbose:
             print(f"✗ {os.path.basename(image_path)}: 处理失败 - {e}")
-        return os.path.basename(image_path), None, None, "错误"
+        return (os.path.basename(image_path), None, None, "错误") + extra
+
 
+# 支持的图像格式
+IMAGE_EXTENSIONS = ['*.png', '*.jpg', '*.jpeg', '*.bmp', '*.tiff', '*.tif']
 
-def process_folder(folder_path, output_file=None):
+
+def find_image_files(folder_path):
     """
-    批量处理文件夹中的所有图像
+    获取文件夹中所有支持格式的图像文件
     
     Args:
         folder_path: 文件夹路径
-        output_file: 输出结果文件路径（可选）
+        
+    Returns:
+        list: 图像文件路径列表
     """
-    # 支持的图像格式
-    image_extensions = ['*.png', '*.jpg', '*.jpeg', '*.bmp', '*.tiff', '*.tif']
-    
-    # 获取所有图像文件
     image_files = []
-    for ext in image_extensions:
+    for ext in IMAGE_EXTENSIONS:
         image_files.extend(glob.glob(os.path.join(folder_path, ext)))
         image_files.extend(glob.glob(os.path.join(folder_path, ext.upper())))
+    return image_files
+
+
+def parse_size(text):
+    """
+    解析带单位的内存大小（如 512M、2G、1048576）
+    
+    Args:
+        text: 大小字符串，单位可为 K/M/G/T（1024进制），可带B后缀
+        
+    Returns:
+        int: 字节数
+    """
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*', str(text), re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"无法解析内存大小: {text}")
+    number, unit = match.groups()
+    power = ' KMGT'.index(unit.upper() or ' ')
+    return int(float(number) * 1024 ** power)
+
+
+def natural_sort_key(path):
+    """
+    自然排序键：按文件名中的数字大小排序（NG_2 排在 NG_10 之前）
+    
+    Args:
+        path: 文件路径
+        
+    Returns:
+        list: 可比较的排序键
+    """
+    name = os.path.basename(path)
+    return [int(part) if part.isdigit() else part.lower()
+            for part in re.split(r'(\d+)', name)]
+
+
+def process_folder(folder_path, output_file=None, track=False, spc=None, db=None, station=None,
+                   max_memory=None, workers=None, supervisor=None, **evaluator_options):
+    """
+    批量处理文件夹（或ZIP/TAR压缩包）中的所有图像
+    
+    Args:
+        folder_path: 文件夹路径，或压缩包路径（成员直接从包内解码，不解压到磁盘；
+                     文件名取成员的文件名，排名与解压后评估一致）
+        output_file: 输出结果文件路径（可选）
+        track: 序列模式，按文件名顺序复用上一帧的ROI（同一工位连续拍摄）
+        spc: 流式SPC监视器（mtf_spc.SPCMonitor，可选）。按文件名顺序逐帧更新各工位的
+             控制图，趋势越过控制限时立即打印报警
+        db: 结果数据库（mtf_results_db.ResultsDB，可选）。本次运行登记为一个run_id，
+            每张图像（含失败和无有效边缘）的结果按批写入
+        station: 写入数据库的工位/相机名称
+        max_memory: 并发评估的内存预算（字节，可选）。先读文件头估算每张图像的峰值内存，
+                    按预算动态决定并发数，大图优先（见mtf_scheduler）；不能与track同时使用
+        workers: 并发评估的线程数（默认为CPU核数；未设置max_memory时大于1才并发）
+        supervisor: 受监管的工作进程池（mtf_batch.BatchSupervisor，可选）。每张图像在
+                    工作进程中评估，单张超时、内存超限或进程崩溃时换新进程并有限次重试，
+                    失败记入supervisor.failures；不能与track、max_memory、workers同时使用
+        **evaluator_options: 传给MTFSharpnessEvaluator的选项（如pyramid_levels）
+    """
+    from mtf_archive import open_archive
+    from mtf_scheduler import MemoryScheduler, read_image_header
+    
+    # 获取所有图像文件；压缩包则列出其中的图像成员，不解压到磁盘
+    archive = open_archive(folder_path)
+    if archive is None:
+        image_files = find_image_files(folder_path)
+        evaluate = process_single_image
+    else:
+        # 压缩tar只能顺序解压，成员在评估时按包内顺序流式读出（image_files为None）
+        image_files = archive.members()
+        evaluate = archive.evaluate
+    
+    tracker = None
+    if image_files and (track or spc is not None):
+        # 序列模式和SPC都按拍摄顺序（文件名自然排序）处理
+        image_files.sort(key=natural_sort_key)
+    if track:
+        tracker = ROITracker()
     
-    if not image_files:
-        print(f"\n错误: 文件夹 '{folder_path}' 中没有找到图像文件")
-        print(f"支持的格式: {', '.join(image_extensions)}")
+    if image_files is not None and not image_files:
+        print(f"\n错误: {'压缩包' if archive else '文件夹'} '{folder_path}' 中没有找到图像文件")
+        print(f"支持的格式: {', '.join(IMAGE_EXTENSIONS)}")
         return
     
     print("\n" + "="*90)
     print(f"MTF图像清晰度批量评估（刃边法 - ISO 12233标准）")
     print("="*90)
-    print(f"文件夹: {folder_path}")
-    print(f"找到图像: {len(image_files)} 张")
+    print(f"{'压缩包' if archive else '文件夹'}: {folder_path}")
+    if image_files is None:
+        print("找到图像: 按包内顺序流式读取")
+    else:
+        print(f"找到图像: {len(image_files)} 张")
     print("-"*90)
     
+    def evaluate_in_order():
+        mtf_metrics.WORKERS.set(1)
+        if image_files is None:
+            for name, data in archive.stream():
+                yield name, evaluate(name, verbose=True, tracker=tracker, data=data,
+                                     **evaluator_options)
+            return
+        for i, img_path in enumerate(image_files):
+            mtf_metrics.QUEUE_DEPTH.set(len(image_files) - i)
+            yield img_path, evaluate(img_path, verbose=True, tracker=tracker, **evaluator_options)
+    
+    scheduler = None
+    if supervisor is not None:
+        if track or max_memory is not None or workers is not None:
+            raise ValueError("受监管的进程池不能与序列模式（ROI跟踪）、--max-memory 或 --workers 同时使用")
+        limits = [f"工作进程: {supervisor.processes}"]
+        if supervisor.timeout is not None:
+            limits.append(f"单张时限: {supervisor.timeout:g} s")
+        if supervisor.memory_limit is not None:
+            limits.append(f"单进程内存上限: {supervisor.memory_limit / 2**20:.0f} MiB")
+        print(" | ".join(limits))
+        print("-"*90)
+        if image_files is None:
+            items = archive.stream()
+        else:
+            items = ((name, None) for name in image_files)
+        outcomes = supervisor.run(items, archive, **evaluator_options)
+    elif max_memory is not None or (workers or 1) > 1:
+        if track:
+            raise ValueError("序列模式（ROI跟踪）需要按顺序逐帧处理，不能与并发评估同时使用")
+        scheduler = MemoryScheduler(max_memory, workers)
+        if image_files is None:
+            jobs = scheduler.plan_stream(archive.stream(), **evaluator_options)
+        else:
+            jobs = scheduler.plan(image_files,
+                                  header_reader=archive.header if archive else read_image_header,
+                                  mappable=archive is None, **evaluator_options)
+        if max_memory is not None:
+            print(f"内存预算: {max_memory / 2**20:.0f} MiB | 最大并发: {scheduler.max_workers}", end='')
+            if image_files is not None:
+                print(f" | 单张估算峰值: {jobs[-1][1] / 2**20:.0f}~{jobs[0][1] / 2**20:.0f} MiB", end='')
+            print()
+        else:
+            print(f"并发评估: {scheduler.max_workers} 个线程")
+        print("-"*90)
+        outcomes = scheduler.run(functools.partial(evaluate, verbose=True), jobs)
+    else:
+        outcomes = evaluate_in_order()
+    if spc is not None and (scheduler is not None or supervisor is not None):
+        # SPC按拍摄顺序更新控制图：并发评估完成后再按文件名自然排序
+        outcomes = sorted(outcomes, key=lambda outcome: natural_sort_key(outcome[0]))
+    
     # 处理所有图像
     results = []
-    for img_path in image_files:
-        filename, mtf50, score, level = process_single_image(img_path, verbose=True)
+    rejected = 0
+    total = 0
+    run_id = db.start_run(os.path.abspath(folder_path), station, evaluator_options) if db is not None else None
+    for name, (filename, mtf50, score, level, *ci) in outcomes:
+        mtf50_ci = ci[0] if ci else None
+        total += 1
+        img_path = name if archive is None else archive.display_path(name)
+        if level == NO_VALID_EDGE:
+            rejected += 1
+        if db is not None:
+            db.add(run_id, img_path, mtf50, score, level, station,
+                   timestamp=archive.mtime(name) if archive is not None else None)
+        if mtf50 is not None and spc is not None:
+            for alarm in spc.update(img_path, mtf50):
+                print(format_alarm(alarm))
         if mtf50 is not None:
             results.append({
                 'filename': filename,
                 'path': img_path,
                 'mtf50': mtf50,
                 'score': score,
-                'level': level
+                'level': level,
+                'mtf50_ci': mtf50_ci
             })
+    mtf_metrics.QUEUE_DEPTH.set(0)
+    if archive is not None:
+        archive.close()
+    if db is not None:
+        db.flush()
+        print(f"\n✓ 结果已写入数据库: {db.path}（运行号 {run_id}）")
+    if scheduler is not None:
+        print(f"\n并发调度: 峰值并发 {scheduler.peak_workers}", end='')
+        if max_memory is not None:
+            print(f" | 峰值预留 {scheduler.peak_reserved / 2**20:.0f} MiB", end='')
+        print()
+        if scheduler.tiled:
+            print(f"  单张超出预算、改为分块处理: {scheduler.tiled} 张")
+        if scheduler.oversized:
+            print(f"  分块后仍超出预算、单独运行: {scheduler.oversized} 张")
+    if supervisor is not None:
+        from mtf_batch import format_summary as format_batch_summary
+        print("\n" + format_batch_summary(supervisor))
     
     if not results:
         print("\n没有成功处理任何图像")
+        if rejected:
+            print(f"预检未通过（{NO_VALID_EDGE}）: {rejected} 张")
         return
     
     # 按MTF50排序（值越大越清晰）
     results.sort(key=lambda x: x['mtf50'], reverse=True)
     
+    with_ci = results[0]['mtf50_ci'] is not None
+    
     # 统计信息
     print("\n" + "="*90)
     print("统计信息")
@@ -469,11 +2552,34 @@ def process_folder(folder_path, output_file=None):
     min_mtf50 = np.min(mtf50_values)
     avg_score = np.mean(score_values)
     
-    print(f"成功处理: {len(results)}/{len(image_files)} 张")
+    print(f"成功处理: {len(results)}/{total} 张")
+    if rejected:
+        print(f"预检未通过（{NO_VALID_EDGE}，不参与排名）: {rejected} 张")
     print(f"平均MTF50: {avg_mtf50:.4f} cycles/pixel")
     print(f"最高MTF50: {max_mtf50:.4f} cycles/pixel")
     print(f"最低MTF50: {min_mtf50:.4f} cycles/pixel")
     print(f"平均评分: {avg_score:.2f}/100")
+    if with_ci:
+        # 排名相邻的两张图像置信区间重叠时，二者的MTF50差异不能认为是真实的
+        widths = [r['mtf50_ci'][1] - r['mtf50_ci'][0] for r in results]
+        overlaps = sum(lower['mtf50_ci'][1] >= upper['mtf50_ci'][0]
+                       for upper, lower in zip(results, results[1:]))
+        print(f"MTF50置信区间平均宽度: {np.mean(widths):.4f} cycles/pixel"
+              f"（bootstrap，排名相邻且区间重叠 {overlaps}/{len(results) - 1} 对）")
+    
+    if tracker is not None:
+        stats = tracker.summary()
+        print(f"\nROI跟踪: 快速路径 {stats['fast_frames']}/{stats['frames']} 帧 "
+              f"({stats['hit_rate'] * 100:.1f}%)")
+        if stats['saved_per_frame'] is not None:
+            print(f"  全图搜索平均耗时: {stats['full_avg'] * 1000:.1f} ms/帧")
+            print(f"  快速路径平均耗时: {stats['fast_avg'] * 1000:.1f} ms/帧")
+            print(f"  每帧节省: {stats['saved_per_frame'] * 1000:.1f} ms "
+                  f"(共节省 {stats['saved_per_frame'] * stats['fast_frames']:.2f} s)")
+    
+    if spc is not None:
+        print("\n流式SPC（按工位/相机）:")
+        print(format_spc_summary(spc))
     
     # 清晰度等级分布
     level_count = {}
@@ -490,11 +2596,13 @@ def process_folder(folder_path, output_file=None):
     print("\n" + "="*90)
     print("清晰度排名 (Top 10)")
     print("="*90)
-    print(f"{'排名':<6} {'文件名':<35} {'MTF50':<15} {'评分':<10} {'等级':<10}")
+    ci_header = f" {'置信区间':<20}" if with_ci else ''
+    print(f"{'排名':<6} {'文件名':<35} {'MTF50':<15}{ci_header} {'评分':<10} {'等级':<10}")
     print("-"*90)
     
     for i, result in enumerate(results[:10], 1):
-        print(f"{i:<6} {result['filename']:<35} {result['mtf50']:<15.4f} {result['score']:<10.2f} {result['level']:<10}")
+        ci = f" {format_ci(result['mtf50_ci']).strip():<20}" if with_ci else ''
+        print(f"{i:<6} {result['filename']:<35} {result['mtf50']:<15.4f}{ci} {result['score']:<10.2f} {result['level']:<10}")
     
     if len(results) > 10:
         print(f"\n... 还有 {len(results) - 10} 张图像")
@@ -509,23 +2617,56 @@ def process_folder(folder_path, output_file=None):
     return results
 
 
+# 结构化结果文件的字段（CSV表头 / JSONL键），供 compare 等工具逐行读取
+RESULT_FIELDS = ('rank', 'filename', 'mtf50', 'score', 'level')
+
+# 启用bootstrap时追加的置信区间字段
+CI_FIELDS = ('mtf50_ci_low', 'mtf50_ci_high')
+
+
 def save_results_to_file(results, output_file):
     """
-    保存结果到文本文件
+    保存结果到文件（按扩展名选择格式：.csv / .jsonl 为结构化格式，其余为文本表格）
     
     Args:
         results: 结果列表
         output_file: 输出文件路径
     """
+    ext = os.path.splitext(output_file)[1].lower()
+    with_ci = bool(results) and all(result.get('mtf50_ci') is not None for result in results)
+    fields = RESULT_FIELDS + CI_FIELDS if with_ci else RESULT_FIELDS
+    
+    def row_values(i, result):
+        values = [i] + [result[k] for k in RESULT_FIELDS[1:]]
+        if with_ci:
+            values += list(result['mtf50_ci'])
+        return values
+    
+    if ext == '.csv':
+        with open(output_file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            for i, result in enumerate(results, 1):
+                writer.writerow(row_values(i, result))
+        return
+    if ext == '.jsonl':
+        with open(output_file, 'w', encoding='utf-8') as f:
+            for i, result in enumerate(results, 1):
+                row = dict(zip(fields, row_values(i, result)))
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        return
+    
     with open(output_file, 'w', encoding='utf-8') as f:
         f.write("MTF图像清晰度评估结果（刃边法 - ISO 12233标准）\n")
         f.write("="*100 + "\n\n")
         
-        f.write(f"{'排名':<6} {'文件名':<50} {'MTF50':<20} {'评分':<12} {'等级':<10}\n")
+        ci_header = f" {'置信区间':<24}" if with_ci else ''
+        f.write(f"{'排名':<6} {'文件名':<50} {'MTF50':<20}{ci_header} {'评分':<12} {'等级':<10}\n")
         f.write("-"*100 + "\n")
         
         for i, result in enumerate(results, 1):
-            f.write(f"{i:<6} {result['filename']:<50} {result['mtf50']:<20.6f} {result['score']:<12.2f} {result['level']:<10}\n")
+            ci = f" {format_ci(result['mtf50_ci'], 6).strip():<24}" if with_ci else ''
+            f.write(f"{i:<6} {result['filename']:<50} {result['mtf50']:<20.6f}{ci} {result['score']:<12.2f} {result['level']:<10}\n")
         
         f.write("\n" + "="*100 + "\n")
         f.write("\n关于MTF50:\n")
@@ -540,8 +2681,180 @@ def save_results_to_file(results, output_file):
         f.write("  < 0.1 cycles/pixel: 模糊\n")
 
 
+def print_channel_results(image_path, results):
+    """
+    打印分通道MTF结果
+    
+    Args:
+        image_path: 图像路径
+        results: compute_channel_mtf 的返回结果
+    """
+    print("\n" + "="*70)
+    print("分通道MTF评估结果（横向色差分析）")
+    print("="*70)
+    print(f"文件名: {os.path.basename(image_path)}")
+    print(f"边缘方向: {'垂直' if results['orientation'] == 'vertical' else '水平'}")
+    print("-"*70)
+    print(f"{'通道':<6} {'MTF50':<12} {'MTF30':<12} {'MTF10':<12} {'边缘位置(px)':<12}")
+    print("-"*70)
+    for name, values in results['channels'].items():
+        print(f"{name:<6} {values['mtf50']:<12.6f} {values['mtf30']:<12.6f} "
+              f"{values['mtf10']:<12.6f} {values['edge_position']:<12.3f}")
+    print("-"*70)
+    shifts = "  ".join(f"{pair}: {shift:+.3f}" for pair, shift in results['edge_shift'].items())
+    print(f"通道间边缘偏移(px): {shifts}")
+    print("="*70 + "\n")
+
+
+def parse_grid(text):
+    """
+    解析网格尺寸字符串，如 "16x12"（列x行）
+
+    Args:
+        text: 网格尺寸字符串
+
+    Returns:
+        tuple: (cols, rows)
+    """
+    parts = text.lower().split('x')
+    if len(parts) != 2 or not all(p.isdigit() and int(p) > 0 for p in parts):
+        raise argparse.ArgumentTypeError(f"无法解析网格尺寸: {text}（示例: 16x12）")
+    return int(parts[0]), int(parts[1])
+
+
+# 视场分区（归一化视场高度）：中心 / 中间 / 边角
+FIELD_ZONES = (('中心', 0.0, 0.3), ('中间', 0.3, 0.7), ('边角', 0.7, 1.01))
+
+
+def print_grid_results(image_path, grid):
+    """
+    打印全视场MTF50分布
+
+    Args:
+        image_path: 图像路径
+        grid: compute_mtf_grid 的返回结果
+    """
+    mtf50 = grid['mtf50']
+    rows, cols = mtf50.shape
+    valid = np.isfinite(mtf50)
+
+    print("\n" + "="*90)
+    print("全视场MTF50分布（网格模式）")
+    print("="*90)
+    print(f"文件名: {os.path.basename(image_path)}")
+    print(f"网格: {cols}x{rows} | 窗口尺寸: {grid['cell_size'][1]}x{grid['cell_size'][0]} 像素 | "
+          f"有效窗口: {int(valid.sum())}/{rows * cols}")
+    print("-"*90)
+    for row in mtf50:
+        print(" ".join(f"{v:6.3f}" if np.isfinite(v) else f"{'-':>6}" for v in row))
+    print("-"*90)
+
+    if valid.any():
+        for name, lo, hi in FIELD_ZONES:
+            zone = valid & (grid['field'] >= lo) & (grid['field'] < hi)
+            if zone.any():
+                print(f"{name}（视场 {lo:.1f}~{min(hi, 1.0):.1f}）: 平均MTF50 {np.mean(mtf50[zone]):.4f} "
+                      f"（{int(zone.sum())} 个窗口）")
+        best = np.unravel_index(np.nanargmax(mtf50), mtf50.shape)
+        worst = np.unravel_index(np.nanargmin(mtf50), mtf50.shape)
+        print(f"最高: {mtf50[best]:.4f}（行{best[0] + 1} 列{best[1] + 1}） | "
+              f"最低: {mtf50[worst]:.4f}（行{worst[0] + 1} 列{worst[1] + 1}） | "
+              f"均匀性(最低/最高): {mtf50[worst] / mtf50[best]:.2f}")
+    print("="*90 + "\n")
+
+
+def save_grid_results(grid, output_file):
+    """
+    保存逐窗口结果表（.csv 为CSV，其余为文本表格）
+
+    Args:
+        grid: compute_mtf_grid 的返回结果
+        output_file: 输出文件路径
+    """
+    fields = ('row', 'col', 'mtf50', 'mtf30', 'mtf10', 'orientation', 'edge_position', 'edge_angle',
+              'contrast', 'field')
+    rows, cols = grid['mtf50'].shape
+    records = []
+    for i in range(rows):
+        for j in range(cols):
+            records.append([i + 1, j + 1] + [grid[k][i, j] for k in fields[2:]])
+
+    if os.path.splitext(output_file)[1].lower() == '.csv':
+        with open(output_file, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(fields)
+            writer.writerows([v if not (isinstance(v, float) and np.isnan(v)) else '' for v in r]
+                             for r in records)
+        return
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        f.write("全视场MTF50分布（网格模式）\n")
+        f.write("="*100 + "\n\n")
+        f.write(f"{'行':<5} {'列':<5} {'MTF50':<12} {'MTF30':<12} {'MTF10':<12} {'方向':<12} "
+                f"{'边缘位置':<10} {'倾角':<8} {'对比度':<10} {'视场':<8}\n")
+        f.write("-"*100 + "\n")
+        for i, j, m50, m30, m10, orientation, position, angle, contrast, field in records:
+            if np.isnan(m50):
+                f.write(f"{i:<5} {j:<5} {'-':<12} {'-':<12} {'-':<12} {'-':<12} {'-':<10} {'-':<8} "
+                        f"{contrast:<10.1f} {field:<8.2f}\n")
+            else:
+                f.write(f"{i:<5} {j:<5} {m50:<12.6f} {m30:<12.6f} {m10:<12.6f} {orientation:<12} "
+                        f"{position:<10.1f} {angle:<+8.2f} {contrast:<10.1f} {field:<8.2f}\n")
+
+
+def save_heatmap(grid, output_file, cell_pixels=80):
+    """
+    保存MTF50热力图（伪彩色，红色为清晰、蓝色为模糊，无刃边的窗口为灰色）
+
+    Args:
+        grid: compute_mtf_grid 的返回结果
+        output_file: 输出图像路径
+        cell_pixels: 每个窗口在热力图中的宽度（像素）
+    """
+    mtf50 = grid['mtf50']
+    rows, cols = mtf50.shape
+    valid = np.isfinite(mtf50)
+    ch, cw = grid['cell_size']
+    cell_w = cell_pixels
+    cell_h = max(1, int(round(cell_pixels * ch / cw)))
+
+    # 按有效窗口的最小/最大值归一化到0~255
+    lo, hi = (np.min(mtf50[valid]), np.max(mtf50[valid])) if valid.any() else (0.0, 1.0)
+    scaled = np.zeros(mtf50.shape, dtype=np.uint8)
+    if hi > lo:
+        scaled[valid] = np.round((mtf50[valid] - lo) / (hi - lo) * 255).astype(np.uint8)
+    colored = cv2.applyColorMap(scaled, cv2.COLORMAP_JET)
+    colored[~valid] = 128
+    heatmap = np.repeat(np.repeat(colored, cell_h, axis=0), cell_w, axis=1)
+
+    # 标注各窗口的MTF50（色带两端的深蓝/深红上用白字）
+    scale = cell_w / 160
+    for i in range(rows):
+        for j in range(cols):
+            if valid[i, j]:
+                color = (255, 255, 255) if scaled[i, j] < 64 or scaled[i, j] > 224 else (0, 0, 0)
+                cv2.putText(heatmap, f"{mtf50[i, j]:.3f}", (j * cell_w + 4, i * cell_h + cell_h // 2 + 4),
+                            cv2.FONT_HERSHEY_SIMPLEX, scale, color, 1, cv2.LINE_AA)
+
+    if not cv2.imwrite(output_file, heatmap):
+        raise ValueError(f"无法保存热力图: {output_file}")
+
+
+# 子命令及其实现模块（各模块提供 main(argv)）
+SUBCOMMANDS = {
+    'compare': 'mtf_compare',
+    'query': 'mtf_results_db',
+    'sweep': 'mtf_sweep',
+}
+
+
 def main():
     """主函数"""
+    # 子命令：两轮结果对比、结果数据库查询、参数扫描
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        module = importlib.import_module(SUBCOMMANDS[sys.argv[1]])
+        return module.main(sys.argv[2:])
+    
     parser = argparse.ArgumentParser(
         description='MTF图像清晰度评估工具 - 刃边法（ISO 12233标准）',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -563,23 +2876,159 @@ def main():
   
   # 批量评估并保存结果到文件
   python mtf_sharpness.py /path/to/folder --output results.txt
+  
+  # 倾斜刃边：霍夫变换找刃边并亚像素拟合直线，沿直线取窄ROI
+  python mtf_sharpness.py image.png --roi-mode line
+  
+  # MTF50的95%置信区间（1000次bootstrap重抽样），判断两张图像的差异是否真实
+  python mtf_sharpness.py /path/to/folder --bootstrap 1000 -o results.csv
+  
+  # 直接评估压缩包中的图像（不解压），4个线程并发
+  python mtf_sharpness.py inspection_set.zip --workers 4
+  
+  # 混合分辨率的文件夹：在8G内存预算内自适应并发
+  python mtf_sharpness.py /path/to/folder --max-memory 8G
+  
+  # 长时间无人值守批量：单张限时60秒、每进程2G内存，失败清单另存
+  python mtf_sharpness.py /path/to/folder --processes 4 --timeout 60 --worker-memory 2G --failures failed.csv
+  
+  # 全视场清晰度分布：16x12网格，保存热力图和逐窗口结果
+  python mtf_sharpness.py image.png --grid 16x12 --heatmap heatmap.png -o cells.csv
+  
+  # 对焦扫描序列中搜索最佳焦点帧（只评估少量帧）
+  python mtf_sharpness.py /path/to/sweep --best-focus
+  
+  # 对比两轮结果（--output 为 .csv/.jsonl 时保存结构化结果）
+  python mtf_sharpness.py compare before.csv after.csv --threshold 0.01
+  
+  # 批量结果写入历史数据库，并查询最近7天3号工位最差的50张
+  python mtf_sharpness.py /path/to/folder --db results.db --station 3
+  python mtf_sharpness.py query results.db --station 3 --since 7d --bottom 50
+  
+  # 参数扫描：sigma × 边距 × 插值倍数，解码和梯度每张图只算一次
+  python mtf_sharpness.py sweep /path/to/folder --sigma 1,2,3 --margin 30,50,80 --oversample 4,8 -o sweep.csv
         """
     )
     
-    parser.add_argument('path', help='图像文件路径或文件夹路径')
-    parser.add_argument('--output', '-o', help='输出结果文件路径（仅用于文件夹批量处理）')
+    parser.add_argument('path', help='图像文件路径、文件夹路径或ZIP/TAR压缩包路径')
+    parser.add_argument('--output', '-o', help='输出结果文件路径（仅用于文件夹批量处理；.csv/.jsonl为结构化格式，可用于compare）')
+    parser.add_argument('--pyramid', type=int, default=0, metavar='LEVELS',
+                        help='边缘定位的金字塔层数，2~4对应1/4~1/16降采样，适合2000万像素以上的大画幅（默认: 0，全分辨率）')
+    parser.add_argument('--memory-budget', type=parse_size, metavar='SIZE',
+                        help='单张图像的工作内存预算（如 256M）。超出时分块流式处理，'
+                             '8位灰度BMP直接内存映射，适合超大线扫描图像')
+    parser.add_argument('--max-memory', type=parse_size, metavar='SIZE',
+                        help='批量并发评估的内存预算（如 8G）：按文件头估算每张图像的峰值内存动态调整并发数，'
+                             '大图优先；单张超出预算的图像分块处理并单独运行')
+    parser.add_argument('--workers', type=int,
+                        help='批量并发评估的线程数；配合 --max-memory 时为最大并发数（默认: CPU核数）')
+    parser.add_argument('--processes', type=int,
+                        help='受监管的工作进程数：每张图像在工作进程中评估，坏文件导致的卡死或崩溃只影响该进程，'
+                             '自动换新进程（给出 --timeout/--worker-memory 时默认为CPU核数）')
+    parser.add_argument('--timeout', type=float, metavar='SECONDS',
+                        help='单张图像的时限（秒），超时的工作进程被结束并重启')
+    parser.add_argument('--worker-memory', type=parse_size, metavar='SIZE',
+                        help='每个工作进程的内存上限（如 2G，RLIMIT_AS，不含库的基线），超限的图像判为失败（Linux）')
+    parser.add_argument('--retries', type=int, default=1,
+                        help='超时、内存超限或进程崩溃后的重试次数（默认: 1）')
+    parser.add_argument('--recycle', type=int, default=500, metavar='N',
+                        help='每个工作进程评估N张图像后换新进程（默认: 500）')
+    parser.add_argument('--failures', metavar='PATH',
+                        help='保存失败报告（.csv/.jsonl/.txt：文件、失败类型、尝试次数、原因）')
+    parser.add_argument('--precision', choices=sorted(PRECISIONS), default='float64',
+                        help='数值精度：float32内存带宽减半，MTF50在四位小数内一致（默认: float64）')
+    parser.add_argument('--backend', choices=BACKENDS, default='numpy',
+                        help='ESF/LSF/MTF50计算内核：numba为JIT编译版本（需安装numba，首次运行编译后缓存），'
+                             'auto表示已安装numba时使用（默认: numpy）')
+    parser.add_argument('--threads', type=int, default=1,
+                        help='单张图像内部的线程数：梯度、ROI统计和ESF投影按行条带并行，'
+                             '降低超大单帧的延迟（默认: 1）')
+    parser.add_argument('--roi-mode', choices=ROI_MODES, default='bbox',
+                        help='ROI定位方式：bbox为全部强梯度像素的边界框加边距；line在降采样图像上用霍夫变换找刃边，'
+                             '全分辨率亚像素拟合直线后沿直线取窄窗口，倾斜刃边逐行对齐（默认: bbox）')
+    parser.add_argument('--bootstrap', type=int, default=0, metavar='N',
+                        help='MTF50置信区间：对ROI内沿边缘方向的行/列重抽样N次（如 1000），批量矩阵运算，'
+                             '结果和 -o 结构化输出中给出区间（默认: 0，不计算）')
+    parser.add_argument('--confidence', type=float, default=0.95,
+                        help='置信区间的置信水平（默认: 0.95）')
+    parser.add_argument('--precheck', action='store_true',
+                        help='快速预检：空白、饱和、误触发或无可用刃边的帧直接标记为“无有效边缘”，不参与排名')
+    parser.add_argument('--channels', action='store_true',
+                        help='分通道模式（单张彩色图像）：ROI只定位一次，同时给出R/G/B/亮度的MTF50/30/10和通道间边缘偏移（横向色差）')
+    parser.add_argument('--grid', type=parse_grid, metavar='COLSxROWS',
+                        help='网格模式（单张图像）：画面分成 列x行 个窗口（如 16x12）逐窗口计算MTF50，'
+                             '给出中心/边角清晰度分布；--output 保存逐窗口结果表')
+    parser.add_argument('--heatmap', metavar='PNG',
+                        help='网格模式下保存MTF50热力图（默认网格 16x12）')
+    parser.add_argument('--track', action='store_true',
+                        help='序列模式：同一工位的连续帧按文件名顺序复用上一帧的ROI，局部校验失败时才全图搜索')
+    parser.add_argument('--spc', action='store_true',
+                        help='流式SPC：按文件名顺序逐帧更新各工位/相机的EWMA、CUSUM和单点控制图，MTF50漂移时立即报警')
+    parser.add_argument('--spc-window', type=int, default=50,
+                        help='SPC滑动窗口长度（默认: 50）')
+    parser.add_argument('--spc-warmup', type=int, default=30,
+                        help='SPC估计基线的预热帧数（默认: 30）')
+    parser.add_argument('--spc-target', type=float,
+                        help='已知的目标MTF50（默认由预热帧估计）')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='在本机该端口提供OpenMetrics/Prometheus指标端点 /metrics（处理量、阶段耗时、MTF50分布等）')
+    parser.add_argument('--db', metavar='PATH',
+                        help='将文件夹批量结果追加写入SQLite历史数据库（按文件名、运行号、时间、MTF50、等级建索引），'
+                             '用 query 子命令查询')
+    parser.add_argument('--station', metavar='NAME',
+                        help='写入数据库的工位/相机名称（配合 --db）')
+    parser.add_argument('--best-focus', action='store_true',
+                        help='最佳焦点搜索模式：按文件名顺序视为对焦扫描序列，粗采样后黄金分割细化')
+    parser.add_argument('--focus-samples', type=int, default=9,
+                        help='最佳焦点搜索的粗采样帧数（默认: 9）')
+    parser.add_argument('--focus-tol', type=int, default=1,
+                        help='最佳焦点搜索的峰值夹逼容差，单位为帧（默认: 1）')
     
     args = parser.parse_args()
     
+    evaluator_options = {
+        'pyramid_levels': args.pyramid,
+        'memory_budget': args.memory_budget,
+        'precheck': args.precheck,
+        'precision': args.precision,
+        'backend': args.backend,
+        'threads': args.threads,
+        'roi_mode': args.roi_mode,
+        'bootstrap': args.bootstrap,
+        'confidence': args.confidence,
+    }
+    
+    if args.metrics_port is not None:
+        server = mtf_metrics.start_metrics_server(args.metrics_port)
+        print(f"指标端点: http://127.0.0.1:{server.server_address[1]}/metrics")
+    
     try:
         path = args.path
+        from mtf_archive import is_archive
         
         # 判断是文件还是文件夹
-        if os.path.isfile(path):
+        if os.path.isfile(path) and not is_archive(path):
             # 处理单张图像
             print("\n处理单张图像...")
-            evaluator = MTFSharpnessEvaluator(path)
+            evaluator = MTFSharpnessEvaluator(path, **evaluator_options)
             evaluator.load_image()
+            
+            if args.channels:
+                print_channel_results(path, evaluator.compute_channel_mtf())
+                return 0
+            
+            if args.grid or args.heatmap:
+                cols, rows = args.grid or (16, 12)
+                grid = evaluator.compute_mtf_grid(cols, rows)
+                print_grid_results(path, grid)
+                if args.heatmap:
+                    save_heatmap(grid, args.heatmap)
+                    print(f"✓ 热力图已保存到: {args.heatmap}")
+                if args.output:
+                    save_grid_results(grid, args.output)
+                    print(f"✓ 逐窗口结果已保存到: {args.output}")
+                return 0
+            
             results = evaluator.compute_mtf_sharpness()
             
             filename = os.path.basename(path)
@@ -594,8 +3043,18 @@ def main():
             print("="*70)
             print(f"文件名: {filename}")
             print(f"图像尺寸: {evaluator.gray.shape}")
+            line = evaluator.edge_line
+            if line is not None:
+                orientation = '垂直' if line['orientation'] == 'vertical' else '水平'
+                print(f"刃边直线: {orientation} | 倾角 {line['angle']:+.3f}° | "
+                      f"({line['start'][0]:.1f}, {line['start'][1]:.1f}) → ({line['end'][0]:.1f}, {line['end'][1]:.1f}) | "
+                      f"拟合残差 {line['residual']:.3f} px | 阶跃纯度 {line['purity']:.2f}")
+                print(f"ROI: {evaluator.roi_bbox}，对齐后 {evaluator.roi_index[0].shape}")
             print("-"*70)
             print(f"MTF50: {mtf50:.6f} cycles/pixel  [主要指标]")
+            if 'mtf50_ci' in results:
+                print(f"MTF50 {results['confidence'] * 100:g}%置信区间:{format_ci(results['mtf50_ci'], 6)} "
+                      f"(bootstrap {results['bootstrap_samples']} 次，标准差 {results['mtf50_std']:.6f})")
             print(f"MTF30: {mtf30:.6f} cycles/pixel")
             print(f"MTF10: {mtf10:.6f} cycles/pixel")
             print(f"清晰度评分: {score:.2f}/100")
@@ -613,13 +3072,45 @@ def main():
             print("  < 0.1: 模糊")
             print("="*70 + "\n")
             
-        elif os.path.isdir(path):
-            # 处理文件夹
-            process_folder(path, args.output)
+        elif os.path.isdir(path) and args.best_focus:
+            # 对焦扫描最佳焦点搜索
+            from mtf_focus import process_focus_sweep
+            process_focus_sweep(path, args.output, args.focus_samples, args.focus_tol,
+                                **evaluator_options)
+            
+        elif os.path.isdir(path) or is_archive(path):
+            # 处理文件夹或压缩包
+            spc = None
+            if args.spc:
+                spc = SPCMonitor(window=args.spc_window, warmup=args.spc_warmup,
+                                 target=args.spc_target)
+            db = None
+            if args.db:
+                from mtf_results_db import ResultsDB
+                db = ResultsDB(args.db)
+            supervisor = None
+            if args.processes is not None or args.timeout is not None or args.worker_memory is not None:
+                from mtf_batch import BatchSupervisor, save_failures
+                supervisor = BatchSupervisor(args.processes, args.timeout, args.worker_memory,
+                                             args.retries, args.recycle)
+            try:
+                process_folder(path, args.output, track=args.track, spc=spc,
+                               db=db, station=args.station, max_memory=args.max_memory,
+                               workers=args.workers, supervisor=supervisor, **evaluator_options)
+            finally:
+                if db is not None:
+                    db.close()
+            if supervisor is not None and args.failures:
+                save_failures(supervisor.failures, args.failures)
+                print(f"✓ 失败报告已保存到: {args.failures}（{len(supervisor.failures)} 张）")
         else:
             print(f"\n错误: 路径不存在: {path}\n")
             return 1
     
+    except NoValidEdgeError as e:
+        print(f"\n{e}\n")
+        return 1
+    
     except Exception as e:
         print(f"\n错误: {e}\n")
         import traceback
@@ -630,4 +3121,6 @@ def main():
 
 
 if __name__ == '__main__':
+    # 打包为可执行文件后，Windows上的工作进程需要经freeze_support进入
+    multiprocessing.freeze_support()
     exit(main())
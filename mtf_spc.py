@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MTF50流式统计过程控制（SPC）
+按相机/工位键维护常数内存的流式统计：Welford均值/方差、滑动窗口统计、P²分位数估计、
+EWMA和CUSUM控制图。每次更新O(1)，趋势越过控制限时立即给出报警，
+用于在班次中途发现镜头逐渐失焦。
+"""
+
+import math
+import os
+import re
+from collections import deque
+
+
+# 控制图报警规则名称
+RULE_SHEWHART = "单点超限"
+RULE_EWMA = "EWMA超限"
+RULE_CUSUM = "CUSUM漂移"
+
+
+class Welford:
+    """Welford在线均值/方差"""
+
+    __slots__ = ('count', 'mean', 'm2')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+
+class RollingWindow:
+    """固定长度滑动窗口的均值/方差（加入和移出均为O(1)）"""
+
+    def __init__(self, size=50):
+        """
+        Args:
+            size: 窗口长度
+        """
+        self.size = max(2, int(size))
+        self.values = deque(maxlen=self.size)
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, x):
+        if len(self.values) == self.size:
+            # 移出最早的值（Welford的逆运算）
+            old = self.values[0]
+            n = len(self.values)
+            old_mean = self.mean
+            self.mean = (n * old_mean - old) / (n - 1)
+            self.m2 -= (old - old_mean) * (old - self.mean)
+        self.values.append(x)
+        n = len(self.values)
+        delta = x - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (x - self.mean)
+        # 抵消舍入误差累积出的负值
+        self.m2 = max(self.m2, 0.0)
+
+    @property
+    def count(self):
+        return len(self.values)
+
+    @property
+    def std(self):
+        n = len(self.values)
+        return math.sqrt(self.m2 / (n - 1)) if n > 1 else 0.0
+
+
+class P2Quantile:
+    """P²算法分位数估计（Jain & Chlamtac, 1985），5个标记点，常数内存"""
+
+    def __init__(self, p):
+        """
+        Args:
+            p: 分位数（0~1）
+        """
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def update(self, x):
+        heights = self.heights
+        if len(heights) < 5:
+            heights.append(x)
+            heights.sort()
+            return
+
+        # 找到x所在的区间并更新极值标记
+        if x < heights[0]:
+            heights[0] = x
+            k = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= heights[k + 1]:
+                k += 1
+
+        positions = self.positions
+        for i in range(k + 1, 5):
+            positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        # 调整中间三个标记点（抛物线插值，越界时退化为线性插值）
+        for i in range(1, 4):
+            d = self.desired[i] - positions[i]
+            if (d >= 1 and positions[i + 1] - positions[i] > 1) or \
+                    (d <= -1 and positions[i - 1] - positions[i] < -1):
+                d = 1 if d > 0 else -1
+                h = self._parabolic(i, d)
+                if not heights[i - 1] < h < heights[i + 1]:
+                    h = heights[i] + d * (heights[i + d] - heights[i]) / (positions[i + d] - positions[i])
+                heights[i] = h
+                positions[i] += d
+
+    def _parabolic(self, i, d):
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+
+    @property
+    def value(self):
+        heights = self.heights
+        if not heights:
+            return None
+        if len(heights) < 5:
+            # 样本不足5个时直接取最近秩
+            return heights[min(len(heights) - 1, int(round(self.p * (len(heights) - 1))))]
+        return heights[2]
+
+
+class ControlChart:
+    """单个相机/工位的MTF50控制图"""
+
+    def __init__(self, window=50, warmup=30, ewma_lambda=0.2, ewma_width=3.0,
+                 cusum_k=0.5, cusum_h=5.0, shewhart_width=3.0, target=None, sigma=None,
+                 min_sigma=1e-3, quantiles=(0.1, 0.5, 0.9)):
+        """
+        初始化控制图
+
+        Args:
+            window: 滑动窗口长度
+            warmup: 估计基线（均值和标准差）的样本数，基线确定后才开始判定报警
+            ewma_lambda: EWMA平滑系数
+            ewma_width: EWMA控制限宽度（标准差倍数）
+            cusum_k: CUSUM参考值（标准差倍数，通常为待检测偏移量的一半）
+            cusum_h: CUSUM判定阈值（标准差倍数）
+            shewhart_width: 单点控制限宽度（标准差倍数）
+            target: 已知的目标MTF50，None表示由预热样本估计
+            sigma: 已知的过程标准差，None表示由预热样本估计
+            min_sigma: 估计标准差的下限（cycles/pixel），避免近乎恒定的预热样本
+                       给出过窄的控制限
+            quantiles: 需要估计的分位数
+        """
+        self.warmup = max(2, int(warmup))
+        self.ewma_lambda = ewma_lambda
+        self.ewma_width = ewma_width
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self.shewhart_width = shewhart_width
+        self.min_sigma = min_sigma
+
+        self.overall = Welford()
+        self.baseline = Welford()
+        self.rolling = RollingWindow(window)
+        self.quantiles = {q: P2Quantile(q) for q in quantiles}
+
+        self.target = target
+        self.sigma = sigma
+        self.ewma = None
+        self.ewma_steps = 0
+        self.ewma_out = False
+        self.cusum_low = 0.0
+        self.cusum_high = 0.0
+        self.alarms = 0
+
+    @property
+    def ready(self):
+        """基线是否已确定"""
+        return self.target is not None and self.sigma is not None and self.sigma > 0
+
+    def update(self, x):
+        """
+        加入一个MTF50样本
+
+        Args:
+            x: MTF50值
+
+        Returns:
+            list: 本样本触发的报警，每项为 (规则, 方向, 统计量, 控制限)
+        """
+        self.overall.update(x)
+        self.rolling.update(x)
+        for estimator in self.quantiles.values():
+            estimator.update(x)
+
+        if not self.ready:
+            # 预热阶段：累积基线
+            self.baseline.update(x)
+            if self.baseline.count >= self.warmup:
+                if self.target is None:
+                    self.target = self.baseline.mean
+                if self.sigma is None:
+                    self.sigma = max(self.baseline.std, self.min_sigma)
+            return []
+
+        alarms = []
+        z = (x - self.target) / self.sigma
+
+        # 单点控制限
+        if abs(z) > self.shewhart_width:
+            limit = self.target + math.copysign(self.shewhart_width * self.sigma, z)
+            alarms.append((RULE_SHEWHART, 'down' if z < 0 else 'up', x, limit))
+
+        # EWMA从目标值起步，控制限随步数收敛到稳态宽度；越过控制限时报警一次，
+        # 回到控制限内后才重新判定
+        lam = self.ewma_lambda
+        previous = self.target if self.ewma is None else self.ewma
+        self.ewma = lam * x + (1 - lam) * previous
+        self.ewma_steps += 1
+        width = self.ewma_width * self.sigma * math.sqrt(
+            lam / (2 - lam) * (1 - (1 - lam) ** (2 * self.ewma_steps)))
+        out = abs(self.ewma - self.target) > width
+        if out and not self.ewma_out:
+            direction = 'down' if self.ewma < self.target else 'up'
+            limit = self.target - width if direction == 'down' else self.target + width
+            alarms.append((RULE_EWMA, direction, self.ewma, limit))
+        self.ewma_out = out
+
+        # 双侧CUSUM（以标准差为单位），报警后清零重新累积
+        self.cusum_high = max(0.0, self.cusum_high + z - self.cusum_k)
+        self.cusum_low = max(0.0, self.cusum_low - z - self.cusum_k)
+        if self.cusum_low > self.cusum_h:
+            alarms.append((RULE_CUSUM, 'down', self.cusum_low, self.cusum_h))
+            self.cusum_low = 0.0
+        if self.cusum_high > self.cusum_h:
+            alarms.append((RULE_CUSUM, 'up', self.cusum_high, self.cusum_h))
+            self.cusum_high = 0.0
+
+        self.alarms += len(alarms)
+        return alarms
+
+    def summary(self):
+        """
+        当前统计量
+
+        Returns:
+            dict: 样本数、均值、标准差、滑动窗口统计、分位数、EWMA、基线和报警数
+        """
+        return {
+            'count': self.overall.count,
+            'mean': self.overall.mean,
+            'std': self.overall.std,
+            'rolling_mean': self.rolling.mean,
+            'rolling_std': self.rolling.std,
+            'quantiles': {q: est.value for q, est in self.quantiles.items()},
+            'ewma': self.ewma,
+            'target': self.target,
+            'sigma': self.sigma,
+            'alarms': self.alarms,
+        }
+
+
+def default_key(path):
+    """
+    由文件名得到相机/工位键：去掉扩展名和末尾的帧序号
+    （如 0908_01_NG_12.bmp → 0908_01_NG）
+
+    Args:
+        path: 图像路径或文件名
+
+    Returns:
+        str: 键
+    """
+    stem = os.path.splitext(os.path.basename(str(path)))[0]
+    return re.sub(r'[_\-\s.]*\d+$', '', stem) or stem
+
+
+class SPCMonitor:
+    """按相机/工位键维护控制图的流式SPC监视器"""
+
+    def __init__(self, key_func=default_key, on_alarm=None, **chart_options):
+        """
+        初始化监视器
+
+        Args:
+            key_func: 由图像路径/名称得到键的函数
+            on_alarm: 报警回调，参数为报警字典
+            **chart_options: 传给ControlChart的选项（window、warmup、target等）
+        """
+        self.key_func = key_func
+        self.on_alarm = on_alarm
+        self.chart_options = chart_options
+        self.charts = {}
+
+    def update(self, name, mtf50, key=None):
+        """
+        加入一个样本
+
+        Args:
+            name: 图像路径或名称
+            mtf50: MTF50值
+            key: 相机/工位键，None表示由key_func从name得到
+
+        Returns:
+            list: 报警字典列表
+        """
+        key = self.key_func(name) if key is None else key
+        chart = self.charts.get(key)
+        if chart is None:
+            chart = self.charts[key] = ControlChart(**self.chart_options)
+
+        alarms = []
+        for rule, direction, statistic, limit in chart.update(float(mtf50)):
+            alarm = {
+                'key': key,
+                'name': os.path.basename(str(name)),
+                'index': chart.overall.count,
+                'value': float(mtf50),
+                'rule': rule,
+                'direction': direction,
+                'statistic': statistic,
+                'limit': limit,
+            }
+            alarms.append(alarm)
+            if self.on_alarm is not None:
+                self.on_alarm(alarm)
+        return alarms
+
+    def summary(self):
+        """
+        Returns:
+            dict: {键: ControlChart.summary()}
+        """
+        return {key: chart.summary() for key, chart in self.charts.items()}
+
+
+def format_alarm(alarm):
+    """
+    报警的单行描述
+
+    Args:
+        alarm: 报警字典
+
+    Returns:
+        str: 描述文本
+    """
+    trend = "下降" if alarm['direction'] == 'down' else "上升"
+    return (f"⚠ SPC报警 [{alarm['key']}] 第{alarm['index']}帧 {alarm['name']}: "
+            f"{alarm['rule']}（MTF50{trend}，统计量 {alarm['statistic']:.6f}，控制限 {alarm['limit']:.6f}）")
+
+
+def format_summary(monitor, width=90):
+    """
+    SPC汇总表
+
+    Args:
+        monitor: SPCMonitor
+        width: 分隔线宽度
+
+    Returns:
+        str: 汇总文本
+    """
+    lines = [f"{'工位/相机':<20} {'样本':>6} {'均值':>8} {'标准差':>8} {'窗口均值':>9} "
+             f"{'P10':>7} {'P50':>7} {'P90':>7} {'EWMA':>8} {'报警':>5}", "-" * width]
+    for key, s in monitor.summary().items():
+        q = s['quantiles']
+
+        def fmt(v, w=7):
+            return f"{v:>{w}.4f}" if v is not None else f"{'-':>{w}}"
+
+        lines.append(f"{key:<20} {s['count']:>6} {s['mean']:>8.4f} {s['std']:>8.4f} "
+                     f"{s['rolling_mean']:>9.4f} {fmt(q.get(0.1))} {fmt(q.get(0.5))} {fmt(q.get(0.9))} "
+                     f"{fmt(s['ewma'], 8)} {s['alarms']:>5}")
+    return "\n".join(lines)
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MTF参数扫描（sweep 子命令）
+对每张图像评估参数网格中的全部配置：解码、梯度和强边缘定位每张图只算一次，每个ROI
+只投影一次（经 mtf_pipeline 的阶段缓存共享），同一条ESF上不同sigma的LSF由所选计算内核
+逐个求出后堆叠，FFT一次完成。输出“图像 × 配置 × 指标”的整齐表格，并给出各配置相对基准配置的
+MTF50排名变化。
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+from scipy import stats
+
+from mtf_archive import open_archive
+from mtf_kernels import BACKENDS, NumpyKernels
+from mtf_pipeline import STAGE_PARAMS, MTFPipeline, StageCache
+from mtf_sharpness import PRECISIONS, MTFSharpnessEvaluator, find_image_files, natural_sort_key
+
+
+# 可扫描的参数（顺序即网格展开顺序，前面的参数对应更上游的阶段）
+SWEEP_PARAMS = ('percentile', 'margin', 'oversample', 'sigma')
+
+# 整齐表格的列（CSV表头 / JSONL键）
+SWEEP_FIELDS = ('filename', 'config') + SWEEP_PARAMS + ('mtf50', 'mtf30', 'mtf10', 'mtf_auc', 'rank')
+
+# 各参数的默认值（与 compute_mtf_sharpness 一致）
+DEFAULTS = {name: STAGE_PARAMS[stage][name]
+            for stage in STAGE_PARAMS for name in STAGE_PARAMS[stage] if name in SWEEP_PARAMS}
+
+
+def parse_values(text, value_type=float):
+    """
+    解析逗号分隔的参数取值（如 "1,1.5,2"）
+
+    Args:
+        text: 取值字符串
+        value_type: 取值类型
+
+    Returns:
+        list: 去重后保持顺序的取值
+    """
+    try:
+        values = [value_type(part) for part in str(text).split(',') if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"无法解析参数取值: {text}（示例: 1,1.5,2）")
+    if not values:
+        raise argparse.ArgumentTypeError(f"参数取值为空: {text}")
+    return list(dict.fromkeys(values))
+
+
+def build_grid(**values):
+    """
+    展开参数网格（未给出的参数取默认值）
+
+    Args:
+        **values: 参数名 → 取值列表
+
+    Returns:
+        list: 配置字典列表
+    """
+    unknown = set(values) - set(SWEEP_PARAMS)
+    if unknown:
+        raise ValueError(f"不支持扫描的参数: {', '.join(sorted(unknown))}（可选: {', '.join(SWEEP_PARAMS)}）")
+    axes = [values.get(name) or [DEFAULTS[name]] for name in SWEEP_PARAMS]
+    return [dict(zip(SWEEP_PARAMS, combo)) for combo in itertools.product(*axes)]
+
+
+def stacked_mtf(esf, sigmas, thresholds=(0.5, 0.3, 0.1), kernels=NumpyKernels):
+    """
+    同一条ESF在多个sigma下的LSF和MTF：各sigma的LSF由计算内核求出（与 compute_lsf 相同），
+    堆叠后一次FFT（_stack_mtf_from_lsf），逐行与 compute_mtf_from_lsf、compute_metrics 的结果相同
+
+    Args:
+        esf: 插值后的ESF
+        sigmas: LSF高斯平滑的标准差列表
+        thresholds: 需要给出交叉频率的MTF值
+        kernels: 计算内核（mtf_kernels.get_kernels 的结果）
+
+    Returns:
+        dict: 指标名 → 长度为len(sigmas)的数组（mtf50、mtf30、mtf10、mtf_auc）
+    """
+    lsf = np.stack([kernels.lsf(esf, sigma) for sigma in sigmas])
+    frequencies, mtf = MTFSharpnessEvaluator._stack_mtf_from_lsf(lsf)
+
+    metrics = {f"mtf{round(value * 100)}": MTFSharpnessEvaluator._stack_crossing(frequencies, mtf, value)
+               for value in thresholds}
+    metrics['mtf_auc'] = np.trapezoid(mtf, frequencies, axis=-1)
+    return metrics
+
+
+def sweep_image(pipeline, grid, image_path=None, data=None):
+    """
+    评估一张图像在全部配置下的指标
+
+    Args:
+        pipeline: MTFPipeline（上游阶段在其缓存中共享）
+        grid: build_grid 返回的配置列表
+        image_path: 图像路径
+        data: 编码后的图像字节（压缩包成员）
+
+    Returns:
+        list: 与grid对应的指标字典列表
+    """
+    groups = {}
+    for index, config in enumerate(grid):
+        upstream = tuple(config[name] for name in SWEEP_PARAMS if name != 'sigma')
+        groups.setdefault(upstream, []).append(index)
+
+    results = [None] * len(grid)
+    for upstream, indices in groups.items():
+        params = dict(zip([name for name in SWEEP_PARAMS if name != 'sigma'], upstream))
+        esf = pipeline.stage('esf', image_path, data, **params)
+        metrics = stacked_mtf(esf, [grid[i]['sigma'] for i in indices], kernels=pipeline.kernels)
+        for row, index in enumerate(indices):
+            results[index] = {name: float(values[row]) for name, values in metrics.items()}
+    return results
+
+
+def rank_rows(rows, configs):
+    """
+    按配置给各图像的MTF50排名（值越大排名越前）
+
+    Args:
+        rows: 整齐表格的行（会就地写入rank）
+        configs: 配置数
+    """
+    for config in range(configs):
+        members = sorted((r for r in rows if r['config'] == config), key=lambda r: r['mtf50'], reverse=True)
+        for rank, row in enumerate(members, 1):
+            row['rank'] = rank
+
+
+def summarize(rows, grid, baseline):
+    """
+    各配置的MTF50统计及相对基准配置的排名一致性
+
+    Args:
+        rows: 整齐表格的行
+        grid: 配置列表
+        baseline: 基准配置序号
+
+    Returns:
+        list: 每个配置的汇总字典
+    """
+    by_config = {}
+    for row in rows:
+        by_config.setdefault(row['config'], {})[row['filename']] = row
+    base = by_config.get(baseline, {})
+    summary = []
+    for config, params in enumerate(grid):
+        members = by_config.get(config, {})
+        common = sorted(set(members) & set(base))
+        mtf50 = np.array([r['mtf50'] for r in members.values()])
+        rho = np.nan
+        if len(common) >= 2:
+            with np.errstate(invalid='ignore', divide='ignore'):
+                rho = stats.spearmanr([members[f]['mtf50'] for f in common],
+                                      [base[f]['mtf50'] for f in common]).statistic
+        summary.append(dict(params, config=config, images=len(members),
+                            mean=float(mtf50.mean()) if len(mtf50) else np.nan,
+                            spearman=float(rho),
+                            rank_changes=sum(members[f]['rank'] != base[f]['rank'] for f in common),
+                            best=min(members.values(), key=lambda r: r['rank'])['filename'] if members else '-'))
+    return summary
+
+
+def save_sweep(rows, output_file):
+    """
+    保存整齐表格（.csv / .jsonl，其余扩展名为文本表格）
+
+    Args:
+        rows: 整齐表格的行
+        output_file: 输出文件路径
+    """
+    ext = os.path.splitext(output_file)[1].lower()
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        if ext == '.csv':
+            writer = csv.DictWriter(f, fieldnames=SWEEP_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        elif ext == '.jsonl':
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + '\n')
+        else:
+            f.write(" ".join(f"{name:<12}" for name in SWEEP_FIELDS).rstrip() + "\n")
+            for row in rows:
+                f.write(" ".join(f"{row[name]:<12.6f}" if isinstance(row[name], float) else f"{row[name]!s:<12}"
+                                 for name in SWEEP_FIELDS).rstrip() + "\n")
+
+
+def run_sweep(path, grid, output_file=None, precision='float64', backend='numpy'):
+    """
+    对文件夹（或压缩包）中的全部图像执行参数扫描
+
+    Args:
+        path: 文件夹或ZIP/TAR压缩包路径
+        grid: build_grid 返回的配置列表
+        output_file: 整齐表格的输出路径（可选）
+        precision: 数值精度
+        backend: 计算内核
+
+    Returns:
+        tuple: (整齐表格的行, 各配置汇总)
+    """
+    archive = open_archive(path)
+    if archive is not None:
+        names = archive.members()
+        items = ((name, None) for name in names) if names is not None else archive.stream()
+        total = len(names) if names is not None else None
+    else:
+        names = sorted(find_image_files(path), key=natural_sort_key)
+        items = ((name, None) for name in names)
+        total = len(names)
+
+    # 每张图像的上游阶段只在本图的配置之间共享，换图时清空
+    pipeline = MTFPipeline(StageCache(), precision=precision, backend=backend)
+    baseline = next((i for i, config in enumerate(grid) if config == DEFAULTS), 0)
+    groups = len({tuple(c[n] for n in SWEEP_PARAMS if n != 'sigma') for c in grid})
+    projections = len({(c['percentile'], c['margin']) for c in grid})
+
+    print("\n" + "="*90)
+    print("MTF参数扫描")
+    print("="*90)
+    print(f"{'压缩包' if archive else '文件夹'}: {path}")
+    print(f"图像: {total if total is not None else '按包内顺序流式读取'} | 配置: {len(grid)} "
+          f"(ESF {groups} 条, 投影 {projections} 次/图, LSF/FFT按sigma堆叠)")
+    for name in SWEEP_PARAMS:
+        print(f"  {name}: {', '.join(str(v) for v in dict.fromkeys(c[name] for c in grid))}")
+    print("-"*90)
+
+    rows = []
+    start = time.perf_counter()
+    for name, data in items:
+        filename = os.path.basename(name)
+        if archive is not None and data is None:
+            data = archive.read(name)
+        try:
+            t0 = time.perf_counter()
+            metrics = sweep_image(pipeline, grid, None if data is not None else name, data)
+        except Exception as e:
+            print(f"✗ {filename}: 处理失败 - {e}")
+            continue
+        finally:
+            pipeline.cache.clear()
+        for config, values in enumerate(metrics):
+            rows.append(dict({'filename': filename, 'config': config}, **grid[config], **values, rank=0))
+        base = metrics[baseline]['mtf50']
+        spread = [m['mtf50'] for m in metrics]
+        print(f"✓ {filename}: MTF50(基准)={base:.4f} | 范围 {min(spread):.4f}~{max(spread):.4f} | "
+              f"{(time.perf_counter() - t0) * 1000:.0f} ms")
+    elapsed = time.perf_counter() - start
+    if archive is not None:
+        archive.close()
+
+    if not rows:
+        print("\n没有成功处理任何图像")
+        return rows, []
+
+    rank_rows(rows, len(grid))
+    summary = summarize(rows, grid, baseline)
+    images = len(rows) // len(grid)
+
+    print("\n" + "="*90)
+    print(f"各配置汇总（基准配置 #{baseline}，Spearman ρ 为与基准的MTF50排名相关系数）")
+    print("="*90)
+    print(f"{'配置':<6} {'percentile':<11} {'margin':<8} {'oversample':<11} {'sigma':<7} "
+          f"{'平均MTF50':<11} {'ρ':<8} {'排名变化':<9} {'最清晰'}")
+    print("-"*90)
+    for s in summary:
+        print(f"{s['config']:<6} {s['percentile']:<11} {s['margin']:<8} {s['oversample']:<11} {s['sigma']:<7} "
+              f"{s['mean']:<11.4f} {s['spearman']:<8.3f} {s['rank_changes']:<9} {s['best']}")
+    print("-"*90)
+    print(f"图像: {images} | 配置: {len(grid)} | 结果行: {len(rows)} | 总耗时: {elapsed:.2f} s "
+          f"({elapsed / images * 1000:.0f} ms/图)")
+
+    if output_file:
+        save_sweep(rows, output_file)
+        print(f"\n✓ 整齐表格已保存到: {output_file}")
+    print("="*90 + "\n")
+    return rows, summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='mtf_sharpness.py sweep',
+        description='参数扫描：对文件夹或压缩包中的每张图像评估参数网格中的全部配置，共享解码、梯度和投影',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+使用示例:
+  # LSF平滑sigma × ROI边距 × 插值倍数，共 4x3x2=24 个配置
+  python mtf_sharpness.py sweep ./images --sigma 1,1.5,2,3 --margin 30,50,80 --oversample 4,8 -o sweep.csv
+        """
+    )
+    parser.add_argument('path', help='图像文件夹或ZIP/TAR压缩包路径')
+    parser.add_argument('--sigma', type=parse_values, help=f"LSF高斯平滑标准差（默认: {DEFAULTS['sigma']}）")
+    parser.add_argument('--margin', type=lambda t: parse_values(t, int),
+                        help=f"ROI边距，像素（默认: {DEFAULTS['margin']}）")
+    parser.add_argument('--oversample', type=lambda t: parse_values(t, int),
+                        help=f"ESF亚像素插值倍数（默认: {DEFAULTS['oversample']}）")
+    parser.add_argument('--percentile', type=parse_values,
+                        help=f"强边缘梯度百分位阈值（默认: {DEFAULTS['percentile']}）")
+    parser.add_argument('--precision', choices=sorted(PRECISIONS), default='float64',
+                        help='数值精度（默认: float64）')
+    parser.add_argument('--backend', choices=BACKENDS, default='numpy',
+                        help='ESF/LSF/MTF50计算内核（默认: numpy）')
+    parser.add_argument('--output', '-o', help='整齐表格（图像×配置×指标）的输出路径，.csv/.jsonl为结构化格式')
+    args = parser.parse_args(argv)
+
+    if not (os.path.isdir(args.path) or open_archive(args.path) is not None):
+        print(f"\n错误: 路径不是文件夹或压缩包: {args.path}\n")
+        return 1
+    grid = build_grid(sigma=args.sigma, margin=args.margin, oversample=args.oversample,
+                      percentile=args.percentile)
+    rows, _ = run_sweep(args.path, grid, args.output, precision=args.precision, backend=args.backend)
+    return 0 if rows else 1
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""测试公共设置：从仓库根目录导入 mtf_* 模块，样例图像在 images/ 下"""
+
+import glob
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+IMAGE_DIR = os.path.join(ROOT, 'images')
+
+
+@pytest.fixture(scope='session')
+def sample_images():
+    """仓库自带的样例图像（按文件名排序）"""
+    images = sorted(glob.glob(os.path.join(IMAGE_DIR, '*.bmp')))
+    if not images:
+        pytest.skip("没有样例图像")
+    return images
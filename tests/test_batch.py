@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""受监管的工作进程（mtf_batch）：超时、崩溃重启、重试、定期换新、失败报告和压缩包成员"""
+
+import csv
+import multiprocessing as mp
+import os
+import tarfile
+import time
+import zipfile
+
+import pytest
+
+import mtf_batch
+from mtf_archive import ImageArchive
+from mtf_batch import BatchSupervisor, save_failures
+from mtf_sharpness import process_single_image
+
+
+@pytest.fixture(scope='module')
+def members(sample_images):
+    """压缩包中放入的样例图像（两张足以覆盖逐张派发和进程复用）"""
+    return [sample_images[0], sample_images[-1]]
+
+
+def _build_archive(path, members):
+    if path.endswith('.zip'):
+        with zipfile.ZipFile(path, 'w') as archive:
+            for image in members:
+                archive.write(image, os.path.basename(image))
+    else:
+        with tarfile.open(path, 'w') as archive:
+            for image in members:
+                archive.add(image, os.path.basename(image))
+
+
+@pytest.mark.parametrize('suffix', ['.zip', '.tar'])
+def test_supervisor_reads_random_access_archive(tmp_path, members, suffix):
+    path = str(tmp_path / f"set{suffix}")
+    _build_archive(path, members)
+    expected = {os.path.basename(image): process_single_image(image, verbose=False)[1]
+                for image in members}
+
+    supervisor = BatchSupervisor(processes=1, timeout=120)
+    with ImageArchive(path) as archive:
+        assert archive.random_access
+        items = [(name, None) for name in archive.members()]
+        outcomes = list(supervisor.run(items, archive, verbose=False))
+
+    assert supervisor.failures == []
+    assert {name: result[1] for name, result in outcomes} == expected
+
+
+def test_archive_read_without_listing(tmp_path, members):
+    # 工作进程只按成员名读取，不先调用 members()
+    path = str(tmp_path / 'set.zip')
+    _build_archive(path, members)
+    name = os.path.basename(members[0])
+    with ImageArchive(path) as archive:
+        with open(members[0], 'rb') as f:
+            assert archive.read(name) == f.read()
+
+
+# 以下用例替换工作进程中的评估函数，依赖fork方式启动（子进程继承替换后的模块）
+needs_fork = pytest.mark.skipif(mp.get_start_method() != 'fork', reason="需要fork方式启动工作进程")
+
+
+def _fake_evaluate(name, data, archive, evaluator_options):
+    """按名字模拟：hang 卡住，crash 进程直接退出，其余立即返回固定结果"""
+    if name.startswith('hang'):
+        time.sleep(60)
+    if name.startswith('crash'):
+        os._exit(3)
+    return {'status': 'ok', 'mtf50': 0.1, 'score': 20.0, 'level': '轻微模糊', 'mtf50_ci': None,
+            'message': None, 'stage_times': {}, 'elapsed': 0.0}
+
+
+@pytest.fixture
+def fake_evaluate(monkeypatch):
+    monkeypatch.setattr(mtf_batch, '_evaluate', _fake_evaluate)
+
+
+@needs_fork
+@pytest.mark.usefixtures('fake_evaluate')
+def test_timeout_kills_and_retries():
+    supervisor = BatchSupervisor(processes=1, timeout=0.5, retries=1)
+    outcomes = dict(supervisor.run([('hang.bmp', None), ('ok.bmp', None)], verbose=False))
+
+    assert outcomes['hang.bmp'] == ('hang.bmp', None, None, '超时')
+    assert outcomes['ok.bmp'][1] == 0.1
+    assert [(f['path'], f['kind'], f['attempts']) for f in supervisor.failures] == \
+        [('hang.bmp', 'timeout', supervisor.retries + 1)]
+    assert supervisor.retried == 1
+    assert supervisor.restarts['timeout'] == 2
+
+
+@needs_fork
+@pytest.mark.usefixtures('fake_evaluate')
+def test_crash_restarts_worker():
+    supervisor = BatchSupervisor(processes=1, timeout=30, retries=2)
+    names = ['a.bmp', 'crash.bmp', 'b.bmp']
+    outcomes = dict(supervisor.run([(name, None) for name in names], verbose=False))
+
+    assert outcomes['crash.bmp'][3] == '进程崩溃'
+    assert outcomes['a.bmp'][1] == outcomes['b.bmp'][1] == 0.1
+    failure, = supervisor.failures
+    assert failure['kind'] == 'crash'
+    assert failure['attempts'] == supervisor.retries + 1
+    assert failure['message'] == '退出码 3'
+    assert supervisor.restarts['crash'] == 3
+    assert supervisor.completed == 3
+
+
+@needs_fork
+@pytest.mark.usefixtures('fake_evaluate')
+def test_recycle_after_n_images():
+    supervisor = BatchSupervisor(processes=1, recycle=2)
+    outcomes = list(supervisor.run([(f"{i}.bmp", None) for i in range(5)], verbose=False))
+
+    assert len(outcomes) == 5
+    assert supervisor.restarts['recycle'] == 2
+    assert supervisor.summary() == {'completed': 5, 'failed': {}, 'retried': 0,
+                                    'restarts': {'timeout': 0, 'memory': 0, 'crash': 0, 'recycle': 2}}
+
+
+@needs_fork
+@pytest.mark.usefixtures('fake_evaluate')
+def test_startup_not_counted_against_timeout(monkeypatch):
+    """进程启动（导入、预热）比单张时限还慢时，第一张图像不应判为超时"""
+    monkeypatch.setattr(mtf_batch, '_warm_up', lambda evaluator_options: time.sleep(1.5))
+    supervisor = BatchSupervisor(processes=1, timeout=0.5, memory_limit=4 << 30, retries=0)
+    outcomes = list(supervisor.run([('ok.bmp', None)], verbose=False))
+
+    assert outcomes == [('ok.bmp', ('ok.bmp', 0.1, 20.0, '轻微模糊'))]
+    assert supervisor.failures == []
+
+
+@needs_fork
+@pytest.mark.usefixtures('fake_evaluate')
+def test_failure_report(tmp_path):
+    supervisor = BatchSupervisor(processes=1, timeout=0.5, retries=0)
+    list(supervisor.run([('hang.bmp', None), ('crash.bmp', None)], verbose=False))
+    path = str(tmp_path / 'failed.csv')
+    save_failures(supervisor.failures, path)
+
+    with open(path, encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [(row['path'], row['kind'], row['attempts']) for row in rows] == \
+        [('hang.bmp', 'timeout', '1'), ('crash.bmp', 'crash', '1')]
+    assert float(rows[0]['elapsed']) >= 0.5
+    assert mtf_batch.format_summary(supervisor).count('失败') == 1
+
+
+def test_supervisor_rejects_invalid_options():
+    with pytest.raises(ValueError):
+        BatchSupervisor(timeout=0)
+    with pytest.raises(ValueError):
+        BatchSupervisor(retries=-1)
+    with pytest.raises(ValueError):
+        BatchSupervisor(recycle=0)
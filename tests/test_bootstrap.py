@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""自助法置信区间：结果元组的形式与计算精度"""
+
+import numpy as np
+import pytest
+
+from mtf_sharpness import MTFSharpnessEvaluator, process_single_image
+
+
+def test_result_tuple_without_bootstrap(sample_images):
+    filename, mtf50, score, level = process_single_image(sample_images[0], verbose=False)
+
+    assert mtf50 is not None
+
+
+def test_result_tuple_with_bootstrap(sample_images):
+    outcome = process_single_image(sample_images[0], verbose=False, bootstrap=50)
+
+    assert len(outcome) == 5
+    low, high = outcome[4]
+    assert low <= outcome[1] <= high
+
+
+def test_failed_result_tuple(tmp_path):
+    path = tmp_path / 'broken.bmp'
+    path.write_bytes(b'not an image')
+
+    assert len(process_single_image(str(path), verbose=False)) == 4
+    assert process_single_image(str(path), verbose=False, bootstrap=50)[4] is None
+
+
+@pytest.mark.parametrize('precision', ['float32', 'float64'])
+def test_bootstrap_uses_precision(sample_images, monkeypatch, precision):
+    evaluator = MTFSharpnessEvaluator(sample_images[0], precision=precision)
+    evaluator.load_image()
+    evaluator.compute_mtf_sharpness()
+
+    dtypes = []
+    stack_interpolate = evaluator._stack_interpolate
+
+    def record(projected):
+        dtypes.append(projected.dtype)
+        return stack_interpolate(projected)
+
+    monkeypatch.setattr(evaluator, '_stack_interpolate', record)
+    ci = evaluator.compute_bootstrap_ci(samples=50)
+
+    assert dtypes and all(dtype == np.dtype(precision) for dtype in dtypes)
+    assert ci['mtf50_ci'][0] <= ci['mtf50_ci'][1]
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""两轮结果对比（mtf_compare）：三种结果格式的读回、按文件名连接以及KS检验"""
+
+import csv
+
+import numpy as np
+import pytest
+from scipy import stats
+
+from mtf_compare import (HIST_BIN_WIDTH, MTF50_RANGE, StreamingHistogram, compare_runs,
+                         ks_two_sample, main, parse_threshold, read_results)
+from mtf_sharpness import save_results_to_file
+
+FORMATS = ('.csv', '.jsonl', '.txt')
+
+
+def make_results(values, with_ci=False):
+    """按 process_single_image 的结果字段构造结果列表（含一个带空格的文件名）"""
+    results = []
+    for name, mtf50 in values.items():
+        results.append({
+            'filename': name,
+            'path': f'/data/{name}',
+            'mtf50': mtf50,
+            'score': mtf50 * 1000,
+            'level': '模糊',
+            'mtf50_ci': (mtf50 - 0.002, mtf50 + 0.003) if with_ci else None,
+        })
+    return results
+
+
+def write_run(tmp_path, stem, values, ext, with_ci=False):
+    path = str(tmp_path / f'{stem}{ext}')
+    save_results_to_file(make_results(values, with_ci), path)
+    return path
+
+
+BASELINE = {
+    'a.bmp': 0.0800,
+    'b.bmp': 0.0700,
+    'c d.bmp': 0.0600,
+    'e.bmp': 0.0500,
+    'gone.bmp': 0.0400,
+}
+
+CANDIDATE = {
+    'a.bmp': 0.0600,      # -0.02：退化
+    'b.bmp': 0.0950,      # +0.025：提升
+    'c d.bmp': 0.0610,    # +0.001：无明显变化
+    'e.bmp': 0.0470,      # -0.003：绝对阈值下无变化，相对阈值(5%)下退化
+    'new.bmp': 0.0900,
+}
+
+
+@pytest.mark.parametrize('with_ci', [False, True])
+@pytest.mark.parametrize('ext', FORMATS)
+def test_read_results_round_trip(tmp_path, ext, with_ci):
+    path = write_run(tmp_path, 'run', BASELINE, ext, with_ci)
+    rows = list(read_results(path))
+
+    assert [name for name, _ in rows] == list(BASELINE)
+    # 文本表格保留6位小数，结构化格式完整保留
+    tol = 1e-6 if ext == '.txt' else 0
+    for (_, mtf50), expected in zip(rows, BASELINE.values()):
+        assert mtf50 == pytest.approx(expected, abs=tol)
+
+
+def test_read_results_skips_rows_without_mtf50(tmp_path):
+    path = tmp_path / 'run.csv'
+    path.write_text('rank,filename,mtf50\n1,a.bmp,0.07\n2,b.bmp,\n', encoding='utf-8')
+    assert list(read_results(str(path))) == [('a.bmp', 0.07)]
+
+
+@pytest.mark.parametrize('ext', FORMATS)
+def test_compare_runs_hash_join(tmp_path, ext):
+    baseline = write_run(tmp_path, 'base', BASELINE, ext)
+    candidate = write_run(tmp_path, 'cand', CANDIDATE, ext, with_ci=True)
+
+    result = compare_runs(baseline, candidate, threshold=0.01)
+
+    assert result['matched'] == 4
+    assert result['only_baseline'] == 1
+    assert result['only_candidate'] == 1
+    assert result['duplicates'] == 0
+    assert (result['regressed'], result['improved'], result['unchanged']) == (1, 1, 2)
+    assert [item[0] for item in result['worst']] == ['a.bmp', 'e.bmp', 'c d.bmp', 'b.bmp']
+    assert [item[0] for item in result['best']] == ['b.bmp', 'c d.bmp', 'e.bmp', 'a.bmp']
+    name, base, mtf50, delta = result['worst'][0]
+    assert (base, mtf50) == pytest.approx((0.08, 0.06), abs=1e-6)
+    assert delta == pytest.approx(-0.02, abs=1e-6)
+    assert result['baseline_stats']['count'] == 5
+    assert result['delta_stats']['count'] == 4
+
+
+def test_compare_runs_relative_threshold_and_top(tmp_path):
+    baseline = write_run(tmp_path, 'base', BASELINE, '.csv')
+    candidate = write_run(tmp_path, 'cand', CANDIDATE, '.jsonl')
+
+    threshold, relative = parse_threshold('5%')
+    assert (threshold, relative) == (0.05, True)
+    result = compare_runs(baseline, candidate, threshold, relative, top=2)
+
+    # e.bmp: -0.003 / 0.05 = -6%
+    assert (result['regressed'], result['improved'], result['unchanged']) == (2, 1, 1)
+    assert [item[0] for item in result['worst']] == ['a.bmp', 'e.bmp']
+    assert [item[0] for item in result['best']] == ['b.bmp', 'c d.bmp']
+
+
+def test_compare_runs_duplicates_keep_last(tmp_path):
+    baseline = tmp_path / 'base.csv'
+    baseline.write_text('filename,mtf50\na.bmp,0.05\na.bmp,0.08\n', encoding='utf-8')
+    candidate = tmp_path / 'cand.csv'
+    candidate.write_text('filename,mtf50\na.bmp,0.08\na.bmp,0.01\n', encoding='utf-8')
+
+    result = compare_runs(str(baseline), str(candidate))
+
+    assert result['duplicates'] == 1
+    # 对比轮中重复的文件名只与基准连接一次
+    assert result['matched'] == 1
+    assert result['unchanged'] == 1
+
+
+def test_delta_file_statuses(tmp_path):
+    baseline = write_run(tmp_path, 'base', BASELINE, '.csv')
+    candidate = write_run(tmp_path, 'cand', CANDIDATE, '.csv')
+    delta_file = str(tmp_path / 'delta.csv')
+
+    compare_runs(baseline, candidate, threshold=0.01, delta_file=delta_file)
+
+    with open(delta_file, encoding='utf-8', newline='') as f:
+        rows = {row['filename']: row for row in csv.DictReader(f)}
+    assert {name: row['status'] for name, row in rows.items()} == {
+        'a.bmp': 'regressed',
+        'b.bmp': 'improved',
+        'c d.bmp': 'unchanged',
+        'e.bmp': 'unchanged',
+        'new.bmp': 'new',
+        'gone.bmp': 'missing',
+    }
+    assert float(rows['a.bmp']['rel_delta']) == pytest.approx(-0.25)
+
+
+def test_ks_matches_scipy():
+    rng = np.random.default_rng(0)
+    a = rng.normal(0.070, 0.005, 3000)
+    b = rng.normal(0.071, 0.006, 2000)
+    hist_a = StreamingHistogram(*MTF50_RANGE)
+    hist_b = StreamingHistogram(*MTF50_RANGE)
+    for x in a:
+        hist_a.add(x)
+    for x in b:
+        hist_b.add(x)
+
+    d, p = ks_two_sample(hist_a, hist_b)
+    expected = stats.ks_2samp(a, b)
+
+    # 分桶后CDF只在桶边界上比较，与精确统计量的差别在一个桶内的样本占比以内
+    assert d == pytest.approx(expected.statistic, abs=0.01)
+    assert d <= expected.statistic + 1e-12
+    asymptotic = stats.ks_2samp(a, b, method='asymp').pvalue
+    assert p == pytest.approx(asymptotic, rel=0.5, abs=1e-6)
+
+
+def test_ks_identical_and_empty():
+    hist_a = StreamingHistogram(*MTF50_RANGE)
+    hist_b = StreamingHistogram(*MTF50_RANGE)
+    assert ks_two_sample(hist_a, hist_b) == (None, None)
+
+    for x in np.linspace(0.05, 0.09, 500):
+        hist_a.add(x)
+        hist_b.add(x)
+    d, p = ks_two_sample(hist_a, hist_b)
+    assert d == 0.0
+    assert p == 1.0
+
+
+def test_histogram_quantile_within_half_bin():
+    values = np.random.default_rng(1).uniform(0.02, 0.12, 10000)
+    hist = StreamingHistogram(*MTF50_RANGE)
+    for x in values:
+        hist.add(x)
+    assert hist.total == len(values)
+    for q in (0.1, 0.5, 0.9):
+        exact = np.quantile(values, q, method='inverted_cdf')
+        assert abs(hist.quantile(q) - exact) <= HIST_BIN_WIDTH
+
+
+def test_main(tmp_path, capsys):
+    baseline = write_run(tmp_path, 'base', BASELINE, '.txt', with_ci=True)
+    candidate = write_run(tmp_path, 'cand', CANDIDATE, '.jsonl')
+    delta_file = str(tmp_path / 'delta.csv')
+
+    assert main([baseline, candidate, '--threshold', '5%', '-o', delta_file]) == 0
+    out = capsys.readouterr().out
+    assert '退化 2 张' in out
+    assert main([baseline, str(tmp_path / 'missing.csv')]) == 1
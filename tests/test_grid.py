@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""网格模式（compute_mtf_grid）在倾斜刃边测试卡上的结果"""
+
+import cv2
+import numpy as np
+import pytest
+from scipy import ndimage
+
+from mtf_sharpness import MTFSharpnessEvaluator
+
+
+def slanted_chart(angle, h=600, w=800, square=100, sigma=1.5, shift=25, seed=0):
+    """旋转棋盘格（4倍超采样后面积降采样），高斯模糊并加噪声"""
+    s = 4
+    yy, xx = np.mgrid[0:h * s, 0:w * s].astype(np.float32) / s - shift
+    a = np.radians(angle)
+    u = xx * np.cos(a) + yy * np.sin(a)
+    v = -xx * np.sin(a) + yy * np.cos(a)
+    image = ((np.floor(u / square) + np.floor(v / square)) % 2).astype(np.float32)
+    image = cv2.resize(image, (w, h), interpolation=cv2.INTER_AREA)
+    image = ndimage.gaussian_filter(image, sigma) * 180 + 40
+    image += np.random.default_rng(seed).normal(0, 1, image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+@pytest.fixture(scope='module')
+def reference():
+    """同一模糊程度、刃边与坐标轴对齐时的网格MTF50中位数"""
+    evaluator = MTFSharpnessEvaluator.from_array(slanted_chart(0))
+    evaluator.load_image()
+    return np.nanmedian(evaluator.compute_mtf_grid(8, 6)['mtf50'])
+
+
+@pytest.mark.parametrize('angle', [3, 5, 10])
+def test_grid_on_slanted_edges(reference, angle):
+    evaluator = MTFSharpnessEvaluator.from_array(slanted_chart(angle))
+    evaluator.load_image()
+    grid = evaluator.compute_mtf_grid(8, 6)
+
+    valid = np.isfinite(grid['mtf50'])
+    assert valid.mean() > 0.5
+    # 拟合的倾角与测试卡一致，MTF50与对齐刃边相差不超过10%
+    assert np.allclose(np.abs(grid['edge_angle'][valid]), angle, atol=0.2)
+    assert np.nanmedian(grid['mtf50']) == pytest.approx(reference, rel=0.1)
+
+
+@pytest.mark.parametrize('name, cols, rows', [('0908_01_NG_1.bmp', 24, 18), ('new2-8.bmp', 32, 24)])
+def test_fine_grid_on_sample_images(sample_images, name, cols, rows):
+    path = next((path for path in sample_images if path.endswith(name)), None)
+    if path is None:
+        pytest.skip(f"没有样例图像 {name}")
+    evaluator = MTFSharpnessEvaluator(path)
+    evaluator.load_image()
+    grid = evaluator.compute_mtf_grid(cols, rows)
+
+    assert grid['mtf50'].shape == (rows, cols)
+    valid = np.isfinite(grid['mtf50'])
+    assert valid.any()
+    assert np.all((grid['mtf50'][valid] >= 0) & (grid['mtf50'][valid] <= 0.5))
+
+
+def test_failed_cell_fit_is_nan(monkeypatch):
+    """单个窗口的拟合出错只使该窗口为NaN"""
+    evaluator = MTFSharpnessEvaluator.from_array(slanted_chart(5))
+    evaluator.load_image()
+    expected = evaluator.compute_mtf_grid(8, 6)['mtf50']
+
+    fit_edge_line = evaluator._fit_edge_line
+    calls = []
+
+    def flaky(segment, radius, gray=None):
+        calls.append(segment)
+        if len(calls) == 1:
+            raise IndexError("模拟拟合出错")
+        return fit_edge_line(segment, radius, gray)
+
+    monkeypatch.setattr(evaluator, '_fit_edge_line', flaky)
+    grid = evaluator.compute_mtf_grid(8, 6)
+
+    failed = np.isfinite(expected) & np.isnan(grid['mtf50'])
+    assert failed.sum() == 1
+    others = np.isfinite(grid['mtf50'])
+    np.testing.assert_allclose(grid['mtf50'][others], expected[others])
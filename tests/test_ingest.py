@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""共享内存帧环形缓冲区（mtf_ingest.FrameRing）：单进程内的写入/读取、槽位全忙、序号校验和超大帧"""
+
+import queue
+import threading
+
+import numpy as np
+import pytest
+
+from mtf_ingest import (CLAIMED, EMPTY, READY, FrameRing, _worker, make_edge_frame)
+
+SHAPE = (240, 320)
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing.create(slots=2, slot_bytes=SHAPE[0] * SHAPE[1] * 3)
+    yield ring
+    ring.close()
+
+
+def read_frame(ring, slot):
+    """按槽位头部取回帧（拷贝一份，随即释放共享内存视图）"""
+    header = ring.read_header(slot)
+    view = ring.frame_buffer(slot, header)
+    rows = np.frombuffer(view, dtype=np.uint8).reshape(header['shape'][0], header['stride'])
+    frame = rows.view(header['dtype']).reshape(header['shape']).copy()
+    del rows
+    view.release()
+    return header, frame
+
+
+@pytest.mark.parametrize('shape,dtype', [(SHAPE, np.uint8), (SHAPE + (3,), np.uint8),
+                                         ((120, 160), np.uint16)])
+def test_write_read_round_trip(ring, shape, dtype):
+    frame = np.random.default_rng(0).integers(0, np.iinfo(dtype).max, shape).astype(dtype)
+
+    assert ring.write(frame, timestamp=12.5) == 0
+    assert ring.state(0) == READY
+    header, copy = read_frame(ring, 0)
+
+    assert header['seq'] == 0
+    assert header['timestamp'] == 12.5
+    assert header['shape'] == shape
+    assert header['dtype'] == np.dtype(dtype)
+    assert header['stride'] == frame.nbytes // shape[0]
+    np.testing.assert_array_equal(copy, frame)
+    assert ring.counters() == (1, 0)
+
+
+def test_non_contiguous_frame(ring):
+    frame = make_edge_frame((SHAPE[0], SHAPE[1] * 2))[:, ::2]
+    ring.write(frame)
+    np.testing.assert_array_equal(read_frame(ring, 0)[1], frame)
+
+
+def test_full_ring_drops_new_frames(ring):
+    frames = [make_edge_frame(SHAPE, seed=k) for k in range(4)]
+
+    assert ring.write(frames[0]) == 0
+    assert ring.write(frames[1]) == 1
+    # 两个槽位都未被取走：新帧被丢弃并计数，已写入的帧不被覆盖
+    assert ring.write(frames[2]) is None
+    assert ring.counters() == (2, 1)
+    np.testing.assert_array_equal(read_frame(ring, 0)[1], frames[0])
+
+    # 评估中（CLAIMED）的槽位同样不能写入
+    ring.claim(0)
+    assert ring.write(frames[2]) is None
+    assert ring.counters() == (2, 2)
+
+    # 槽位释放后，序号从被丢弃前的位置继续
+    ring.release(0)
+    assert ring.state(0) == EMPTY
+    assert ring.write(frames[3]) == 2
+    header, copy = read_frame(ring, 0)
+    assert header['seq'] == 2
+    np.testing.assert_array_equal(copy, frames[3])
+    assert ring.counters() == (3, 2)
+
+
+def test_oversized_frame_rejected(ring):
+    with pytest.raises(ValueError):
+        ring.write(np.zeros((SHAPE[0] + 1, SHAPE[1], 3), dtype=np.uint8))
+    with pytest.raises(ValueError):
+        ring.write(np.zeros(SHAPE, dtype=np.float32))
+    # 拒绝的帧不占序号，也不计为丢帧
+    assert ring.state(0) == EMPTY
+    assert ring.counters() == (0, 0)
+    assert ring.write(np.zeros(SHAPE, dtype=np.uint8)) == 0
+
+
+def test_attach_shares_slots(ring):
+    frame = make_edge_frame(SHAPE)
+    ring.write(frame)
+    other = FrameRing.attach(ring.name)
+    try:
+        assert (other.slots, other.slot_bytes) == (ring.slots, ring.slot_bytes)
+        np.testing.assert_array_equal(read_frame(other, 0)[1], frame)
+        other.claim(0)
+        assert ring.state(0) == CLAIMED
+    finally:
+        other.close()
+
+
+def test_create_rejects_single_slot():
+    with pytest.raises(ValueError):
+        FrameRing.create(slots=1, slot_bytes=1024)
+
+
+def run_worker(ring, tasks):
+    """在当前进程内运行评估进程的主循环，返回发布的结果"""
+    task_queue, results = queue.Queue(), queue.Queue()
+    idle = threading.Semaphore(0)
+    for task in tasks + [None]:
+        task_queue.put(task)
+    _worker(ring.name, task_queue, results, idle, {}, False)
+    return [results.get_nowait() for _ in range(results.qsize())]
+
+
+def test_worker_checks_slot_seq(ring):
+    ring.write(make_edge_frame(SHAPE, seed=0))
+    ring.write(make_edge_frame(SHAPE, seed=1))
+    ring.release(0)
+    assert ring.write(make_edge_frame(SHAPE, seed=2)) == 2
+
+    # 槽位0已被序号2覆盖：过期任务 (0, 0) 报错，而 (0, 2) 正常评估
+    ring.claim(0)
+    stale, = run_worker(ring, [(0, 0)])
+    assert stale[0] == 0
+    assert stale[1] is None
+    assert stale[3].startswith('错误')
+    assert ring.state(0) == EMPTY
+
+    ring.release(1)
+    assert ring.write(make_edge_frame(SHAPE, seed=3)) == 3
+    ring.claim(1)
+    fresh, = run_worker(ring, [(1, 3)])
+    seq, mtf50, score, level = fresh[:4]
+    assert seq == 3
+    assert 0 < mtf50 < 0.5
+    assert not level.startswith('错误')
+    assert ring.state(1) == EMPTY
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""line模式（--roi-mode line）的刃边选择与回退"""
+
+import cv2
+import numpy as np
+import pytest
+
+from mtf_sharpness import MIN_EDGE_LENGTH, MTFSharpnessEvaluator, process_single_image
+
+
+def slanted_edge(angle, h=1296, w=2304, sigma=1.5, seed=0, offset=0):
+    """单条倾斜阶跃刃边（中心右移offset像素，4倍超采样后面积降采样），叠加细线干扰，高斯模糊并加噪声"""
+    s = 4
+    yy, xx = np.mgrid[0:h * s, 0:w * s].astype(np.float32) / s
+    slope = np.tan(np.radians(angle))
+    image = np.where(xx - w / 2 - offset - slope * (yy - h / 2) > 0, 200, 50).astype(np.float32)
+    image = cv2.resize(image, (w, h), interpolation=cv2.INTER_AREA)
+    image[:, 300:302] = 120
+    image[900:902, :] = 130
+    image = cv2.GaussianBlur(image, (0, 0), sigma)
+    image += np.random.default_rng(seed).normal(0, 1, image.shape)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+@pytest.mark.parametrize('angle', [0, 5])
+def test_line_mode_fits_slanted_edge(angle):
+    evaluator = MTFSharpnessEvaluator.from_array(slanted_edge(angle), roi_mode='line')
+    evaluator.load_image()
+    mtf50 = evaluator.compute_mtf_sharpness()['mtf50']
+
+    assert evaluator.edge_line is not None
+    assert evaluator.edge_line['angle'] == pytest.approx(angle, abs=0.05)
+    assert mtf50 == pytest.approx(0.0288, rel=0.1)
+
+
+def test_short_fragments_are_not_candidates(sample_images):
+    evaluator = MTFSharpnessEvaluator(sample_images[0])
+    evaluator.load_image()
+    min_length = MIN_EDGE_LENGTH * min(evaluator.gray.shape)
+
+    assert all(line['length'] >= min_length for line in evaluator.detect_edges())
+
+
+def test_line_mode_stable_across_similar_frames(sample_images):
+    """同一场景的连续帧：MTF50不应随所选刃边跳变"""
+    frames = [path for path in sample_images if '_NG_' in path]
+    if not frames:
+        pytest.skip("没有同一场景的样例帧")
+    values = [process_single_image(path, verbose=False, roi_mode='line')[1] for path in frames]
+
+    assert max(values) - min(values) < 0.01
+
+
+def test_line_mode_on_small_crops(sample_images):
+    """小裁剪图上重新拟合的直线可能伸出画面，原线段中点不在图像内时不应出错"""
+    path = next((path for path in sample_images if 'new2-8' in path), sample_images[-1])
+    image = cv2.imread(path)
+    h, w = image.shape[:2]
+    rng = np.random.default_rng(0)
+    for _ in range(40):
+        y, x = int(rng.integers(0, h - 300)), int(rng.integers(0, w - 300))
+        evaluator = MTFSharpnessEvaluator.from_array(image[y:y + 300, x:x + 300, ::-1].copy(),
+                                                     roi_mode='line')
+        evaluator.load_image()
+        lines = evaluator.detect_edges()
+        assert all(0 <= line['purity'] <= 1 for line in lines)
+        evaluator.extract_edge_roi()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""分阶段缓存流水线（mtf_pipeline）：与compute_mtf_sharpness一致、只重算受影响的阶段、磁盘缓存"""
+
+import pytest
+
+from mtf_pipeline import MTFPipeline, StageCache
+from mtf_sharpness import MTFSharpnessEvaluator
+
+
+@pytest.fixture
+def image(sample_images):
+    return sample_images[0]
+
+
+def _recomputed(pipeline):
+    return {stage for stage, state in pipeline.last_run.items() if state == 'miss'}
+
+
+def test_matches_compute_mtf_sharpness(image):
+    evaluator = MTFSharpnessEvaluator(image)
+    evaluator.load_image()
+    expected = evaluator.compute_mtf_sharpness()
+
+    results = MTFPipeline().evaluate(image)
+
+    for name in ('mtf50', 'mtf30', 'mtf10', 'sharpness_score'):
+        assert results[name] == expected[name]
+    assert results['roi_bbox'] == evaluator.roi_bbox
+
+
+@pytest.mark.parametrize('params, stages', [
+    ({'sigma': 1.5}, {'lsf', 'mtf', 'metrics'}),
+    ({'oversample': 8}, {'esf', 'lsf', 'mtf', 'metrics'}),
+    ({'margin': 30}, {'roi', 'projection', 'esf', 'lsf', 'mtf', 'metrics'}),
+    ({'percentile': 90}, {'edge', 'roi', 'projection', 'esf', 'lsf', 'mtf', 'metrics'}),
+])
+def test_parameter_reruns_only_later_stages(image, params, stages):
+    pipeline = MTFPipeline()
+    pipeline.evaluate(image)
+    assert _recomputed(pipeline) == {'decode', 'gradient', 'edge', 'roi', 'projection',
+                                     'esf', 'lsf', 'mtf', 'metrics'}
+
+    pipeline.evaluate(image, **params)
+    assert _recomputed(pipeline) == stages
+
+    pipeline.evaluate(image, **params)
+    assert _recomputed(pipeline) == set()
+
+
+def test_disk_cache_round_trip(image, tmp_path):
+    directory = str(tmp_path / 'cache')
+    first = MTFPipeline(StageCache(directory=directory)).evaluate(image, sigma=1.5)
+
+    # 新的进程内缓存，只能从磁盘读到各阶段的输出
+    pipeline = MTFPipeline(StageCache(directory=directory))
+    second = pipeline.evaluate(image, sigma=1.5)
+
+    assert _recomputed(pipeline) == set()
+    assert second['mtf50'] == first['mtf50']
+    assert (second['mtf_curve'] == first['mtf_curve']).all()
+
+
+def test_disk_cache_keyed_by_precision(image, tmp_path):
+    directory = str(tmp_path / 'cache')
+    MTFPipeline(StageCache(directory=directory)).evaluate(image)
+
+    pipeline = MTFPipeline(StageCache(directory=directory), precision='float32')
+    pipeline.evaluate(image)
+    assert 'decode' in _recomputed(pipeline)
+
+
+@pytest.mark.parametrize('option', [
+    {'pyramid_levels': 2},
+    {'memory_budget': 1 << 20},
+    {'threads': 4},
+    {'roi_mode': 'line'},
+    {'precheck': True},
+    {'bootstrap': 100},
+    {'no_such_option': 1},
+])
+def test_unsupported_options_are_rejected(option):
+    with pytest.raises(ValueError):
+        MTFPipeline(**option)
+
+
+def test_default_options_are_accepted():
+    MTFPipeline(pyramid_levels=0, memory_budget=None, threads=1, roi_mode='bbox',
+                precheck=False, bootstrap=0)
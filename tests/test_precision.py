@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""单精度（--precision float32）与双精度的MTF50一致性"""
+
+import numpy as np
+import pytest
+
+from mtf_sharpness import MTFSharpnessEvaluator, process_single_image
+
+# 附带图像上两种精度的MTF50差异实测小于1e-8，留出余量
+TOLERANCE = 1e-6
+
+
+@pytest.fixture(scope='module')
+def mtf50_by_precision(sample_images):
+    return {
+        precision: np.array([process_single_image(path, verbose=False, precision=precision)[1]
+                             for path in sample_images])
+        for precision in ('float32', 'float64')
+    }
+
+
+def test_float32_matches_float64(mtf50_by_precision):
+    single, double = mtf50_by_precision['float32'], mtf50_by_precision['float64']
+
+    np.testing.assert_allclose(single, double, rtol=0, atol=TOLERANCE)
+
+
+def test_float32_keeps_ranking(mtf50_by_precision):
+    single, double = mtf50_by_precision['float32'], mtf50_by_precision['float64']
+
+    np.testing.assert_array_equal(np.argsort(-single, kind='stable'), np.argsort(-double, kind='stable'))
+
+
+@pytest.mark.parametrize('precision', ['float32', 'float64'])
+def test_pipeline_runs_in_precision(sample_images, precision):
+    evaluator = MTFSharpnessEvaluator(sample_images[0], precision=precision)
+    evaluator.load_image()
+
+    assert evaluator.compute_esf(evaluator.extract_edge_roi()).dtype == np.dtype(precision)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""结果数据库（mtf_results_db）：各类查询的条件、排序和所用索引"""
+
+import pytest
+
+from mtf_results_db import ResultsDB, main
+
+# (文件名, 工位, 时间, MTF50, 等级)
+ROWS = [
+    ('NG_1.bmp', '3', 1000.0, 0.050, '模糊'),
+    ('NG_2.bmp', '3', 2000.0, 0.090, '模糊'),
+    ('NG_3.bmp', '4', 3000.0, 0.150, '轻微模糊'),
+    ('OK_1.bmp', '4', 4000.0, 0.320, '清晰'),
+    ('OK_2.bmp', '3', 5000.0, 0.250, '较清晰'),
+    ('OK_3.bmp', '3', 6000.0, None, '无有效边缘'),
+    ('NG_1.bmp', '3', 7000.0, 0.070, '模糊'),
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    with ResultsDB(str(tmp_path / 'results.db')) as db:
+        run_id = db.start_run('/data', station='3')
+        for name, station, timestamp, mtf50, level in ROWS:
+            score = None if mtf50 is None else mtf50 * 1000
+            db.add(run_id, f'/data/{name}', mtf50, score, level, station=station, timestamp=timestamp)
+        db.flush()
+        db.statements = []
+        db.conn.set_trace_callback(db.statements.append)
+        yield db
+
+
+def query_plan(db):
+    """最近一次查询的执行计划（set_trace_callback 记录的是代入参数后的SQL）"""
+    sql = db.statements[-1]
+    return ' | '.join(row[3] for row in db.conn.execute("EXPLAIN QUERY PLAN " + sql))
+
+
+def names(rows):
+    return [(r['filename'], r['timestamp']) for r in rows]
+
+
+def test_top_and_bottom_skip_missing_mtf50(db):
+    rows = db.query(top=3)
+    assert [r['mtf50'] for r in rows] == [0.32, 0.25, 0.15]
+    assert 'idx_results_mtf50' in query_plan(db)
+
+    rows = db.query(bottom=10)
+    assert [r['mtf50'] for r in rows] == [0.05, 0.07, 0.09, 0.15, 0.25, 0.32]
+    assert 'TEMP B-TREE' not in query_plan(db)
+
+
+def test_top_with_station(db):
+    rows = db.query(top=2, station='3')
+    assert [(r['filename'], r['mtf50']) for r in rows] == [('OK_2.bmp', 0.25), ('NG_2.bmp', 0.09)]
+    assert 'idx_results_station_mtf50' in query_plan(db)
+
+
+def test_range_is_half_open_and_sorted_by_mtf50(db):
+    rows = db.query(min_mtf50=0.07, max_mtf50=0.25, limit=100)
+    assert [r['mtf50'] for r in rows] == [0.07, 0.09, 0.15]
+    assert 'idx_results_mtf50' in query_plan(db)
+
+
+def test_level_with_range(db):
+    rows = db.query(level='模糊', max_mtf50=0.08, limit=100)
+    assert names(rows) == [('NG_1.bmp', 1000.0), ('NG_1.bmp', 7000.0)]
+    assert 'idx_results_level' in query_plan(db)
+
+    rows = db.query(level='无有效边缘', limit=100)
+    assert names(rows) == [('OK_3.bmp', 6000.0)]
+    assert rows[0]['mtf50'] is None
+
+
+def test_filename_exact_and_glob(db):
+    rows = db.query(filename='NG_1.bmp', limit=100)
+    assert 'filename = ' in db.statements[-1]
+    assert names(rows) == [('NG_1.bmp', 7000.0), ('NG_1.bmp', 1000.0)]
+
+    rows = db.query(filename='NG_*.bmp', limit=100)
+    assert 'filename GLOB ' in db.statements[-1]
+    assert 'idx_results_filename' in query_plan(db)
+    assert sorted(r['filename'] for r in rows) == ['NG_1.bmp', 'NG_1.bmp', 'NG_2.bmp', 'NG_3.bmp']
+
+    # GLOB区分大小写，[] 为字符集合
+    assert db.query(filename='ng_*', limit=100) == []
+    assert {r['filename'] for r in db.query(filename='OK_[12].bmp', limit=100)} == {'OK_1.bmp', 'OK_2.bmp'}
+
+
+def test_since_until_newest_first(db):
+    rows = db.query(since=2000.0, until=5000.0, limit=100)
+    assert names(rows) == [('OK_1.bmp', 4000.0), ('NG_3.bmp', 3000.0), ('NG_2.bmp', 2000.0)]
+    assert 'idx_results_timestamp' in query_plan(db)
+
+
+def test_limit_ordering(db):
+    # 无MTF50范围或等级条件时最新的在前
+    assert names(db.query(limit=2)) == [('NG_1.bmp', 7000.0), ('OK_3.bmp', 6000.0)]
+    # 有条件时按MTF50升序
+    assert [r['mtf50'] for r in db.query(min_mtf50=0.0, limit=2)] == [0.05, 0.07]
+
+
+def test_run_and_station_filters(db):
+    other = db.start_run('/other', station='5')
+    db.add(other, '/other/X.bmp', 0.4, 400.0, '非常清晰', station='5', timestamp=8000.0)
+    db.flush()
+
+    assert [r['filename'] for r in db.query(run_id=other, limit=100)] == ['X.bmp']
+    assert len(db.query(station='4', limit=100)) == 2
+    assert [r['run_id'] for r in db.runs()] == [other, other - 1]
+    assert [r['count'] for r in db.runs()] == [1, len(ROWS)]
+
+
+def test_main_query(db, capsys):
+    db.close()
+    assert main([db.path, '--level', '模糊', '--max', '0.08']) == 0
+    out = capsys.readouterr().out
+    assert '共 2 条' in out
+    assert main([db.path + '.missing']) == 1
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""流式SPC（mtf_spc）：在线统计量与参考实现一致，控制图在已知偏移上按理论步数报警"""
+
+import math
+
+import numpy as np
+import pytest
+
+from mtf_spc import (RULE_CUSUM, RULE_EWMA, RULE_SHEWHART, ControlChart, P2Quantile,
+                     RollingWindow, SPCMonitor, Welford, default_key)
+
+
+@pytest.fixture
+def stream():
+    # MTF50量级的均值上叠加噪声，检验大均值下的数值稳定性
+    return 0.07 + 0.01 * np.random.default_rng(0).standard_normal(5000)
+
+
+def test_welford_matches_numpy(stream):
+    stats = Welford()
+    for x in stream:
+        stats.update(x)
+
+    assert stats.count == len(stream)
+    assert stats.mean == pytest.approx(stream.mean(), rel=1e-12)
+    assert stats.variance == pytest.approx(stream.var(ddof=1), rel=1e-9)
+    assert stats.std == pytest.approx(stream.std(ddof=1), rel=1e-9)
+
+
+def test_welford_single_sample():
+    stats = Welford()
+    stats.update(1.5)
+    assert stats.mean == 1.5 and stats.variance == 0.0
+
+
+@pytest.mark.parametrize('size', [2, 50, 333])
+def test_rolling_window_matches_numpy(stream, size):
+    window = RollingWindow(size)
+    for i, x in enumerate(stream):
+        window.update(x)
+        if i % 97 == 0 or i == len(stream) - 1:
+            recent = stream[max(0, i + 1 - size):i + 1]
+            assert window.count == len(recent)
+            assert window.mean == pytest.approx(recent.mean(), rel=1e-9)
+            if len(recent) > 1:
+                assert window.std == pytest.approx(recent.std(ddof=1), rel=1e-6)
+
+
+@pytest.mark.parametrize('p', [0.1, 0.5, 0.9])
+def test_p2_quantile_matches_percentile(stream, p):
+    estimator = P2Quantile(p)
+    for x in stream:
+        estimator.update(x)
+
+    # 5000个正态样本上P²估计与精确分位数相差远小于一个标准差
+    assert estimator.value == pytest.approx(np.percentile(stream, p * 100), abs=0.05 * stream.std())
+
+
+def test_p2_quantile_few_samples():
+    estimator = P2Quantile(0.5)
+    assert estimator.value is None
+    for x in (3.0, 1.0, 2.0):
+        estimator.update(x)
+    assert estimator.value == 2.0
+
+
+def test_warmup_estimates_baseline(stream):
+    chart = ControlChart(warmup=30)
+    for x in stream[:29]:
+        assert chart.update(x) == []
+        assert not chart.ready
+    chart.update(stream[29])
+
+    assert chart.ready
+    assert chart.target == pytest.approx(stream[:30].mean())
+    assert chart.sigma == pytest.approx(stream[:30].std(ddof=1))
+
+
+def test_warmup_sigma_floor():
+    chart = ControlChart(warmup=5, min_sigma=1e-3)
+    for _ in range(5):
+        chart.update(0.1)
+    assert chart.sigma == 1e-3
+
+
+def _first_alarm(chart, values, rule):
+    for index, x in enumerate(values, 1):
+        for alarm in chart.update(x):
+            if alarm[0] == rule:
+                return index, alarm
+    return None, None
+
+
+def test_cusum_alarms_on_step_shift():
+    # 1σ偏移：每步累积 1 - k = 0.5，超过 h = 5 需要11步
+    chart = ControlChart(target=0.0, sigma=1.0, cusum_k=0.5, cusum_h=5.0, ewma_width=100, shewhart_width=100)
+    index, alarm = _first_alarm(chart, [1.0] * 20, RULE_CUSUM)
+
+    assert index == 11
+    assert alarm[1] == 'up' and alarm[2] == pytest.approx(5.5) and alarm[3] == 5.0
+    # 报警后清零，再过11步再次报警
+    index, _ = _first_alarm(chart, [1.0] * 20, RULE_CUSUM)
+    assert index == 11
+
+
+def test_cusum_detects_downward_drift():
+    # -1.5σ偏移（取二进制可精确表示的值）：每步累积1，第6步超过h
+    chart = ControlChart(target=0.5, sigma=0.25, ewma_width=100, shewhart_width=100)
+    index, alarm = _first_alarm(chart, [0.125] * 20, RULE_CUSUM)
+    assert index == 6 and alarm[1] == 'down'
+
+
+def test_ewma_limits_follow_exact_formula():
+    lam, width = 0.2, 3.0
+    chart = ControlChart(target=0.0, sigma=1.0, ewma_lambda=lam, ewma_width=width,
+                         cusum_h=1e9, shewhart_width=100)
+    shift = 1.5
+    index, alarm = _first_alarm(chart, [shift] * 50, RULE_EWMA)
+
+    # 参考：EWMA_n = δ(1 - (1-λ)^n)，控制限 L·sqrt(λ/(2-λ)·(1-(1-λ)^(2n)))
+    expected = next(n for n in range(1, 51)
+                    if shift * (1 - (1 - lam) ** n) >
+                    width * math.sqrt(lam / (2 - lam) * (1 - (1 - lam) ** (2 * n))))
+    assert index == expected
+    assert alarm[2] == pytest.approx(shift * (1 - (1 - lam) ** expected))
+    assert alarm[3] == pytest.approx(width * math.sqrt(lam / (2 - lam) * (1 - (1 - lam) ** (2 * expected))))
+
+
+def test_ewma_alarms_once_until_back_in_control():
+    chart = ControlChart(target=0.0, sigma=1.0, cusum_h=1e9, shewhart_width=100)
+    alarms = [a for x in [2.0] * 30 for a in chart.update(x) if a[0] == RULE_EWMA]
+    assert len(alarms) == 1
+    # 回到控制限内后重新判定
+    for _ in range(30):
+        chart.update(0.0)
+    alarms = [a for x in [2.0] * 30 for a in chart.update(x) if a[0] == RULE_EWMA]
+    assert len(alarms) == 1
+
+
+def test_shewhart_limit():
+    chart = ControlChart(target=0.0, sigma=1.0, cusum_h=1e9, ewma_width=100)
+    assert chart.update(2.9) == []
+    alarm, = chart.update(-3.5)
+    assert alarm == (RULE_SHEWHART, 'down', -3.5, -3.0)
+
+
+def test_in_control_false_alarm_rate():
+    values = np.random.default_rng(1).standard_normal(5000)
+    chart = ControlChart(target=0.0, sigma=1.0)
+    alarms = [a for x in values for a in chart.update(x)]
+    # 单点3σ的理论误报率约千分之2.7
+    shewhart = sum(a[0] == RULE_SHEWHART for a in alarms)
+    assert shewhart == pytest.approx(5000 * 0.0027, abs=10)
+
+
+def test_monitor_keys_by_station():
+    monitor = SPCMonitor(warmup=2)
+    for i in range(3):
+        monitor.update(f"0908_01_NG_{i}.bmp", 0.07)
+        monitor.update(f"line2-cam_{i}.bmp", 0.2)
+
+    assert default_key('0908_01_NG_12.bmp') == '0908_01_NG'
+    summary = monitor.summary()
+    assert set(summary) == {'0908_01_NG', 'line2-cam'}
+    assert summary['0908_01_NG']['count'] == 3
+    assert summary['line2-cam']['mean'] == pytest.approx(0.2)
+
+
+def test_monitor_alarm_callback():
+    received = []
+    monitor = SPCMonitor(on_alarm=received.append, target=0.1, sigma=0.01)
+    alarms = monitor.update('cam_1.bmp', 0.0)
+
+    assert alarms and received == alarms
+    assert alarms[0]['key'] == 'cam' and alarms[0]['index'] == 1
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""参数扫描（sweep子命令）：每组配置的结果与 MTFPipeline.evaluate 一致"""
+
+import csv
+import os
+import shutil
+
+import pytest
+
+from mtf_pipeline import MTFPipeline
+from mtf_sweep import build_grid, main, run_sweep
+
+
+METRICS = ('mtf50', 'mtf30', 'mtf10', 'mtf_auc')
+
+
+@pytest.fixture(scope='module')
+def folder(sample_images, tmp_path_factory):
+    """两张样例图像组成的文件夹"""
+    path = tmp_path_factory.mktemp('sweep')
+    for image in (sample_images[0], sample_images[-1]):
+        shutil.copy(image, path)
+    return str(path)
+
+
+@pytest.mark.parametrize('backend', ['numpy', 'auto'])
+def test_rows_match_pipeline(folder, backend):
+    grid = build_grid(sigma=[1, 1.5, 2], margin=[30, 50], oversample=[4, 8], percentile=[90, 95])
+    rows, summary = run_sweep(folder, grid, backend=backend)
+
+    pipeline = MTFPipeline(backend=backend)
+    assert len(rows) == 2 * len(grid)
+    for row in rows:
+        expected = pipeline.evaluate(os.path.join(folder, row['filename']), **grid[row['config']])
+        for name in METRICS:
+            assert row[name] == expected[name], (row['config'], name)
+    assert len(summary) == len(grid)
+
+
+def test_ranks_and_csv(folder, tmp_path):
+    output = str(tmp_path / 'sweep.csv')
+    assert main([folder, '--sigma', '1,2', '--backend', 'numpy', '-o', output]) == 0
+
+    with open(output, encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 4
+    for config in ('0', '1'):
+        members = sorted((r for r in rows if r['config'] == config), key=lambda r: -float(r['mtf50']))
+        assert [int(r['rank']) for r in members] == [1, 2]
+
+
+def test_unknown_parameter():
+    with pytest.raises(ValueError):
+        build_grid(gamma=[1])
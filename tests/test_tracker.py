@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""序列模式的ROI复用（_extract_edge_roi_tracked，含line模式的刃边直线）"""
+
+import numpy as np
+import pytest
+
+from mtf_sharpness import MTFSharpnessEvaluator
+from test_line_roi import slanted_edge
+
+
+@pytest.mark.parametrize('percentile', [85, 90, 95, 98])
+def test_tracked_roi_uses_percentile(sample_images, percentile):
+    """上一帧按非默认百分位搜索得到的阈值，本帧校验时也按同一百分位"""
+    frames = [path for path in sample_images if '_NG_' in path][:3]
+    if len(frames) < 2:
+        pytest.skip("没有同一场景的样例帧")
+    previous = MTFSharpnessEvaluator(frames[0])
+    previous.load_image()
+    previous.project_edge(previous.extract_edge_roi(percentile=percentile))
+
+    for path in frames[1:]:
+        evaluator = MTFSharpnessEvaluator(path)
+        evaluator.load_image()
+        evaluator.roi_hint = previous.roi_state()
+        roi = evaluator.extract_edge_roi(percentile=percentile)
+
+        full = MTFSharpnessEvaluator(path)
+        full.load_image()
+        assert evaluator.roi_fast_path
+        assert roi.shape == full.extract_edge_roi(percentile=percentile).shape
+
+
+def _line_frame(image, hint=None):
+    evaluator = MTFSharpnessEvaluator.from_array(image, roi_mode='line')
+    evaluator.load_image()
+    evaluator.roi_hint = hint
+    return evaluator, evaluator.compute_mtf_sharpness()['mtf50']
+
+
+def test_line_mode_exports_hint():
+    evaluator, _ = _line_frame(slanted_edge(5))
+
+    state = evaluator.roi_state()
+    assert state is not None
+    assert state['line'] is evaluator.edge_line
+
+
+def test_tracked_line_roi_matches_full_search():
+    previous, _ = _line_frame(slanted_edge(5))
+    for seed in (1, 2):
+        image = slanted_edge(5, seed=seed)
+        tracked, mtf50 = _line_frame(image, previous.roi_state())
+        _, expected = _line_frame(image)
+
+        assert tracked.roi_fast_path
+        assert tracked.edge_line['angle'] == pytest.approx(5, abs=0.05)
+        assert mtf50 == pytest.approx(expected, rel=0.01)
+
+
+def test_tracked_line_roi_rejects_moved_edge():
+    previous, _ = _line_frame(slanted_edge(5))
+    tracked, mtf50 = _line_frame(slanted_edge(5, seed=1, offset=200), previous.roi_state())
+
+    assert not tracked.roi_fast_path
+    assert mtf50 == pytest.approx(0.0288, rel=0.1)